@@ -0,0 +1,115 @@
+"""
+Atari 2600 Video Chess - Background AI Worker
+Runs the AI search in a separate process so the caller's event loop keeps
+running; progress and results come back through callbacks on a listener
+thread
+"""
+
+import atexit
+import multiprocessing
+import threading
+
+from video_chess import VideoChess
+
+
+def _worker_main(conn, stop_event, tt_size_mb, search_workers, profile, cache_path):
+    """Worker process: search each position sent over conn until told to quit"""
+    # One engine for the life of the worker so the transposition table
+    # carries over between moves
+    game = VideoChess(tt_size_mb=tt_size_mb, search_workers=search_workers,
+                      cache_path=cache_path)
+    if profile:
+        import profiler
+        profiler.Profiler().attach(game)
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        job_id, position, difficulty = job
+        stop_event.clear()
+        game.set_position(position)
+        game.set_difficulty(difficulty)
+        move = game.book_move() or game.find_best_move(
+            info_callback=lambda info: conn.send(("progress", job_id, info)),
+            stop_event=stop_event)
+        if game.profiler is not None:
+            conn.send(("profile", job_id, game.profiler.snapshot()))
+        conn.send(("result", job_id, move))
+    if game.parallel_search is not None:
+        game.parallel_search.close()
+    if game.eval_cache is not None:
+        game.eval_cache.close()
+
+
+class AIWorker:
+    def __init__(self, on_progress, on_result, tt_size_mb=16, search_workers=1, profile=False,
+                 cache_path=None):
+        # Callbacks run on the listener thread, not the caller's thread
+        self.on_progress = on_progress  # on_progress(info dict, job_id)
+        self.on_result = on_result  # on_result(move or None, job_id)
+
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.stop_event = context.Event()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, self.stop_event, tt_size_mb,
+                                             search_workers, profile, cache_path),
+                                       # Daemonic processes can't start the parallel
+                                       # search helpers, so close() has to run instead
+                                       daemon=search_workers <= 1)
+        self.process.start()
+        if search_workers > 1:
+            atexit.register(self.close)
+
+        self.job_id = 0
+        self.busy = False
+        self.profile = None  # Worker's profiler snapshot after each search when profiling
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def start(self, game):
+        """Start searching a snapshot of game's position"""
+        self.job_id += 1
+        self.busy = True
+        self.conn.send((self.job_id, game.get_position(), game.difficulty))
+
+    def move_now(self):
+        """Stop the search and play the best move found so far"""
+        if self.busy:
+            self.stop_event.set()
+
+    def cancel(self):
+        """Stop the search and discard its result"""
+        if self.busy:
+            self.job_id += 1
+            self.busy = False
+            self.stop_event.set()
+
+    def close(self):
+        """Shut down the worker process"""
+        self.cancel()
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def _listen(self):
+        """Listener thread: forward worker messages for the current job"""
+        while True:
+            try:
+                kind, job_id, payload = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "profile":
+                self.profile = payload  # Counters are cumulative, so keep even stale ones
+                continue
+            if job_id != self.job_id:
+                continue  # Result of a cancelled search
+            if kind == "progress":
+                self.on_progress(payload, job_id)
+            else:
+                self.busy = False
+                self.on_result(payload, job_id)
@@ -0,0 +1,212 @@
+"""
+Atari 2600 Video Chess - Bulk Analysis
+Scores every position of a game archive (PGN or self-play JSON lines) or
+of an EPD file with the search on a process pool. Records are read,
+analysed and written one at a time in input order with a bounded number in
+flight, so memory use doesn't grow with the archive.
+
+    python analysis.py games.pgn --output annotated.pgn --depth 4 --workers 8
+    python analysis.py games.jsonl --output annotated.pgn
+    python analysis.py positions.epd --output scored.epd --depth 6
+
+Moves get a {[%eval 0.35]} comment (white's view of the position after the
+move, '#3' for mates) and the engine's choice when it differs from the
+move played. EPD lines get ce, pm, acd and acn operations.
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import sys
+import time
+
+import pgn
+import search
+import transposition
+from video_chess import VideoChess
+
+# Records queued per worker; bounds memory and keeps the workers busy
+IN_FLIGHT_PER_WORKER = 4
+# Most plies to mate in a tablebase score: the search ply plus a one-byte
+# table distance
+TABLEBASE_PLIES = search.MAX_PLY + 255
+
+_worker_game = None
+_worker_tt = None
+_worker_limits = None
+
+
+def _init_worker(tt_size_mb, max_depth, node_limit):
+    global _worker_game, _worker_tt, _worker_limits
+    _worker_game = VideoChess(tt_size_mb=tt_size_mb, book_path=None)
+    _worker_tt = transposition.TranspositionTable(tt_size_mb)
+    _worker_limits = (max_depth, node_limit)
+
+
+def score_text(score):
+    """%eval text for a white-relative score: pawns, or '#n' / '#-n' for mates
+    found by the search or read from the tablebases"""
+    magnitude = abs(score)
+    if magnitude >= search.MATE_SCORE - search.MAX_PLY:
+        plies = search.MATE_SCORE - magnitude
+    elif magnitude >= search.TABLEBASE_WIN - TABLEBASE_PLIES:
+        plies = search.TABLEBASE_WIN - magnitude
+    else:
+        return f"{score / 100:.2f}"
+    moves = (plies + 1) // 2
+    return f"#{moves}" if score > 0 else f"#-{moves}"
+
+
+def analyse_position(game, legal):
+    """(score for the side to move, best move, depth, nodes) with the worker's limits"""
+    max_depth, node_limit = _worker_limits
+    if not legal:
+        score = -search.MATE_SCORE if game.in_check() else 0
+        return score, None, 0, 0
+    engine = search.Search(game, max_depth=max_depth, node_limit=node_limit, tt=_worker_tt)
+    move = engine.run()
+    return engine.best_score, move, engine.completed_depth, engine.nodes
+
+
+def analyse_game(job):
+    """Annotate one game (runs in a pool worker)
+
+    Returns (tags, moves, result, comments, nodes, error): comments runs
+    parallel to moves, and error names the first move that didn't replay
+    (the moves from there on are kept but not annotated).
+    """
+    tags, moves, result = job
+    try:
+        game = pgn.start_game(tags, _worker_game)
+    except ValueError as exc:
+        return tags, moves, result, None, 0, str(exc)
+
+    comments = []
+    nodes = 0
+    error = None
+    legal = game.generate_moves(pgn.color_mask(game))
+    score, best, _, searched = analyse_position(game, legal)
+    nodes += searched
+    for ply, san in enumerate(moves, 1):
+        try:
+            move = pgn.san_to_move(game, san, legal)
+        except ValueError as exc:
+            error = f"ply {ply}: {exc}"
+            break
+        best_san = pgn.move_to_san(game, best, legal) if best not in (None, move) else None
+        game.make_move(move)
+
+        legal = game.generate_moves(pgn.color_mask(game))
+        score, best, _, searched = analyse_position(game, legal)
+        nodes += searched
+        parts = []
+        if legal or not game.in_check():  # A mate needs no eval, the '#' says it
+            parts.append(f"[%eval {score_text(score if game.current_player == 0 else -score)}]")
+        if best_san:
+            parts.append(f"best {best_san}")
+        comments.append(" ".join(parts) or None)
+    comments += [None] * (len(moves) - len(comments))
+    return tags, moves, result, comments, nodes, error
+
+
+def analyse_epd(job):
+    """Score one EPD position (runs in a pool worker); returns (FEN, operations, nodes, error)"""
+    fen, operations = job
+    game = _worker_game
+    try:
+        game.set_fen(fen)
+    except ValueError as exc:
+        return fen, operations, 0, str(exc)
+    legal = game.generate_moves(pgn.color_mask(game))
+    score, best, depth, nodes = analyse_position(game, legal)
+    operations = dict(operations, ce=[str(score)], acd=[str(depth)], acn=[str(nodes)])
+    if best is not None:
+        operations["pm"] = [pgn.move_to_san(game, best, legal)]
+    return fen, operations, nodes, None
+
+
+def run_pool(jobs, worker, write, workers, initargs):
+    """Run worker over the jobs iterator on a process pool and pass each result
+    to write, in input order, with at most IN_FLIGHT_PER_WORKER jobs per
+    worker queued (Pool.imap would read the whole iterator ahead)"""
+    pending = collections.deque()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for job in jobs:
+            pending.append(pool.apply_async(worker, (job,)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                write(pending.popleft().get())
+        while pending:
+            write(pending.popleft().get())
+
+
+def read_games(path):
+    """(tags, SAN moves, result) for each game in a PGN or self-play JSON lines file"""
+    with open(path) as file:
+        if path.endswith((".jsonl", ".json")):
+            game = VideoChess(book_path=None)
+            for line in file:
+                if line.strip():
+                    yield pgn.selfplay_to_pgn(json.loads(line), game)
+        else:
+            yield from pgn.read_pgn(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Annotate a Video Chess game archive or EPD file")
+    parser.add_argument("input", help="PGN, self-play JSON lines (.jsonl) or EPD (.epd) file")
+    parser.add_argument("--output", metavar="FILE", help="file to write instead of stdout")
+    parser.add_argument("--depth", type=int, default=4, help="search depth per position (default 4)")
+    parser.add_argument("--nodes", type=int, help="node limit per position")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--tt", type=int, default=16, help="transposition table MB per worker")
+    args = parser.parse_args(argv)
+
+    epd = args.input.endswith(".epd")
+    out = open(args.output, "w") if args.output else sys.stdout
+    totals = {"records": 0, "positions": 0, "nodes": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def write_game(result):
+        tags, moves, outcome, comments, nodes, error = result
+        tags = dict(tags, Annotator=f"Video Chess depth {args.depth}")
+        pgn.write_pgn(out, tags, moves, outcome, comments)
+        out.flush()
+        totals["positions"] += len(moves) + 1
+        count(nodes, error, f"game {totals['records'] + 1}")
+
+    def write_position(result):
+        fen, operations, nodes, error = result
+        pgn.write_epd(out, fen, operations)
+        out.flush()
+        totals["positions"] += 1
+        count(nodes, error, fen)
+
+    def count(nodes, error, name):
+        totals["records"] += 1
+        totals["nodes"] += nodes
+        if error:
+            totals["errors"] += 1
+            print(f"{name}: {error}", file=sys.stderr)
+
+    try:
+        if epd:
+            with open(args.input) as file:
+                run_pool(pgn.read_epd(file), analyse_epd, write_position, args.workers,
+                         (args.tt, args.depth, args.nodes))
+        else:
+            run_pool(read_games(args.input), analyse_game, write_game, args.workers,
+                     (args.tt, args.depth, args.nodes))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{totals['records']} {'positions' if epd else 'games'}, {totals['positions']} positions "
+          f"scored, {totals['errors']} errors, {totals['nodes']} nodes in {elapsed:.1f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Atari 2600 Video Chess - Batch Move Generation and Evaluation
+Pseudo-legal move masks, attack maps, material and evaluation for many
+boards at once. Boards are an (N, 64) uint8 array in the VideoChess board
+encoding; pieces become per-square uint64 bitboards and every ray is
+filled with shift-and-mask steps over the whole batch (Kogge-Stone), so
+nothing loops over boards in Python.
+
+Square 0 is A1 and bit n of a bitboard is square n, as in the tablebases.
+
+    import batch, positions
+    boards, side, castling, en_passant = batch.load_positions("positions.bin")
+    counts = batch.move_counts(boards, side == 0, castling, en_passant)
+"""
+
+import numpy as np
+
+import evaluation
+import movegen
+import positions
+
+SQUARES = np.arange(64)
+SQUARE_BITS = np.left_shift(np.uint64(1), SQUARES.astype(np.uint64))
+
+# Masks that stop east/west shifts wrapping onto the next rank
+NOT_FILE_A = np.uint64(0xFEFEFEFEFEFEFEFE)
+NOT_FILE_H = np.uint64(0x7F7F7F7F7F7F7F7F)
+EVERYWHERE = np.uint64(0xFFFFFFFFFFFFFFFF)
+# Ranks a double pawn push lands on, indexed by is_white
+DOUBLE_PUSH_RANK = (np.uint64(0x000000FF00000000), np.uint64(0x00000000FF000000))
+
+# (shift, mask of squares the shift may land on); positive shifts move up the board
+ROOK_SHIFTS = [(8, EVERYWHERE), (-8, EVERYWHERE), (1, NOT_FILE_A), (-1, NOT_FILE_H)]
+BISHOP_SHIFTS = [(9, NOT_FILE_A), (7, NOT_FILE_H), (-7, NOT_FILE_A), (-9, NOT_FILE_H)]
+NOT_FILE_AB = np.uint64(0xFCFCFCFCFCFCFCFC)
+NOT_FILE_GH = np.uint64(0x3F3F3F3F3F3F3F3F)
+KNIGHT_STEPS = [(17, NOT_FILE_A), (15, NOT_FILE_H), (10, NOT_FILE_AB), (6, NOT_FILE_GH),
+                (-6, NOT_FILE_AB), (-10, NOT_FILE_GH), (-15, NOT_FILE_A), (-17, NOT_FILE_H)]
+WHITE_PAWN_STEPS = [(9, NOT_FILE_A), (7, NOT_FILE_H)]
+BLACK_PAWN_STEPS = [(-7, NOT_FILE_A), (-9, NOT_FILE_H)]
+
+
+def _table_bitboards(table):
+    """uint64 destination bitboard per square from a movegen square table"""
+    masks = np.zeros(64, dtype=np.uint64)
+    for square, destinations in enumerate(table):
+        for dest in destinations:
+            masks[square] |= SQUARE_BITS[dest]
+    return masks
+
+
+KNIGHT_ATTACKS = _table_bitboards(movegen.KNIGHT_MOVES)
+KING_ATTACKS = _table_bitboards(movegen.KING_MOVES)
+PAWN_ATTACKS = (_table_bitboards(movegen.PAWN_CAPTURES[0]),
+                _table_bitboards(movegen.PAWN_CAPTURES[1]))
+# Knight, king and pawn attacks indexed [piece & 0x0F, square]; zero for sliders
+LEAPER_ATTACKS = np.zeros((16, 64), dtype=np.uint64)
+for _color in (0, 0x08):
+    LEAPER_ATTACKS[_color | 1] = KING_ATTACKS
+    LEAPER_ATTACKS[_color | 4] = KNIGHT_ATTACKS
+    LEAPER_ATTACKS[_color | 6] = PAWN_ATTACKS[1 if _color else 0]
+
+# Signed score lookups indexed [piece byte, square] (white positive)
+_MATERIAL = evaluation.MATERIAL + [0]  # Type 7 is unused
+MATERIAL_SCORES = np.array([_MATERIAL[piece & 0x07] * (1 if piece & 0x08 else -1)
+                            for piece in range(256)], dtype=np.int32)
+OPENING_SCORES = np.array(evaluation.OPENING_SCORES, dtype=np.int32)
+ENDGAME_SCORES = np.array(evaluation.ENDGAME_SCORES, dtype=np.int32)
+PHASE = np.array(evaluation.PHASE, dtype=np.int32)
+
+
+def _shift(bitboards, shift):
+    if shift > 0:
+        return np.left_shift(bitboards, np.uint64(shift))
+    return np.right_shift(bitboards, np.uint64(-shift))
+
+
+def _slide(sources, empty, shift, mask):
+    """Squares attacked along one direction from each source bit (Kogge-Stone fill)"""
+    empty = empty & mask
+    sources = sources | (empty & _shift(sources, shift))
+    empty = empty & _shift(empty, shift)
+    sources = sources | (empty & _shift(sources, 2 * shift))
+    empty = empty & _shift(empty, 2 * shift)
+    sources = sources | (empty & _shift(sources, 4 * shift))
+    return _shift(sources, shift) & mask
+
+
+def to_bitboards(squares):
+    """(N, 64) bool array -> (N,) uint64 with bit n set for square n"""
+    packed = np.packbits(np.asarray(squares, dtype=bool), axis=1, bitorder="little")
+    return packed.view("<u8").reshape(len(packed)).astype(np.uint64)
+
+
+def to_squares(bitboards):
+    """(...) uint64 bitboards -> (..., 64) bool array indexed by square"""
+    return (np.asarray(bitboards, dtype=np.uint64)[..., None] & SQUARE_BITS) != 0
+
+
+def popcount(bitboards):
+    return np.bitwise_count(np.asarray(bitboards, dtype=np.uint64))
+
+
+def _as_boards(boards):
+    boards = np.asarray(boards, dtype=np.uint8)
+    if boards.ndim != 2 or boards.shape[1] != 64:
+        raise ValueError(f"boards must have shape (N, 64), got {boards.shape}")
+    return boards
+
+
+def _attacks_from(pieces, squares, empty):
+    """Attack bitboards for a flat list of pieces, their squares and their boards' empty squares"""
+    attacks = LEAPER_ATTACKS[pieces & 0x0F, squares]
+    types = pieces & 0x07
+    for kinds, shifts in (((5, 2), ROOK_SHIFTS), ((3, 2), BISHOP_SHIFTS)):
+        slider = np.flatnonzero((types == kinds[0]) | (types == kinds[1]))
+        if len(slider):
+            sources, open_squares = SQUARE_BITS[squares[slider]], empty[slider]
+            for shift, mask in shifts:
+                attacks[slider] |= _slide(sources, open_squares, shift, mask)
+    return attacks
+
+
+def piece_attacks(boards):
+    """(N, 64) uint64: squares attacked by the piece on each square
+
+    Sliders stop on (and include) the first piece of either color; pawns
+    attack their two capture diagonals whatever is on them.
+    """
+    boards = _as_boards(boards)
+    occupied = boards != 0
+    rows, squares = np.nonzero(occupied)
+    attacks = np.zeros(boards.shape, dtype=np.uint64)
+    empty = ~to_bitboards(occupied)
+    attacks[rows, squares] = _attacks_from(boards[rows, squares], squares, empty[rows])
+    return attacks
+
+
+def _side_array(white, count):
+    """Per-board bool array from a scalar or (N,) side-to-move argument"""
+    return np.broadcast_to(np.asarray(white, dtype=bool), (count,))
+
+
+def _step_all(bitboards, steps):
+    """Union of bitboards shifted by each (shift, mask) step"""
+    result = np.zeros_like(bitboards)
+    for shift, mask in steps:
+        result |= _shift(bitboards, shift) & mask
+    return result
+
+
+def attack_maps(boards, white):
+    """(N,) uint64: every square attacked by the given side (True or an (N,) array for white)
+
+    Works set-wise on one bitboard per piece kind, so the cost doesn't
+    grow with the number of pieces.
+    """
+    boards = _as_boards(boards)
+    white = _side_array(white, len(boards))
+    occupied = boards != 0
+    types = boards & 0x07
+    mine = occupied & (((boards & 0x08) != 0) == white[:, None])
+    empty = ~to_bitboards(occupied)
+
+    def pieces(*kinds):
+        return to_bitboards(mine & np.isin(types, kinds))
+
+    pawns = pieces(6)
+    attacks = np.where(white, _step_all(pawns, WHITE_PAWN_STEPS), _step_all(pawns, BLACK_PAWN_STEPS))
+    attacks |= _step_all(pieces(4), KNIGHT_STEPS)
+    attacks |= _step_all(pieces(1), ROOK_SHIFTS + BISHOP_SHIFTS)
+    for kinds, shifts in (((5, 2), ROOK_SHIFTS), ((3, 2), BISHOP_SHIFTS)):
+        sliders = pieces(*kinds)
+        for shift, mask in shifts:
+            attacks |= _slide(sliders, empty, shift, mask)
+    return attacks
+
+
+def move_masks(boards, white, castling=None, en_passant=None):
+    """(N, 64) uint64: pseudo-legal destinations of the side to move's piece on each square
+
+    Matches movegen.generate_moves: own pieces are excluded, king safety
+    is not checked, castling needs the right, the rook in its corner and
+    empty squares between them. castling and en_passant are (N,) arrays as
+    in get_position (-1 for no en passant square); omitted means none.
+    """
+    boards = _as_boards(boards)
+    white = _side_array(white, len(boards))
+    occupied = boards != 0
+    mine = occupied & (((boards & 0x08) != 0) == white[:, None])
+
+    empty = ~to_bitboards(occupied)
+    own = to_bitboards(mine)
+    enemy = to_bitboards(occupied & ~mine)
+    if en_passant is not None:
+        en_passant = np.asarray(en_passant)
+        target = np.where(en_passant >= 0,
+                          np.left_shift(np.uint64(1), np.clip(en_passant, 0, 63).astype(np.uint64)),
+                          np.uint64(0))
+        enemy = enemy | (target & empty)
+
+    # One entry per piece of the side to move
+    rows, squares = np.nonzero(mine)
+    pieces = boards[rows, squares]
+    open_squares = empty[rows]
+    attacks = _attacks_from(pieces, squares, open_squares)
+    pawn = (pieces & 0x07) == 6
+    moves = np.where(pawn, attacks & enemy[rows], attacks & ~own[rows])
+
+    # Pawn pushes: one square onto an empty square, two from the start rank
+    up = white[rows]
+    sources = SQUARE_BITS[squares]
+    push = np.where(up, _shift(sources, 8), _shift(sources, -8)) & open_squares
+    double = np.where(up, _shift(push, 8) & DOUBLE_PUSH_RANK[1],
+                      _shift(push, -8) & DOUBLE_PUSH_RANK[0]) & open_squares
+    moves |= np.where(pawn, push | double, np.uint64(0))
+
+    masks = np.zeros(boards.shape, dtype=np.uint64)
+    masks[rows, squares] = moves
+
+    if castling is not None:
+        castling = np.asarray(castling)
+        for side_white, home in ((True, 4), (False, 60)):
+            color = 0x08 if side_white else 0
+            ready = (white == side_white) & ((boards[:, home] & 0x0F) == color | 1)
+            short = (ready & (castling & movegen.KINGSIDE_RIGHT[side_white] != 0)
+                     & ((boards[:, home + 3] & 0x0F) == color | 5)
+                     & ~occupied[:, home + 1] & ~occupied[:, home + 2])
+            long = (ready & (castling & movegen.QUEENSIDE_RIGHT[side_white] != 0)
+                    & ((boards[:, home - 4] & 0x0F) == color | 5)
+                    & ~occupied[:, home - 1] & ~occupied[:, home - 2] & ~occupied[:, home - 3])
+            masks[:, home] |= np.where(short, SQUARE_BITS[home + 2], np.uint64(0))
+            masks[:, home] |= np.where(long, SQUARE_BITS[home - 2], np.uint64(0))
+
+    return masks
+
+
+def move_counts(boards, white, castling=None, en_passant=None):
+    """(N,) pseudo-legal move counts for the side to move"""
+    return popcount(move_masks(boards, white, castling, en_passant)).sum(axis=1, dtype=np.int64)
+
+
+def move_lists(masks):
+    """(board, source, dest) int arrays listing every move in a move_masks result"""
+    board, source = np.nonzero(masks)
+    bits = to_squares(masks[board, source])
+    row, dest = np.nonzero(bits)
+    return board[row], source[row], dest
+
+
+def material(boards):
+    """(N,) int32 material balance in centipawns, white positive"""
+    boards = _as_boards(boards)
+    return MATERIAL_SCORES[boards].sum(axis=1, dtype=np.int32)
+
+
+def evaluate(boards):
+    """(N,) int32 tapered material + piece-square score, white positive
+
+    Same value as evaluation.blend(*evaluation.full_recompute(board)).
+    """
+    boards = _as_boards(boards)
+    opening = OPENING_SCORES[boards, SQUARES].sum(axis=1, dtype=np.int64)
+    endgame = ENDGAME_SCORES[boards, SQUARES].sum(axis=1, dtype=np.int64)
+    phase = np.minimum(PHASE[boards].sum(axis=1), evaluation.MAX_PHASE)
+    return ((opening * phase + endgame * (evaluation.MAX_PHASE - phase))
+            // evaluation.MAX_PHASE).astype(np.int32)
+
+
+def from_games(games):
+    """(N, 64) uint8 boards from VideoChess instances or get_position() tuples"""
+    return np.array([game[0] if isinstance(game, tuple) else game.board for game in games],
+                    dtype=np.uint8).reshape(-1, 64)
+
+
+def unpack_records(data):
+    """Decode packed position records (see positions.py) without a Python loop
+
+    data is a buffer of whole 34-byte records. Returns (boards, side,
+    castling, en_passant) arrays.
+    """
+    records = np.frombuffer(data, dtype=np.uint8).reshape(-1, positions.RECORD_SIZE)
+    boards = np.empty((len(records), 64), dtype=np.uint8)
+    boards[:, 0::2] = records[:, :32] & 0x0F
+    boards[:, 1::2] = records[:, :32] >> 4
+    boards[(boards & 0x07) == 6] |= 0x80  # Pawn flag
+    side = records[:, 33] >> 7
+    en_passant = (records[:, 33] & 0x7F).astype(np.int8)
+    en_passant[en_passant == positions.NO_EN_PASSANT] = -1
+    return boards, side, records[:, 32].copy(), en_passant
+
+
+def load_positions(path):
+    """Decode a whole position database into arrays (see unpack_records)"""
+    with positions.PositionDatabase(path) as database:
+        start = positions.HEADER_SIZE
+        return unpack_records(database.view[start:start + len(database) * positions.RECORD_SIZE])
@@ -0,0 +1,182 @@
+"""
+Atari 2600 Video Chess - Benchmarks
+Perft and timing suite for move generation and attack detection, with
+JSON results that can be compared between versions
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import movegen
+from video_chess import START_FEN, VideoChess
+
+# Fixed benchmark positions
+POSITIONS = {
+    "start": START_FEN,
+    "castling": "r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R w KQkq - 0 1",
+    # After the A2-A4 / E7-E5 sequence from en-passant-analysis.md
+    "rom-en-passant": "rnbqkbnr/pppp1ppp/8/4p3/P7/8/1PPPPPPP/RNBQKBNR w KQkq e6 0 2",
+    # White pawn on E5 can take the F7-F5 pawn en passant
+    "en-passant": "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "middlegame": "r2q1rk1/pp1nbppp/2p1pn2/3p4/2PP4/2NBPN2/PP3PPP/R2Q1RK1 w - - 0 10",
+}
+
+# Known leaf counts for depths 1, 2, 3 with this move generator (legal
+# moves, so they agree with standard perft where no promotion is reached)
+EXPECTED_PERFT = {
+    "start": [20, 400, 8902],
+    "castling": [25, 625, 15206],
+    "rom-en-passant": [21, 629, 14560],
+    "en-passant": [31, 707, 21637],
+    "kiwipete": [48, 2039, 97862],
+    "middlegame": [41, 1324, 53651],
+}
+
+
+def scan_is_square_attacked(game, square, by_color):
+    """Previous attack test: generate every enemy piece's moves and search them"""
+    white = by_color & 0x08
+    for sq in range(64):
+        piece = game.board[sq]
+        if piece and (piece & 0x08) == white:
+            if square in game.get_piece_moves(sq, piece & 0x07):
+                return True
+    return False
+
+
+def random_positions(count, seed=0x2600, max_plies=60):
+    """Build positions by random play from the start (same seed, same positions)"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        game = VideoChess()
+        for _ in range(rng.randint(0, max_plies)):
+            moves = game.generate_moves(0x08 if game.current_player == 0 else 0x80)
+            if not moves or game.game_flags & 0x80:
+                break
+            game.make_move(rng.choice(moves))
+        positions.append(game)
+    return positions
+
+
+def bench_attacks(positions, repeat=3):
+    """Time scan vs reverse-lookup attack tests over every square of each position"""
+    results = {}
+    for name, attacked in (("scan", scan_is_square_attacked),
+                           ("reverse", lambda game, square, color:
+                            movegen.is_square_attacked(game.board, square, color))):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for game in positions:
+                for square in range(64):
+                    attacked(game, square, 0x08)
+                    attacked(game, square, 0x00)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        calls = len(positions) * 128
+        results[name] = {"calls": calls, "seconds": best, "calls_per_sec": calls / best}
+    results["speedup"] = results["scan"]["seconds"] / results["reverse"]["seconds"]
+    return results
+
+
+def bench_perft(name, fen, depth):
+    """Run perft on one position and check it against the expected counts"""
+    game = VideoChess()
+    game.set_fen(fen)
+    start = time.perf_counter()
+    nodes = game.perft(depth)
+    elapsed = time.perf_counter() - start
+
+    expected = EXPECTED_PERFT.get(name, [])
+    expected_nodes = expected[depth - 1] if depth <= len(expected) else None
+    return {
+        "name": name,
+        "fen": fen,
+        "depth": depth,
+        "nodes": nodes,
+        "expected": expected_nodes,
+        "ok": expected_nodes is None or nodes == expected_nodes,
+        "seconds": elapsed,
+        "nps": nodes / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def bench_movegen(fen, repeat=2000):
+    """Time generate_moves for the side to move on one position"""
+    game = VideoChess()
+    game.set_fen(fen)
+    color_mask = 0x08 if game.current_player == 0 else 0x80
+    start = time.perf_counter()
+    for _ in range(repeat):
+        moves = game.generate_moves(color_mask)
+    elapsed = time.perf_counter() - start
+    return {"calls": repeat, "moves": len(moves), "calls_per_sec": repeat / elapsed}
+
+
+def run_suite(depth=3, attack_positions=100):
+    """Run the full benchmark suite and return the results as a dict"""
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "depth": depth,
+        "positions": [],
+    }
+    for name, fen in POSITIONS.items():
+        entry = bench_perft(name, fen, depth)
+        entry["movegen"] = bench_movegen(fen)
+        results["positions"].append(entry)
+    results["attacks"] = bench_attacks(random_positions(attack_positions))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """List positions whose nodes/sec fell more than tolerance below the baseline"""
+    previous = {entry["name"]: entry for entry in baseline.get("positions", [])}
+    regressions = []
+    for entry in results["positions"]:
+        old = previous.get(entry["name"])
+        if old and old["depth"] == entry["depth"] and entry["nps"] < old["nps"] * (1 - tolerance):
+            regressions.append(f"{entry['name']}: {entry['nps']:.0f} nps vs {old['nps']:.0f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Video Chess move generation benchmarks")
+    parser.add_argument("--depth", type=int, default=3, help="perft depth (default 3)")
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON ('-' for stdout)")
+    parser.add_argument("--baseline", metavar="FILE", help="JSON results to compare nodes/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed nodes/sec drop versus the baseline (default 0.10)")
+    args = parser.parse_args()
+
+    results = run_suite(args.depth)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        for entry in results["positions"]:
+            status = "ok" if entry["ok"] else f"MISMATCH (expected {entry['expected']})"
+            print(f"{entry['name']:16s} perft({entry['depth']}) = {entry['nodes']:9d}  "
+                  f"{entry['nps']:10.0f} nps  {entry['movegen']['calls_per_sec']:8.0f} movegen/s  {status}")
+        attacks = results["attacks"]
+        print(f"{'attacks':16s} scan {attacks['scan']['calls_per_sec']:.0f}/s, "
+              f"reverse {attacks['reverse']['calls_per_sec']:.0f}/s ({attacks['speedup']:.1f}x)")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+    failed = not all(entry["ok"] for entry in results["positions"])
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
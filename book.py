@@ -0,0 +1,196 @@
+"""
+Atari 2600 Video Chess - Opening Book
+Sorted binary file of (Zobrist key, move, weight) entries that is searched
+in place through mmap, so opening the book costs nothing and a lookup is a
+binary search over the mapped pages
+
+    python selfplay.py --games 200 --output games.jsonl
+    python book.py games.jsonl --output book.bin
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+
+from video_chess import VideoChess, parse_square
+
+# Big-endian so byte order of the file matches key order
+ENTRY = struct.Struct(">QHH")  # key, source << 6 | dest, weight
+KEY = struct.Struct(">Q")
+ENTRY_SIZE = ENTRY.size
+MAX_WEIGHT = 0xFFFF
+
+# File header: magic + format version, padded to 8 bytes
+MAGIC = b"VCBOOK"
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION, 0])
+HEADER_SIZE = len(HEADER)
+
+# Weight a move earns from the result of the game it was played in
+RESULT_WEIGHTS = {"win": 2, "draw": 1, "loss": 0, None: 1}
+
+
+def encode_move(move):
+    return (move[0] << 6) | move[1]
+
+
+def decode_move(value):
+    return (value >> 6, value & 0x3F)
+
+
+def parse_game(line):
+    """(moves, result) from a self-play JSON line or a line of coordinate moves
+
+    result is '1-0', '0-1', '1/2-1/2' or None when the line doesn't say.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return [], None
+    if line.startswith("{"):
+        record = json.loads(line)
+        names, result = record.get("moves", []), record.get("result")
+    else:
+        names, result = line.split(), None
+        if names and names[-1] in ("1-0", "0-1", "1/2-1/2", "*"):
+            result = names.pop()
+    moves = []
+    for name in names:
+        source, dest = parse_square(name[:2]), parse_square(name[2:4])
+        if source < 0 or dest < 0:
+            raise ValueError(f"Bad move {name!r}")
+        moves.append((source, dest))
+    return moves, result
+
+
+def collect(games, max_plies=20):
+    """Replay games and total the weight of each (key, move) pair"""
+    weights = {}
+    game = VideoChess(book_path=None)
+    for moves, result in games:
+        game.init_board()
+        for move in moves[:max_plies]:
+            if not game.is_valid_move(*move) or game.game_flags & 0x80:
+                break  # Record left the engine's rules; skip the rest of it
+            side = game.current_player
+            if result == "1/2-1/2":
+                outcome = "draw"
+            elif result in ("1-0", "0-1"):
+                outcome = "win" if (result == "1-0") == (side == 0) else "loss"
+            else:
+                outcome = None
+            entry = (game.hash_key, encode_move(move))
+            weights[entry] = weights.get(entry, 0) + RESULT_WEIGHTS[outcome]
+            game.make_move(move)
+    return weights
+
+
+def write_book(weights, path, min_weight=1):
+    """Write (key, move) -> weight entries sorted by key; returns the entry count"""
+    entries = sorted((key, move, min(weight, MAX_WEIGHT))
+                     for (key, move), weight in weights.items() if weight >= min_weight)
+    with open(path, "wb") as file:
+        file.write(HEADER)
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    return len(entries)
+
+
+class OpeningBook:
+    """Read-only, memory-mapped opening book"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER_SIZE:
+            self.file.close()
+            raise ValueError(f"{path} is not an opening book")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIC)] != MAGIC or self.mmap[len(MAGIC)] != VERSION:
+            self.mmap.close()
+            self.file.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.count = (size - HEADER_SIZE) // ENTRY_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, key):
+        """All (move, weight) entries for a Zobrist key"""
+        data = self.mmap
+        low, high = 0, self.count
+        while low < high:  # Leftmost entry with this key
+            mid = (low + high) // 2
+            if KEY.unpack_from(data, HEADER_SIZE + mid * ENTRY_SIZE)[0] < key:
+                low = mid + 1
+            else:
+                high = mid
+
+        moves = []
+        offset = HEADER_SIZE + low * ENTRY_SIZE
+        end = HEADER_SIZE + self.count * ENTRY_SIZE
+        while offset < end:
+            entry_key, move, weight = ENTRY.unpack_from(data, offset)
+            if entry_key != key:
+                break
+            moves.append((decode_move(move), weight))
+            offset += ENTRY_SIZE
+        return moves
+
+    def choose(self, game, rng=random):
+        """Weighted-random book move for game's position, or None"""
+        white = 0x08 if game.current_player == 0 else 0
+        candidates = [entry for entry in self.lookup(game.hash_key) if entry[1]]
+        while candidates:
+            pick = rng.randrange(sum(weight for _, weight in candidates))
+            for index, (move, weight) in enumerate(candidates):
+                pick -= weight
+                if pick < 0:
+                    break
+            # Only the picked move is validated; a key collision just drops it
+            piece = game.board[move[0]]
+            if piece and (piece & 0x08) == white and game.is_valid_move(*move):
+                return move
+            del candidates[index]
+        return None
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Video Chess opening book")
+    parser.add_argument("games", nargs="+",
+                        help="self-play JSON lines or text files with one game of coordinate moves per line")
+    parser.add_argument("--output", default="book.bin", help="book file to write (default book.bin)")
+    parser.add_argument("--plies", type=int, default=20, help="book depth in plies (default 20)")
+    parser.add_argument("--min-weight", type=int, default=2,
+                        help="drop moves with less total weight than this (default 2)")
+    args = parser.parse_args(argv)
+
+    def games():
+        for path in args.games:
+            with open(path) as file:
+                for line in file:
+                    moves, result = parse_game(line)
+                    if moves:
+                        yield moves, result
+
+    weights = collect(games(), args.plies)
+    count = write_book(weights, args.output, args.min_weight)
+    print(f"Wrote {count} entries ({len(weights)} before filtering) to {args.output}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
+import argparse
+import json
 import pygame
 import sys
+import time
+import profiler
+from ai_worker import AIWorker
 from video_chess import VideoChess
 
+# Events posted by the AI worker's listener thread
+AI_PROGRESS_EVENT = pygame.USEREVENT + 1
+AI_MOVE_EVENT = pygame.USEREVENT + 2
+
+# Seconds between profiler overlay refreshes
+OVERLAY_INTERVAL = 0.5
+
 class ChessGUI:
-    def __init__(self):
+    def __init__(self, profile=False, profile_path=None, cache_path=None, search_workers=1):
         pygame.init()
         self.size = 640
         self.square_size = self.size // 8
@@ -23,6 +35,26 @@ class ChessGUI:
         self.input_text = ""
         self.game_over_message = ""
         
+        # Background AI search (worker process started on first use)
+        self.worker = None
+        self.cache_path = cache_path  # Persistent evaluation cache for the worker, or None
+        self.search_workers = search_workers  # Processes per AI search, 1 for a plain search
+        self.thinking = False
+        self.search_info = None
+        self.move_now_rect = pygame.Rect(self.size - 150, self.size + 85, 140, 34)
+        
+        # Instrumentation (off unless asked for; F3 toggles the overlay)
+        self.profiler = None
+        if profile:
+            self.profiler = profiler.Profiler()
+            self.profiler.attach(self.game)
+        self.profile_path = profile_path  # JSON dump written on quit
+        self.show_overlay = profile
+        self.overlay_font = pygame.font.Font(None, 22)
+        self.overlay_rect = pygame.Rect(4, 4, 310, 112)
+        self.overlay_surface = None
+        self.overlay_updated = 0.0
+        
         # Colors
         self.WHITE = (240, 217, 181)
         self.BLACK = (181, 136, 99)
@@ -35,52 +67,110 @@ class ChessGUI:
         self.white_pieces = {
             1: '♔', 2: '♕', 3: '♗', 4: '♘', 5: '♖', 6: '♙'  # White
         }
+        
+        # Cached rendering: static background, glyph surfaces and what is
+        # currently on screen, so frames only redraw what changed
+        self.ui_rect = pygame.Rect(0, self.size + 35, self.size + 40, 95)
+        self.build_surfaces()
+        self.invalidate()
     
-    def draw_board(self):
+    def build_surfaces(self):
+        """Pre-render piece glyphs and the static background (squares and labels)"""
+        # Glyphs keyed by piece & 0x0F (type plus white bit)
+        self.glyphs = {}
+        for piece_type in range(1, 7):
+            self.glyphs[piece_type] = self.piece_font.render(self.pieces[piece_type], True, (0, 0, 0))
+            self.glyphs[piece_type | 0x08] = self.piece_font.render(
+                self.white_pieces[piece_type], True, (0, 0, 0))
+        
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background.fill((200, 200, 200))
         for row in range(8):
             for col in range(8):
                 color = self.WHITE if (row + col) % 2 == 0 else self.BLACK
-                rect = pygame.Rect(col * self.square_size, row * self.square_size, 
-                                 self.square_size, self.square_size)
-                pygame.draw.rect(self.screen, color, rect)
-                
-                # Draw piece (flip row for chess convention)
-                square = (7 - row) * 8 + col
-                piece = self.game.board[square]
-                if piece != 0:
-                    piece_type = piece & 0x0F
-                    is_white = piece & 0x08
-                    symbol = self.white_pieces[piece_type] if is_white else self.pieces[piece_type]
-                    
-                    text = self.piece_font.render(symbol, True, (0, 0, 0))
-                    text_rect = text.get_rect(center=rect.center)
-                    self.screen.blit(text, text_rect)
+                pygame.draw.rect(self.background, color, self.square_rect(row, col))
         
         # Draw column letters (A-H) at bottom
         for col in range(8):
             letter = chr(ord('A') + col)
             text = self.ui_font.render(letter, True, (0, 0, 0))
             x = col * self.square_size + self.square_size // 2 - text.get_width() // 2
-            self.screen.blit(text, (x, self.size + 5))
+            self.background.blit(text, (x, self.size + 5))
         
         # Draw row numbers (1-8) on right side
         for row in range(8):
             number = str(8 - row)  # Chess rows are numbered 8-1 from top to bottom
             text = self.ui_font.render(number, True, (0, 0, 0))
             y = row * self.square_size + self.square_size // 2 - text.get_height() // 2
-            self.screen.blit(text, (self.size + 5, y))
+            self.background.blit(text, (self.size + 5, y))
+    
+    def square_rect(self, row, col):
+        """Screen rectangle of a board square (row 0 is the top rank)"""
+        return pygame.Rect(col * self.square_size, row * self.square_size,
+                           self.square_size, self.square_size)
+    
+    def invalidate(self):
+        """Force a full redraw on the next frame (startup, window exposed)"""
+        self.screen.blit(self.background, (0, 0))
+        self.drawn_board = [None] * 64
+        self.drawn_ui = None
+        self.full_redraw = True
+    
+    def draw_board(self):
+        """Redraw the squares whose piece changed since the last frame; returns dirty rects"""
+        dirty = []
+        board = self.game.board
+        for square in range(64):
+            piece = board[square] & 0x0F
+            if piece == self.drawn_board[square]:
+                continue
+            self.drawn_board[square] = piece
+            
+            # Flip row for chess convention
+            rect = self.square_rect(7 - square // 8, square % 8)
+            self.screen.blit(self.background, rect, rect)
+            if piece != 0:
+                glyph = self.glyphs[piece]
+                self.screen.blit(glyph, glyph.get_rect(center=rect.center))
+            dirty.append(rect)
+        return dirty
     
     def draw_ui(self):
+        """Redraw the text area below the board if its contents changed; returns dirty rects"""
         # Check for game over
         if self.game.game_flags & 0x80:
             if not self.game_over_message:
-                winner = "White" if self.game.captured_piece & 0x80 else "Black"
-                self.game_over_message = f"Game Over! {winner} wins!"
+                if self.game.game_status() == "stalemate":
+                    self.game_over_message = "Stalemate! It's a draw"
+                else:
+                    # The checkmated side is the one to move
+                    winner = "Black" if self.game.current_player == 0 else "White"
+                    self.game_over_message = f"Checkmate! {winner} wins!"
+        
+        state = (self.game_over_message, self.thinking, self.search_info, self.input_text)
+        if state == self.drawn_ui:
+            return []
+        self.drawn_ui = state
+        self.screen.blit(self.background, self.ui_rect, self.ui_rect)
         
         if self.game_over_message:
             # Game over message
             text = self.ui_font.render(self.game_over_message, True, (255, 0, 0))
             self.screen.blit(text, (10, self.size + 50))
+        elif self.thinking:
+            # Thinking indicator with search progress
+            info = self.search_info
+            status = "Thinking..."
+            if info:
+                status += f" depth {info['depth']}  {info['nodes']} nodes  {info['nps'] / 1000:.1f}k nps"
+            text = self.ui_font.render(status, True, (0, 0, 0))
+            self.screen.blit(text, (15, self.size + 50))
+            
+            # Move-now button
+            pygame.draw.rect(self.screen, (255, 255, 255), self.move_now_rect)
+            pygame.draw.rect(self.screen, (0, 0, 0), self.move_now_rect, 2)
+            label = self.ui_font.render("Move now", True, (0, 0, 0))
+            self.screen.blit(label, label.get_rect(center=self.move_now_rect.center))
         else:
             # Input area
             input_rect = pygame.Rect(10, self.size + 40, self.size - 20, 40)
@@ -92,8 +182,35 @@ class ChessGUI:
             self.screen.blit(text, (15, self.size + 50))
             
             # Instructions
-            inst = self.ui_font.render("Enter move (e.g., A2 B4 or A2B4)", True, (0, 0, 0))
+            inst = self.ui_font.render("Enter move (e.g., A2 B4 or A2B4), Ctrl+Z to undo", True, (0, 0, 0))
             self.screen.blit(inst, (10, self.size + 90))
+        
+        return [self.ui_rect]
+    
+    def profile_snapshot(self):
+        """GUI frame timings plus the AI worker's function and search counters"""
+        snapshot = self.profiler.snapshot()
+        if self.worker is not None and self.worker.profile is not None:
+            snapshot["functions"] = self.worker.profile["functions"]
+            snapshot["search"] = self.worker.profile["search"]
+        return snapshot
+    
+    def draw_overlay(self, dirty):
+        """Profiler counters over the top-left of the board; returns dirty rects"""
+        if not self.show_overlay:
+            return []
+        now = time.perf_counter()
+        if now - self.overlay_updated >= OVERLAY_INTERVAL:
+            self.overlay_updated = now
+            self.overlay_surface = pygame.Surface(self.overlay_rect.size)
+            self.overlay_surface.fill((20, 20, 20))
+            for i, line in enumerate(profiler.summary_lines(self.profile_snapshot())):
+                text = self.overlay_font.render(line, True, (0, 255, 0))
+                self.overlay_surface.blit(text, (6, 5 + i * 17))
+        elif not self.full_redraw and self.overlay_rect.collidelist(dirty) < 0:
+            return []  # Nothing drew over it
+        self.screen.blit(self.overlay_surface, self.overlay_rect)
+        return [self.overlay_rect]
     
     def parse_move(self, text):
         """Parse simple notation like 'A2 B4' or 'A2B4'"""
@@ -126,24 +243,99 @@ class ChessGUI:
             if self.game.validate_move():
                 self.game.execute_move()
                 self.game.current_player = 1
+                self.game.check_game_over()
                 return True
         return False
     
+    def start_ai(self):
+        """Start the AI search in the background; the move arrives as AI_MOVE_EVENT"""
+        if self.worker is None:
+            self.worker = AIWorker(
+                on_progress=lambda info, job_id: pygame.event.post(
+                    pygame.event.Event(AI_PROGRESS_EVENT, info=info, job_id=job_id)),
+                on_result=lambda move, job_id: pygame.event.post(
+                    pygame.event.Event(AI_MOVE_EVENT, move=move, job_id=job_id)),
+                search_workers=self.search_workers,
+                profile=self.profiler is not None,
+                cache_path=self.cache_path)
+        self.thinking = True
+        self.search_info = None
+        self.worker.start(self.game)
+    
+    def is_current(self, event):
+        """Whether an AI event belongs to the search still running"""
+        return self.thinking and self.worker is not None and event.job_id == self.worker.job_id
+    
+    def stop_ai(self):
+        """Cancel a running AI search without playing its move"""
+        if self.thinking:
+            self.worker.cancel()
+            self.thinking = False
+    
+    def quit(self):
+        """Shut down the AI worker and exit"""
+        if self.profiler is not None and self.profile_path:
+            with open(self.profile_path, "w") as file:
+                json.dump(self.profile_snapshot(), file, indent=2, default=list)
+        if self.worker is not None:
+            self.worker.close()
+        pygame.quit()
+        sys.exit()
+    
+    def take_back(self):
+        """Undo the AI reply and the player's move before it"""
+        self.stop_ai()
+        if not self.game.undo_stack:
+            return
+        self.game.unmake_move()
+        while self.game.undo_stack and self.game.current_player != 0:
+            self.game.unmake_move()
+        self.game_over_message = ""
+    
     def run(self):
         clock = pygame.time.Clock()
         
         while True:
+            frame_start = time.perf_counter() if self.profiler is not None else 0.0
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    self.quit()
+                
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.invalidate()
+                
+                elif event.type in (AI_PROGRESS_EVENT, AI_MOVE_EVENT) and not self.is_current(event):
+                    # Posted before a take back or cancel; the board has moved on
+                    pass
+                
+                elif event.type == AI_PROGRESS_EVENT:
+                    self.search_info = event.info
+                
+                elif event.type == AI_MOVE_EVENT:
+                    self.thinking = False
+                    self.game.play_ai_move(event.move)
+                
+                elif self.thinking and (
+                        (event.type == pygame.MOUSEBUTTONDOWN and self.move_now_rect.collidepoint(event.pos))
+                        or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE)):
+                    # Play the best move found so far
+                    self.worker.move_now()
+                
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self.profiler is not None:
+                    # F3 shows or hides the profiler overlay
+                    self.show_overlay = not self.show_overlay
+                    self.invalidate()
+                
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                    # Ctrl+Z takes back the last turn
+                    self.take_back()
                 
-                elif event.type == pygame.KEYDOWN and not (self.game.game_flags & 0x80):
+                elif event.type == pygame.KEYDOWN and not (self.game.game_flags & 0x80) and not self.thinking:
                     if event.key == pygame.K_RETURN:
                         move = self.parse_move(self.input_text)
-                        if move and self.make_move(*move):
+                        if move and self.make_move(*move) and not (self.game.game_flags & 0x80):
                             # AI move
-                            self.game.process_ai_move()
+                            self.start_ai()
                         self.input_text = ""
                     
                     elif event.key == pygame.K_BACKSPACE:
@@ -152,12 +344,26 @@ class ChessGUI:
                     else:
                         self.input_text += event.unicode
             
-            self.screen.fill((200, 200, 200))
-            self.draw_board()
-            self.draw_ui()
-            pygame.display.flip()
+            dirty = self.draw_board() + self.draw_ui()
+            dirty += self.draw_overlay(dirty)
+            if self.full_redraw:
+                pygame.display.flip()
+                self.full_redraw = False
+            elif dirty:
+                pygame.display.update(dirty)
+            if self.profiler is not None:
+                self.profiler.record_frame(time.perf_counter() - frame_start)
             clock.tick(60)
 
 if __name__ == "__main__":
-    gui = ChessGUI()
+    parser = argparse.ArgumentParser(description="Atari Video Chess")
+    parser.add_argument("--profile", nargs="?", const="", metavar="FILE",
+                        help="instrument the engine, show the overlay (F3) and dump JSON to FILE on quit")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="keep search results in FILE and reuse them in later games")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes per AI search; above 1 runs a parallel search (default 1)")
+    args = parser.parse_args()
+    gui = ChessGUI(profile=args.profile is not None, profile_path=args.profile or None,
+                   cache_path=args.cache, search_workers=max(1, args.workers))
     gui.run()
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Atari 2600 Video Chess - Persistent Evaluation Cache
+Search results (depth, bound, score, best move) keyed by Zobrist hash in
+an SQLite file, so positions searched by one game, process or restart are
+known to the next. The file is in WAL mode: any number of processes read
+it while one at a time writes. Results are queued in memory and written
+by a background thread in batches; a process that exits without close()
+loses at most the last flush interval. Entries used least recently are
+dropped once the file holds more than max_entries.
+
+    cache = EvalCache("evalcache.db")
+    cache.warm(tt)   # preload the transposition table
+    cache.store(game.hash_key, depth, transposition.EXACT, score, move)
+    cache.close()
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+
+import transposition
+
+DEFAULT_MAX_ENTRIES = 1000000
+# Trim back to this fraction of the cap, so trimming isn't done on every flush
+TRIM_TO = 0.9
+# Seconds between background writes, and queued results that force one sooner
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 512
+# Most recently used entries loaded into a transposition table by warm()
+WARM_ENTRIES = 50000
+# Seconds a connection waits for another process's write to finish
+BUSY_TIMEOUT = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key INTEGER PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    bound INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    move INTEGER,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+UPSERT = """
+INSERT INTO results (key, depth, bound, score, move, used) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET depth = excluded.depth, bound = excluded.bound,
+    score = excluded.score, move = excluded.move, used = excluded.used
+WHERE excluded.depth >= results.depth
+"""
+
+
+def _signed(key):
+    """Zobrist key as the signed 64-bit integer SQLite stores"""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def _now():
+    """LRU stamp: milliseconds, comparable between processes"""
+    return int(time.time() * 1000)
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class EvalCache:
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.reader = _connect(path)
+        self.reader.executescript(SCHEMA)
+
+        # Written by the background thread; guarded by lock
+        self.lock = threading.Condition()
+        self.pending = {}  # key -> (depth, bound, score, move)
+        self.touched = set()  # Keys read since the last write, for the LRU stamps
+        self.flushed = 0  # Writes completed, for flush() to wait on
+        self.closing = False
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+        # Statistics
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.write_errors = 0
+
+    def __len__(self):
+        """Entries in the file (not counting results still queued)"""
+        return self.reader.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def probe(self, key):
+        """(depth, bound, score, move) stored for key, or None"""
+        self.probes += 1
+        with self.lock:
+            entry = self.pending.get(key)
+        if entry is None:
+            row = self.reader.execute("SELECT depth, bound, score, move FROM results WHERE key = ?",
+                                      (_signed(key),)).fetchone()
+            if row is None:
+                return None
+            depth, bound, score, move = row
+            entry = (depth, bound, score, None if move is None else (move >> 6, move & 0x3F))
+        self.hits += 1
+        with self.lock:
+            self.touched.add(key)
+        return entry
+
+    def store(self, key, depth, bound, score, move=None):
+        """Queue a result for the next write, keeping the deeper of two for one key"""
+        self.stores += 1
+        with self.lock:
+            queued = self.pending.get(key)
+            if queued is None or depth >= queued[0]:
+                self.pending[key] = (depth, bound, score, move)
+            if len(self.pending) >= BATCH_SIZE:
+                self.lock.notify_all()
+
+    def warm(self, tt, limit=WARM_ENTRIES):
+        """Load the most recently used entries into a TranspositionTable; returns the count"""
+        rows = self.reader.execute(
+            "SELECT key, depth, bound, score, move FROM results ORDER BY used DESC LIMIT ?",
+            (min(limit, len(tt)),)).fetchall()
+        # Oldest first, so the newest win when two share a bucket slot
+        for key, depth, bound, score, move in reversed(rows):
+            tt.store(key & 0xFFFFFFFFFFFFFFFF, depth, bound, score,
+                     None if move is None else (move >> 6, move & 0x3F))
+        return len(rows)
+
+    def flush(self):
+        """Write everything queued so far and wait until it is on disk"""
+        with self.lock:
+            if not self.writer.is_alive():
+                return
+            target = self.flushed + 2  # A write already under way may predate the call
+            self.lock.notify_all()
+            while self.flushed < target and self.writer.is_alive():
+                self.lock.wait(self.flush_interval)
+                self.lock.notify_all()
+
+    def close(self):
+        """Write the queue and stop the background thread"""
+        with self.lock:
+            if self.closing:
+                return
+            self.closing = True
+            self.lock.notify_all()
+        self.writer.join()
+        self.reader.close()
+        atexit.unregister(self.close)
+
+    def _write_loop(self):
+        connection = _connect(self.path)
+        try:
+            while True:
+                with self.lock:
+                    if not self.closing:
+                        self.lock.wait(self.flush_interval)
+                    pending, self.pending = self.pending, {}
+                    touched, self.touched = self.touched, set()
+                    closing = self.closing
+                if pending or touched:
+                    try:
+                        self._write(connection, pending, touched)
+                    except sqlite3.Error:
+                        self.write_errors += 1  # Only a cache: drop the batch, keep going
+                with self.lock:
+                    self.flushed += 1
+                    self.lock.notify_all()
+                if closing:
+                    break
+        finally:
+            connection.close()
+
+    def _write(self, connection, pending, touched):
+        """One transaction: upsert the queued results, stamp the read ones, trim"""
+        now = _now()
+        rows = [(_signed(key), depth, bound, score,
+                 None if move is None else move[0] << 6 | move[1], now)
+                for key, (depth, bound, score, move) in pending.items()]
+        stamps = [(now, _signed(key)) for key in touched - pending.keys()]
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(UPSERT, rows)
+            connection.executemany("UPDATE results SET used = ? WHERE key = ?", stamps)
+            count = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if count > self.max_entries:
+                connection.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY used LIMIT ?)",
+                    (count - int(self.max_entries * TRIM_TO),))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+
+def root_entry(cache, game, max_depth):
+    """Cached best move for game's position if it was searched to max_depth
+    or deeper with an exact score, and the move is legal here; else None"""
+    entry = cache.probe(game.hash_key)
+    if entry is None:
+        return None
+    depth, bound, _, move = entry
+    if depth < max_depth or bound != transposition.EXACT or move is None:
+        return None
+    legal = game.generate_moves(0x08 if game.current_player == 0 else 0x80)
+    return move if move in legal else None
@@ -0,0 +1,137 @@
+"""
+Atari 2600 Video Chess - Evaluation Tables
+Material plus piece-square tables, with separate opening and endgame king
+tables blended by game phase. VideoChess keeps the sums up to date in
+make_move so evaluating a position is O(1).
+"""
+
+# ROM piece values (as VideoChess.piece_values) in centipawns; the king is
+# left out because a captured king ends the game before evaluation
+PIECE_VALUES = [0, 100, 9, 3, 3, 5, 1]
+MATERIAL = [0, 0] + [value * 100 for value in PIECE_VALUES[2:]]
+
+# Phase weight per piece type; 24 is the full opening set
+PHASE_WEIGHTS = [0, 0, 4, 1, 1, 2, 0, 0]
+MAX_PHASE = 24
+
+# Piece-square tables from white's side, rank 8 first (as a board diagram)
+PAWN_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+KNIGHT_TABLE = [
+   -50, -40, -30, -30, -30, -30, -40, -50,
+   -40, -20,   0,   0,   0,   0, -20, -40,
+   -30,   0,  10,  15,  15,  10,   0, -30,
+   -30,   5,  15,  20,  20,  15,   5, -30,
+   -30,   0,  15,  20,  20,  15,   0, -30,
+   -30,   5,  10,  15,  15,  10,   5, -30,
+   -40, -20,   0,   5,   5,   0, -20, -40,
+   -50, -40, -30, -30, -30, -30, -40, -50,
+]
+BISHOP_TABLE = [
+   -20, -10, -10, -10, -10, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,  10,  10,   5,   0, -10,
+   -10,   5,   5,  10,  10,   5,   5, -10,
+   -10,   0,  10,  10,  10,  10,   0, -10,
+   -10,  10,  10,  10,  10,  10,  10, -10,
+   -10,   5,   0,   0,   0,   0,   5, -10,
+   -20, -10, -10, -10, -10, -10, -10, -20,
+]
+ROOK_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0,
+]
+QUEEN_TABLE = [
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,   5,   5,   5,   0, -10,
+    -5,   0,   5,   5,   5,   5,   0,  -5,
+     0,   0,   5,   5,   5,   5,   0,  -5,
+   -10,   5,   5,   5,   5,   5,   0, -10,
+   -10,   0,   5,   0,   0,   0,   0, -10,
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+# Opening king: stay castled behind the pawns
+KING_OPENING_TABLE = [
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -20, -30, -30, -40, -40, -30, -30, -20,
+   -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,   0,   0,   0,   0,  20,  20,
+    20,  30,  10,   0,   0,  10,  30,  20,
+]
+# Endgame king: head for the center
+KING_ENDGAME_TABLE = [
+   -50, -40, -30, -20, -20, -30, -40, -50,
+   -30, -20, -10,   0,   0, -10, -20, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -30,   0,   0,   0,   0, -30, -30,
+   -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+# Indexed by piece type; the king entry differs between the two phases
+_OPENING_TABLES = [None, KING_OPENING_TABLE, QUEEN_TABLE, BISHOP_TABLE,
+                   KNIGHT_TABLE, ROOK_TABLE, PAWN_TABLE, None]
+_ENDGAME_TABLES = [None, KING_ENDGAME_TABLE, QUEEN_TABLE, BISHOP_TABLE,
+                   KNIGHT_TABLE, ROOK_TABLE, PAWN_TABLE, None]
+
+
+def _build_scores(tables):
+    """Signed material + PST score indexed by [piece byte][square] (white positive)"""
+    scores = []
+    for piece in range(256):
+        piece_type = piece & 0x07
+        table = tables[piece_type]
+        if table is None:
+            scores.append([0] * 64)
+            continue
+        row_scores = []
+        for square in range(64):
+            row, col = square // 8, square % 8
+            if piece & 0x08:  # White - flip rows to read the diagram
+                row_scores.append(MATERIAL[piece_type] + table[(7 - row) * 8 + col])
+            else:  # Black - the diagram mirrored
+                row_scores.append(-(MATERIAL[piece_type] + table[row * 8 + col]))
+        scores.append(row_scores)
+    return scores
+
+
+OPENING_SCORES = _build_scores(_OPENING_TABLES)
+ENDGAME_SCORES = _build_scores(_ENDGAME_TABLES)
+PHASE = [PHASE_WEIGHTS[piece & 0x07] for piece in range(256)]
+
+
+def full_recompute(board):
+    """Compute (opening score, endgame score, phase) from scratch"""
+    opening = endgame = phase = 0
+    for square, piece in enumerate(board):
+        if piece:
+            opening += OPENING_SCORES[piece][square]
+            endgame += ENDGAME_SCORES[piece][square]
+            phase += PHASE[piece]
+    return opening, endgame, phase
+
+
+def blend(opening, endgame, phase):
+    """Taper between opening and endgame scores by remaining material"""
+    phase = min(phase, MAX_PHASE)
+    return (opening * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
@@ -0,0 +1,480 @@
+"""
+Atari 2600 Video Chess - Move Generation Tables
+Precomputed knight/king tables and sliding rays for every square, so each
+piece's moves are generated in one pass over the board
+"""
+
+# Direction order matches the original VideoChess.get_piece_moves loops so
+# generated move lists keep the same ordering
+ROOK_DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_OFFSETS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+
+
+def _build_steps(offsets):
+    """Build per-square destination tuples for single-step pieces"""
+    table = []
+    for square in range(64):
+        row, col = square // 8, square % 8
+        table.append(tuple((row + dr) * 8 + col + dc for dr, dc in offsets
+                           if 0 <= row + dr < 8 and 0 <= col + dc < 8))
+    return tuple(table)
+
+
+def _build_rays(directions):
+    """Build per-square ray tuples (nearest square first) for sliding pieces"""
+    table = []
+    for square in range(64):
+        row, col = square // 8, square % 8
+        rays = []
+        for dr, dc in directions:
+            ray = []
+            nr, nc = row + dr, col + dc
+            while 0 <= nr < 8 and 0 <= nc < 8:
+                ray.append(nr * 8 + nc)
+                nr, nc = nr + dr, nc + dc
+            if ray:
+                rays.append(tuple(ray))
+        table.append(tuple(rays))
+    return tuple(table)
+
+
+def _build_pawn_tables():
+    """Build forward-step and diagonal tables indexed by [is_white][square]"""
+    pushes = ([], [])
+    captures = ([], [])
+    for is_white, direction in ((0, -1), (1, 1)):
+        for square in range(64):
+            row, col = square // 8, square % 8
+            new_row = row + direction
+            if 0 <= new_row < 8:
+                pushes[is_white].append(new_row * 8 + col)
+                captures[is_white].append(tuple(new_row * 8 + col + dc for dc in (-1, 1)
+                                                if 0 <= col + dc < 8))
+            else:
+                pushes[is_white].append(-1)
+                captures[is_white].append(())
+    return (tuple(pushes[0]), tuple(pushes[1])), (tuple(captures[0]), tuple(captures[1]))
+
+
+KNIGHT_MOVES = _build_steps(KNIGHT_OFFSETS)
+KING_MOVES = _build_steps(QUEEN_DIRECTIONS)
+ROOK_RAYS = _build_rays(ROOK_DIRECTIONS)
+BISHOP_RAYS = _build_rays(BISHOP_DIRECTIONS)
+QUEEN_RAYS = _build_rays(QUEEN_DIRECTIONS)
+PAWN_PUSHES, PAWN_CAPTURES = _build_pawn_tables()
+
+# Indexed by piece type (piece & 0x07); None for non-sliding pieces
+SLIDER_RAYS = (None, None, QUEEN_RAYS, BISHOP_RAYS, None, ROOK_RAYS, None, None)
+
+# Pawn start ranks used for the two-square advance, indexed by is_white
+PAWN_START_ROW = (6, 1)
+# King start squares used for castling, indexed by is_white
+KING_START = (60, 4)
+# castling_flags bits (FEN K, Q, k, q), indexed by is_white
+KINGSIDE_RIGHT = (0x04, 0x01)
+QUEENSIDE_RIGHT = (0x08, 0x02)
+ALL_CASTLING = 0x0F
+# castling_flags kept when a move touches a square: moving the king or a
+# rook, or capturing a rook in its corner, drops the matching rights
+CASTLING_KEEP = [0xFF] * 64
+for _square, _rights in ((4, 0x03), (7, 0x01), (0, 0x02), (60, 0x0C), (63, 0x04), (56, 0x08)):
+    CASTLING_KEEP[_square] = 0xFF & ~_rights
+
+
+def _build_lines():
+    """Per-square (slider type, ((square, path), ...)) for all eight directions
+
+    Squares run nearest first and path is the bitmask of the ray up to and
+    including that square, so pin and check masks need no shifting at search
+    time. Slider type is the rook (5) or bishop (3) that attacks along the ray.
+    """
+    def line(ray):
+        steps, path = [], 0
+        for square in ray:
+            path |= 1 << square
+            steps.append((square, path))
+        return tuple(steps)
+
+    return tuple(tuple((0x05, line(ray)) for ray in ROOK_RAYS[square] if ray)
+                 + tuple((0x03, line(ray)) for ray in BISHOP_RAYS[square] if ray)
+                 for square in range(64))
+
+
+KING_LINES = _build_lines()
+
+
+def castling_moves(board, square, is_white, castling_flags):
+    """King destinations for castling from its start square: the right is held,
+    the rook is in its corner and the squares between are empty
+
+    Whether the king is in check or crosses an attacked square is left to
+    filter_legal.
+    """
+    rook = 0x0D if is_white else 0x05
+    moves = []
+    if (castling_flags & KINGSIDE_RIGHT[is_white] and board[square + 3] & 0x0F == rook
+            and board[square + 1] == 0 and board[square + 2] == 0):
+        moves.append(square + 2)
+    if (castling_flags & QUEENSIDE_RIGHT[is_white] and board[square - 4] & 0x0F == rook
+            and board[square - 1] == 0 and board[square - 2] == 0 and board[square - 3] == 0):
+        moves.append(square - 2)
+    return moves
+
+
+def piece_moves(board, square, piece_type, en_passant_square=-1, castling_flags=0):
+    """Get destination squares for the piece on square (table-driven get_piece_moves)
+
+    Like the original, the list includes squares occupied by either color;
+    own-piece destinations are filtered out by the caller.
+    """
+    piece = board[square]
+    is_white = 1 if piece & 0x08 else 0
+
+    if piece_type == 6:  # Pawn
+        moves = []
+        forward = PAWN_PUSHES[is_white][square]
+        if forward >= 0 and board[forward] == 0:
+            moves.append(forward)
+            if square // 8 == PAWN_START_ROW[is_white]:
+                double = PAWN_PUSHES[is_white][forward]
+                if board[double] == 0:
+                    moves.append(double)
+        for target_square in PAWN_CAPTURES[is_white][square]:
+            target_piece = board[target_square]
+            if target_piece != 0 and (target_piece & 0x08) != (piece & 0x08):
+                moves.append(target_square)
+            elif target_square == en_passant_square:
+                moves.append(target_square)
+        return moves
+
+    if piece_type == 4:  # Knight
+        return list(KNIGHT_MOVES[square])
+
+    if piece_type == 1:  # King
+        moves = list(KING_MOVES[square])
+        if castling_flags and square == KING_START[is_white]:
+            moves.extend(castling_moves(board, square, is_white, castling_flags))
+        return moves
+
+    moves = []
+    rays = SLIDER_RAYS[piece_type] if 0 <= piece_type < 8 else None
+    if rays:
+        for ray in rays[square]:
+            for dest in ray:
+                moves.append(dest)
+                if board[dest] != 0:
+                    break
+    return moves
+
+
+def generate_moves(board, white, en_passant_square=-1, castling_flags=0):
+    """Generate (source, dest) pairs for every piece of one color in square order
+
+    white is the color bit of the side to move (0x08 for white, 0 for black).
+    Destinations holding a piece of the same color are already excluded;
+    king safety is left to the caller.
+    """
+    moves = []
+    append = moves.append
+    is_white = 1 if white else 0
+    pushes = PAWN_PUSHES[is_white]
+    captures = PAWN_CAPTURES[is_white]
+    start_row = PAWN_START_ROW[is_white]
+
+    for square in range(64):
+        piece = board[square]
+        if piece == 0 or (piece & 0x08) != white:
+            continue
+        piece_type = piece & 0x07
+
+        if piece_type == 6:  # Pawn
+            forward = pushes[square]
+            if forward >= 0 and board[forward] == 0:
+                append((square, forward))
+                if square >> 3 == start_row:
+                    double = pushes[forward]
+                    if board[double] == 0:
+                        append((square, double))
+            for target_square in captures[square]:
+                target_piece = board[target_square]
+                if target_piece != 0:
+                    if (target_piece & 0x08) != white:
+                        append((square, target_square))
+                elif target_square == en_passant_square:
+                    append((square, target_square))
+
+        elif piece_type == 4 or piece_type == 1:  # Knight / King
+            for dest in (KNIGHT_MOVES if piece_type == 4 else KING_MOVES)[square]:
+                target_piece = board[dest]
+                if target_piece == 0 or (target_piece & 0x08) != white:
+                    append((square, dest))
+            if piece_type == 1 and castling_flags and square == KING_START[is_white]:
+                for dest in castling_moves(board, square, is_white, castling_flags):
+                    append((square, dest))
+
+        elif piece_type == 2 or piece_type == 3 or piece_type == 5:  # Sliders
+            for ray in SLIDER_RAYS[piece_type][square]:
+                for dest in ray:
+                    target_piece = board[dest]
+                    if target_piece != 0:
+                        if (target_piece & 0x08) != white:
+                            append((square, dest))
+                        break
+                    append((square, dest))
+
+    return moves
+
+
+def generate_captures(board, white, en_passant_square=-1):
+    """Generate only capturing moves (including en passant) for one color
+
+    Used by staged move ordering and quiescence so that nodes which cut off
+    on a capture never build the quiet moves.
+    """
+    moves = []
+    append = moves.append
+    captures = PAWN_CAPTURES[1 if white else 0]
+
+    for square in range(64):
+        piece = board[square]
+        if piece == 0 or (piece & 0x08) != white:
+            continue
+        piece_type = piece & 0x07
+
+        if piece_type == 6:  # Pawn
+            for target_square in captures[square]:
+                target_piece = board[target_square]
+                if target_piece != 0:
+                    if (target_piece & 0x08) != white:
+                        append((square, target_square))
+                elif target_square == en_passant_square:
+                    append((square, target_square))
+
+        elif piece_type == 4 or piece_type == 1:  # Knight / King
+            for dest in (KNIGHT_MOVES if piece_type == 4 else KING_MOVES)[square]:
+                target_piece = board[dest]
+                if target_piece != 0 and (target_piece & 0x08) != white:
+                    append((square, dest))
+
+        elif piece_type == 2 or piece_type == 3 or piece_type == 5:  # Sliders
+            for ray in SLIDER_RAYS[piece_type][square]:
+                for dest in ray:
+                    target_piece = board[dest]
+                    if target_piece != 0:
+                        if (target_piece & 0x08) != white:
+                            append((square, dest))
+                        break
+
+    return moves
+
+
+def generate_quiets(board, white, en_passant_square=-1, castling_flags=0):
+    """Generate only non-capturing moves (pushes, castling, empty squares)"""
+    moves = []
+    append = moves.append
+    is_white = 1 if white else 0
+    pushes = PAWN_PUSHES[is_white]
+    start_row = PAWN_START_ROW[is_white]
+
+    for square in range(64):
+        piece = board[square]
+        if piece == 0 or (piece & 0x08) != white:
+            continue
+        piece_type = piece & 0x07
+
+        if piece_type == 6:  # Pawn
+            forward = pushes[square]
+            if forward >= 0 and board[forward] == 0:
+                append((square, forward))
+                if square >> 3 == start_row:
+                    double = pushes[forward]
+                    if board[double] == 0:
+                        append((square, double))
+
+        elif piece_type == 4 or piece_type == 1:  # Knight / King
+            for dest in (KNIGHT_MOVES if piece_type == 4 else KING_MOVES)[square]:
+                if board[dest] == 0:
+                    append((square, dest))
+            if piece_type == 1 and castling_flags and square == KING_START[is_white]:
+                for dest in castling_moves(board, square, is_white, castling_flags):
+                    append((square, dest))
+
+        elif piece_type == 2 or piece_type == 3 or piece_type == 5:  # Sliders
+            for ray in SLIDER_RAYS[piece_type][square]:
+                for dest in ray:
+                    if board[dest] != 0:
+                        break
+                    append((square, dest))
+
+    return moves
+
+
+def is_square_attacked(board, square, white):
+    """Check if square is attacked by pieces of the color whose bit is white
+
+    Works outward from the target: knight and king tables, the two pawn
+    diagonals and the first blocker along each ray.
+    """
+    for source in KNIGHT_MOVES[square]:
+        piece = board[source]
+        if piece & 0x07 == 4 and (piece & 0x08) == white:
+            return True
+
+    for source in KING_MOVES[square]:
+        piece = board[source]
+        if piece & 0x07 == 1 and (piece & 0x08) == white:
+            return True
+
+    # Attacking pawns sit on the diagonals the defending side's pawns capture along
+    for source in PAWN_CAPTURES[0 if white else 1][square]:
+        piece = board[source]
+        if piece & 0x07 == 6 and (piece & 0x08) == white:
+            return True
+
+    for ray in ROOK_RAYS[square]:
+        for source in ray:
+            piece = board[source]
+            if piece:
+                piece_type = piece & 0x07
+                if (piece_type == 5 or piece_type == 2) and (piece & 0x08) == white:
+                    return True
+                break
+
+    for ray in BISHOP_RAYS[square]:
+        for source in ray:
+            piece = board[source]
+            if piece:
+                piece_type = piece & 0x07
+                if (piece_type == 3 or piece_type == 2) and (piece & 0x08) == white:
+                    return True
+                break
+
+    return False
+
+
+def king_safety(board, white):
+    """(king square, checker count, check mask, pins) for the side whose color bit is white
+
+    check_mask has a bit for each square that blocks or captures the single
+    checker; pins maps a pinned piece's square to the bitmask of squares it
+    may still move to (the ray from the king up to and including the pinner).
+    King square is -1 when the side has no king.
+    """
+    king_piece = 0x09 if white else 0x01
+    try:
+        king = board.index(king_piece)
+    except ValueError:
+        return -1, 0, 0, {}
+    enemy = white ^ 0x08
+    checkers = 0
+    check_mask = 0
+    pins = {}
+
+    for slider, ray in KING_LINES[king]:
+        own = -1
+        for square, path in ray:
+            piece = board[square]
+            if not piece:
+                continue
+            if (piece & 0x08) == white:
+                if own >= 0:
+                    break  # Two of our pieces: no pin on this line
+                own = square
+                continue
+            piece_type = piece & 0x07
+            if piece_type == 2 or piece_type == slider:
+                if own < 0:
+                    checkers += 1
+                    check_mask |= path
+                else:
+                    pins[own] = path
+            break
+
+    knight = enemy | 0x04
+    for square in KNIGHT_MOVES[king]:
+        if board[square] & 0x0F == knight:
+            checkers += 1
+            check_mask |= 1 << square
+    pawn = enemy | 0x06
+    for square in PAWN_CAPTURES[1 if white else 0][king]:
+        if board[square] & 0x0F == pawn:
+            checkers += 1
+            check_mask |= 1 << square
+
+    return king, checkers, check_mask, pins
+
+
+def filter_legal(board, white, moves, en_passant_square=-1):
+    """Keep the moves that don't leave the mover's king attacked
+
+    Checkers and pins are found once; other moves then pass or fail on
+    mask tests. Only king moves (and castling through check) probe
+    attacks, with the king lifted off the board, and en passant is tried
+    on the board because it can uncover a check along the rank.
+    """
+    king, checkers, check_mask, pins = king_safety(board, white)
+    if king < 0:
+        return moves  # Nothing to protect (set-up positions)
+    enemy = white ^ 0x08
+    if not checkers and not pins and en_passant_square < 0:
+        # Nothing pinned and no check: only king moves can expose the king
+        for move in moves:
+            if move[0] == king:
+                break
+        else:
+            return moves
+    legal = []
+    append = legal.append
+
+    king_piece = board[king]
+    board[king] = 0  # Lift the king so it doesn't block rays through its own square
+    try:
+        for move in moves:
+            source, dest = move
+            if source == king:
+                if dest - source == 2 or source - dest == 2:  # Castling
+                    if checkers or is_square_attacked(board, (source + dest) >> 1, enemy):
+                        continue
+                if not is_square_attacked(board, dest, enemy):
+                    append(move)
+                continue
+            if checkers > 1:
+                continue  # Double check: only the king can move
+            if (dest == en_passant_square and (dest - source) & 7
+                    and board[source] & 0x07 == 6):
+                board[king] = king_piece
+                if _en_passant_is_legal(board, king, source, dest, enemy):
+                    append(move)
+                board[king] = 0
+                continue
+            bit = 1 << dest
+            if checkers and not bit & check_mask:
+                continue
+            pin = pins.get(source)
+            if pin is not None and not bit & pin:
+                continue
+            append(move)
+    finally:
+        board[king] = king_piece
+    return legal
+
+
+def _en_passant_is_legal(board, king, source, dest, enemy):
+    """Play an en passant capture on the board and test the king"""
+    taken = source - (source & 7) + (dest & 7)
+    pawn, captured = board[source], board[taken]
+    board[dest], board[source], board[taken] = pawn, 0, 0
+    attacked = is_square_attacked(board, king, enemy)
+    board[dest], board[source], board[taken] = 0, pawn, captured
+    return not attacked
+
+
+def in_check(board, white):
+    """Whether the king of the side whose color bit is white is attacked"""
+    try:
+        king = board.index(0x09 if white else 0x01)
+    except ValueError:
+        return False
+    return is_square_attacked(board, king, white ^ 0x08)
@@ -0,0 +1,107 @@
+"""
+Atari 2600 Video Chess - Move Ordering
+MVV-LVA capture scores, killer moves and a history table, with staged
+move generation so cutoff nodes never build the quiet move list
+"""
+
+# Killer move slots kept per ply
+KILLER_SLOTS = 2
+# Cap for history scores; the table is halved when a score reaches it
+HISTORY_LIMIT = 1 << 20
+
+
+def mvv_lva(board, move, piece_values):
+    """Most valuable victim, least valuable attacker score for a capture"""
+    victim = board[move[1]] & 0x07 or 6  # Empty destination is an en passant pawn
+    return piece_values[victim] * 128 - piece_values[board[move[0]] & 0x07]
+
+
+class MoveOrdering:
+    def __init__(self, piece_values, max_ply=64):
+        self.piece_values = piece_values
+        self.killers = [[None] * KILLER_SLOTS for _ in range(max_ply + 1)]
+        # Indexed by (piece & 0x0F) * 64 + destination square
+        self.history = [0] * (16 * 64)
+
+    def clear(self):
+        """Forget killers and history"""
+        for slots in self.killers:
+            slots[:] = [None] * KILLER_SLOTS
+        self.history = [0] * (16 * 64)
+
+    def age(self):
+        """Halve history scores so older searches count for less"""
+        self.history = [score >> 1 for score in self.history]
+
+    def record_cutoff(self, board, move, ply, depth):
+        """Remember a quiet move that caused a beta cutoff"""
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        index = (board[move[0]] & 0x0F) * 64 + move[1]
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_LIMIT:
+            self.age()
+
+    def order_captures(self, board, moves):
+        """Sort captures best-first by MVV-LVA"""
+        values = self.piece_values
+        moves.sort(key=lambda move: mvv_lva(board, move, values), reverse=True)
+        return moves
+
+    def order_root(self, board, moves):
+        """Initial root order: captures by MVV-LVA, then quiet moves by history"""
+        values = self.piece_values
+        history = self.history
+
+        def score(move):
+            if board[move[1]]:
+                return (1, mvv_lva(board, move, values))
+            return (0, history[(board[move[0]] & 0x0F) * 64 + move[1]])
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def staged_moves(self, game, color_mask, ply, tt_move=None):
+        """Yield moves in stages: TT move, captures, killers, then quiet moves
+
+        Each stage is only generated once the previous one is exhausted, so a
+        cutoff on the TT move or a capture skips the remaining generation.
+        """
+        board = game.board
+        white = color_mask & 0x08
+
+        # Stage 1: transposition table move, if it is still valid here
+        if tt_move is not None:
+            piece = board[tt_move[0]]
+            if piece and (piece & 0x08) == white and game.is_valid_move(*tt_move):
+                yield tt_move
+            else:
+                tt_move = None
+
+        # Stage 2: captures by MVV-LVA
+        for move in self.order_captures(board, game.generate_captures(color_mask)):
+            if move != tt_move:
+                yield move
+
+        # Stage 3: killer moves that are quiet and valid in this position. A
+        # pawn changing file onto an empty square is an en passant capture,
+        # already tried in stage 2
+        killers = [move for move in self.killers[ply]
+                   if move is not None and move != tt_move and board[move[1]] == 0
+                   and board[move[0]] and (board[move[0]] & 0x08) == white
+                   and not (board[move[0]] & 0x07 == 6 and (move[1] - move[0]) & 7)
+                   and game.is_valid_move(*move)]
+        for move in killers:
+            yield move
+
+        # Stage 4: remaining quiet moves by history score
+        history = self.history
+        quiets = [move for move in game.generate_quiet_moves(color_mask)
+                  if move != tt_move and move not in killers]
+        quiets.sort(key=lambda move: history[(board[move[0]] & 0x0F) * 64 + move[1]],
+                    reverse=True)
+        for move in quiets:
+            yield move
@@ -0,0 +1,195 @@
+"""
+Atari 2600 Video Chess - Parallel Search
+Lazy SMP: helper processes search the same position as the caller and share
+one transposition table through multiprocessing.shared_memory, so results
+found by any process cut the others' trees. Processes rather than threads
+because the search is pure Python and the GIL would serialize it.
+
+    python parallel.py --workers 8 --depth 6   # time-to-depth, 1 to 8 workers
+    python parallel.py --workers 8 --time 2    # depth reached in 2s, 1 to 8 workers
+"""
+
+import argparse
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import search
+import transposition
+from video_chess import VideoChess
+
+
+def _helper_main(conn, stop_event, shm_name, tt_size_mb, helper_id):
+    """Helper process: search each position sent over conn until told to quit"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    tt = transposition.TranspositionTable(tt_size_mb, buffer=shm.buf)
+    game = VideoChess(tt_size_mb=tt_size_mb, book_path=None)
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            position, max_depth = job
+            game.set_position(position)
+            helper = search.Search(game, max_depth=max_depth, tt=tt,
+                                   stop_event=stop_event, helper_id=helper_id)
+            move = helper.run()
+            conn.send((move, helper.best_score, helper.completed_depth, helper.nodes))
+    finally:
+        tt.release()
+        shm.close()
+
+
+class ParallelSearch:
+    """A main search in the calling process plus workers - 1 helper processes"""
+
+    def __init__(self, workers, tt_size_mb=16):
+        self.workers = workers
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=transposition.TranspositionTable.table_bytes(tt_size_mb))
+        self.tt = transposition.TranspositionTable(tt_size_mb, buffer=self.shm.buf)
+
+        context = multiprocessing.get_context("spawn")
+        self.stop_event = context.Event()
+        self.helpers = []  # (conn, process)
+        for helper_id in range(1, workers):
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=_helper_main,
+                                      args=(child_conn, self.stop_event, self.shm.name,
+                                            tt_size_mb, helper_id),
+                                      daemon=True)
+            process.start()
+            self.helpers.append((conn, process))
+
+        # Statistics of the last search
+        self.nodes = 0
+        self.completed_depth = 0
+        self.best_score = 0
+        self.last_info = None  # Main search's info() with the totals of all workers
+
+    def search(self, game, max_depth=4, time_limit=None, node_limit=None,
+               info_callback=None, stop_event=None):
+        """Search game's position on every worker; returns the best move like Search.run"""
+        self.stop_event.clear()
+        position = game.get_position()
+        for conn, _ in self.helpers:
+            conn.send((position, max_depth))
+
+        main = search.Search(game, max_depth=max_depth, time_limit=time_limit,
+                             node_limit=node_limit, tt=self.tt,
+                             info_callback=info_callback, stop_event=stop_event)
+        try:
+            move = main.run()
+        finally:
+            # The main search owns the budget; helpers stop when it does
+            self.stop_event.set()
+            results = [conn.recv() for conn, _ in self.helpers]
+
+        best_move, best_score, best_depth = move, main.best_score, main.completed_depth
+        nodes = main.nodes
+        for helper_move, score, depth, helper_nodes in results:
+            nodes += helper_nodes
+            # A helper that finished a deeper iteration has the better answer
+            if helper_move is not None and depth > best_depth:
+                best_move, best_score, best_depth = helper_move, score, depth
+        self.nodes = nodes
+        self.completed_depth = best_depth
+        self.best_score = best_score
+        elapsed = main.elapsed()
+        self.last_info = dict(main.info(), nodes=nodes, completed_depth=best_depth,
+                              score=best_score, best_move=best_move, workers=self.workers,
+                              nps=nodes / elapsed if elapsed > 0 else 0.0)
+        return best_move
+
+    def close(self):
+        """Stop the helpers and free the shared table"""
+        self.stop_event.set()
+        for conn, _ in self.helpers:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for _, process in self.helpers:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self.helpers = []
+        self.tt.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def time_to_depth(fens, depth, workers):
+    """Seconds for each FEN to complete depth with a fresh table"""
+    engine = ParallelSearch(workers) if workers > 1 else None
+    times = []
+    try:
+        for fen in fens:
+            game = VideoChess(book_path=None, tablebase_path=None)
+            game.set_fen(fen)
+            start = time.perf_counter()
+            if engine is None:
+                search.Search(game, max_depth=depth,
+                              tt=transposition.TranspositionTable(16)).run()
+            else:
+                engine.tt.clear()
+                engine.search(game, max_depth=depth)
+            times.append(time.perf_counter() - start)
+    finally:
+        if engine is not None:
+            engine.close()
+    return times
+
+
+def depth_in_time(fens, seconds, workers):
+    """Deepest completed iteration for each FEN within seconds, with a fresh table"""
+    engine = ParallelSearch(workers) if workers > 1 else None
+    depths = []
+    try:
+        for fen in fens:
+            game = VideoChess(book_path=None, tablebase_path=None)
+            game.set_fen(fen)
+            if engine is None:
+                single = search.Search(game, max_depth=search.MAX_PLY, time_limit=seconds,
+                                       tt=transposition.TranspositionTable(16))
+                single.run()
+                depths.append(single.completed_depth)
+            else:
+                engine.tt.clear()
+                engine.search(game, max_depth=search.MAX_PLY, time_limit=seconds)
+                depths.append(engine.completed_depth)
+    finally:
+        if engine is not None:
+            engine.close()
+    return depths
+
+
+def main(argv=None):
+    import benchmark
+
+    parser = argparse.ArgumentParser(description="Video Chess parallel search time-to-depth")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="most workers to try (default: all cores)")
+    parser.add_argument("--depth", type=int, default=5, help="search depth (default 5)")
+    parser.add_argument("--time", type=float, metavar="SECONDS",
+                        help="report the depth reached in SECONDS per position instead")
+    args = parser.parse_args(argv)
+
+    fens = [fen for name, fen in benchmark.POSITIONS.items() if name != "rom-en-passant"]
+    counts = sorted({1, args.workers} | {n for n in (2, 4, 8, 16) if n < args.workers})
+    if args.time is not None:
+        for workers in counts:
+            depths = depth_in_time(fens, args.time, workers)
+            print(f"{workers:2d} workers: depths {depths} in {args.time:g}s, "
+                  f"mean {sum(depths) / len(depths):.2f}")
+        return
+    baseline = None
+    for workers in counts:
+        total = sum(time_to_depth(fens, args.depth, workers))
+        baseline = baseline or total
+        print(f"{workers:2d} workers: {total:7.2f}s to depth {args.depth}, "
+              f"speedup {baseline / total:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
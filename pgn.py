@@ -0,0 +1,347 @@
+"""
+Atari 2600 Video Chess - Game Records
+Streaming PGN and EPD readers and writers, and conversion between SAN and
+the engine's (source, dest) square moves. The readers are generators that
+hold one game or one position at a time, so a multi-gigabyte archive is
+read in constant memory.
+
+    python selfplay.py --games 100 --output games.jsonl
+    python pgn.py games.jsonl --output games.pgn   # self-play records as PGN
+
+The engine has no promotion (a pawn on the last rank stays a pawn), so
+exported moves never carry one; an imported '=Q' is accepted for the pawn
+move, but later moves of the promoted piece won't replay.
+"""
+
+import argparse
+import json
+import re
+import sys
+
+from video_chess import VideoChess, parse_square, square_name
+
+# SAN letters by piece type (piece & 7); pawns have none
+PIECE_LETTERS = {1: "K", 2: "Q", 3: "B", 4: "N", 5: "R"}
+LETTER_TYPES = {letter: piece_type for piece_type, letter in PIECE_LETTERS.items()}
+
+SAN_PATTERN = re.compile(r"([KQBNR])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?[QRBN])?")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# Seven tag roster, written first and in this order, with the values for unknown
+SEVEN_TAGS = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?",
+              "White": "?", "Black": "?", "Result": "*"}
+TAG_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TAG_ESCAPE = re.compile(r'\\(.)')
+# Movetext: comment and variation brackets, NAGs, and everything else up to them
+TOKEN_PATTERN = re.compile(r"[{}();]|\$\d+|[^\s{}();]+")
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+LINE_WIDTH = 80
+
+
+def color_mask(game):
+    """generate_moves color mask for the side to move"""
+    return 0x08 if game.current_player == 0 else 0x80
+
+
+def move_to_san(game, move, legal=None):
+    """SAN for a legal move in game's position, with '+' or '#' when it checks
+
+    legal is the side to move's legal moves when the caller has them.
+    """
+    if legal is None:
+        legal = game.generate_moves(color_mask(game))
+    if move not in legal:
+        raise ValueError(f"Illegal move {square_name(move[0])}{square_name(move[1])}")
+    source, dest = move
+    board = game.board
+    piece_type = board[source] & 0x07
+
+    if piece_type == 1 and abs(dest - source) == 2:
+        san = "O-O" if dest > source else "O-O-O"
+    elif piece_type == 6:
+        san = square_name(dest).lower()
+        if source & 7 != dest & 7:  # Captures, en passant included
+            san = square_name(source)[0].lower() + "x" + san
+    else:
+        # Name the source file, rank or both when another piece of the same
+        # kind can reach dest
+        rivals = [other for other, to in legal
+                  if to == dest and other != source and board[other] & 0x0F == board[source] & 0x0F]
+        prefix = ""
+        if rivals:
+            if all(other & 7 != source & 7 for other in rivals):
+                prefix = square_name(source)[0].lower()
+            elif all(other >> 3 != source >> 3 for other in rivals):
+                prefix = square_name(source)[1]
+            else:
+                prefix = square_name(source).lower()
+        capture = "x" if board[dest] else ""
+        san = PIECE_LETTERS[piece_type] + prefix + capture + square_name(dest).lower()
+
+    game.make_move(move)
+    try:
+        if game.in_check():
+            san += "#" if game.game_status() == "checkmate" else "+"
+    finally:
+        game.unmake_move()
+    return san
+
+
+def san_to_move(game, san, legal=None):
+    """The legal (source, dest) move a SAN string names in game's position"""
+    if legal is None:
+        legal = game.generate_moves(color_mask(game))
+    text = san.rstrip("+#!?")
+    board = game.board
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        step = 2 if len(text) == 3 else -2
+        for source, dest in legal:
+            if board[source] & 0x07 == 1 and dest - source == step:
+                return source, dest
+        raise ValueError(f"Illegal move {san!r}")
+
+    match = SAN_PATTERN.fullmatch(text)
+    if match is None:
+        raise ValueError(f"Bad SAN move {san!r}")
+    letter, file, rank, target = match.groups()
+    piece_type = LETTER_TYPES[letter] if letter else 6
+    dest = parse_square(target)
+    candidates = [(source, to) for source, to in legal
+                  if to == dest and board[source] & 0x07 == piece_type
+                  and (file is None or square_name(source)[0].lower() == file)
+                  and (rank is None or square_name(source)[1] == rank)]
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move {san!r}")
+    return candidates[0]
+
+
+def start_game(tags, game=None):
+    """A game (new or reset) set up from the FEN tag, or the start position"""
+    if game is None:
+        game = VideoChess(book_path=None)
+    if "FEN" in tags:
+        game.set_fen(tags["FEN"])
+    else:
+        game.init_board()
+    return game
+
+
+def _unescape(value):
+    return TAG_ESCAPE.sub(r"\1", value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def read_pgn(file):
+    """Yield (tags, SAN moves, result) for each game in a PGN text stream
+
+    Comments, NAGs and variations are skipped. A game without a result
+    token ends at the next tag section (or the end of the stream) with '*'.
+    """
+    tags, moves = {}, []
+    in_comment = False
+    depth = 0  # Variation nesting
+    for line in file:
+        if line.startswith("%"):
+            continue  # Escape line
+        stripped = line.strip()
+        if not in_comment and not depth and stripped.startswith("["):
+            match = TAG_PATTERN.match(stripped)
+            if match:
+                if moves:
+                    yield tags, moves, "*"
+                    tags, moves = {}, []
+                tags[match.group(1)] = _unescape(match.group(2))
+                continue
+
+        position = 0
+        while True:
+            if in_comment:
+                end = line.find("}", position)
+                if end < 0:
+                    break
+                in_comment = False
+                position = end + 1
+            match = TOKEN_PATTERN.search(line, position)
+            if match is None:
+                break
+            token = match.group()
+            position = match.end()
+            if token == "{":
+                in_comment = True
+            elif token == ";":
+                break  # Comment to end of line
+            elif token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(0, depth - 1)
+            elif depth or token.startswith("$") or token == "}":
+                continue
+            elif token in RESULTS:
+                yield tags, moves, token
+                tags, moves = {}, []
+            else:
+                san = MOVE_NUMBER.sub("", token)
+                if san:
+                    moves.append(san)
+    if moves or tags:
+        yield tags, moves, "*"
+
+
+def write_pgn(file, tags, moves, result="*", comments=None):
+    """Write one game: the seven tag roster, other tags, then movetext
+
+    comments, when given, runs parallel to moves and holds the text (or
+    None) written in braces after each move. Lines wrap at 80 columns.
+    """
+    tags = dict(tags, Result=result)
+    for name, unknown in SEVEN_TAGS.items():
+        file.write(f'[{name} "{_escape(tags.get(name, unknown))}"]\n')
+    for name, value in tags.items():
+        if name not in SEVEN_TAGS:
+            file.write(f'[{name} "{_escape(value)}"]\n')
+    file.write("\n")
+
+    # Move numbers follow the FEN's side to move and fullmove number
+    number, black = 1, False
+    if "FEN" in tags:
+        fields = tags["FEN"].split()
+        black = len(fields) > 1 and fields[1] == "b"
+        number = int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else 1
+
+    tokens = []
+    for index, san in enumerate(moves):
+        if not black:
+            tokens.append(f"{number}.")
+        elif index == 0:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+        comment = comments[index] if comments else None
+        if comment:
+            tokens.append("{" + comment.replace("}", ")") + "}")
+        if black:
+            number += 1
+        black = not black
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            file.write(line + "\n")
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    file.write(line + "\n\n")
+
+
+def _split_operations(text):
+    """EPD operation text as a list of operations, each a list of tokens"""
+    operations, tokens, token, quoted = [], [], None, False
+    for char in text:
+        if quoted:
+            if char == '"':
+                quoted = False
+                tokens.append(token)
+                token = None
+            else:
+                token += char
+        elif char == '"':
+            quoted, token = True, ""
+        elif char == ";" or char.isspace():
+            if token is not None:
+                tokens.append(token)
+                token = None
+            if char == ";" and tokens:
+                operations.append(tokens)
+                tokens = []
+        else:
+            token = (token or "") + char
+    if token is not None:
+        tokens.append(token)
+    if tokens:
+        operations.append(tokens)
+    return operations
+
+
+def read_epd(file):
+    """Yield (FEN, operations) for each EPD line in a text stream
+
+    operations maps each opcode to its list of operands (quotes removed).
+    The FEN gets its halfmove and fullmove fields from the hmvc and fmvn
+    operations, or '0 1'.
+    """
+    for line in file:
+        fields = line.split(None, 4)
+        if len(fields) < 4 or line.startswith("#"):
+            continue
+        operations = {tokens[0]: tokens[1:]
+                      for tokens in _split_operations(fields[4] if len(fields) > 4 else "")}
+        halfmove = operations.get("hmvc", ["0"])[0]
+        fullmove = operations.get("fmvn", ["1"])[0]
+        yield " ".join(fields[:4] + [halfmove, fullmove]), operations
+
+
+def write_epd(file, fen, operations=()):
+    """Write one EPD line: the first four FEN fields, then opcode operand...; pairs
+
+    operations is a dict or (opcode, operands) pairs; a single operand may
+    be given bare. Operands with spaces or semicolons are quoted.
+    """
+    parts = fen.split()[:4]
+    items = operations.items() if isinstance(operations, dict) else operations
+    for opcode, operands in items:
+        if isinstance(operands, (str, int, float)):
+            operands = [operands]
+        words = [f'"{operand}"' if isinstance(operand, str) and (not operand or set(operand) & set(' ;"'))
+                 else str(operand) for operand in operands]
+        parts.append(" ".join([opcode] + words) + ";")
+    file.write(" ".join(parts) + "\n")
+
+
+def selfplay_to_pgn(record, game=None):
+    """(tags, SAN moves, result) for a self-play JSON record of coordinate moves"""
+    game = start_game({}, game)
+    moves = []
+    for name in record.get("moves", []):
+        move = (parse_square(name[:2]), parse_square(name[2:4]))
+        moves.append(move_to_san(game, move))
+        game.make_move(move)
+    tags = {
+        "Event": "Video Chess self-play",
+        "Round": str(record.get("game", 0) + 1),
+        "White": record.get("white", "?"),
+        "Black": record.get("black", "?"),
+        "Termination": record.get("termination", "?"),
+    }
+    return tags, moves, record.get("result", "*")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Video Chess self-play records to PGN")
+    parser.add_argument("games", nargs="+", help="self-play JSON lines files")
+    parser.add_argument("--output", metavar="FILE", help="PGN file to write instead of stdout")
+    args = parser.parse_args(argv)
+
+    game = VideoChess(book_path=None)
+    out = open(args.output, "w") if args.output else sys.stdout
+    count = 0
+    try:
+        for path in args.games:
+            with open(path) as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    tags, moves, result = selfplay_to_pgn(json.loads(line), game)
+                    write_pgn(out, tags, moves, result)
+                    count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Wrote {count} games", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
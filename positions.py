@@ -0,0 +1,151 @@
+"""
+Atari 2600 Video Chess - Packed Positions
+34-byte position records and a memory-mapped file of them
+
+Record layout:
+    bytes 0-31  board, one nibble per square (piece & 0x0F), even squares
+                in the low nibble; pawns get the 0x80 flag back on decode
+    byte  32    castling_flags
+    byte  33    side to move in bit 7, en passant square in bits 0-6
+                (0x7F for none)
+"""
+
+import mmap
+import os
+
+RECORD_SIZE = 34
+NO_EN_PASSANT = 0x7F
+
+# File header: magic + format version, padded to 8 bytes
+MAGIC = b"VCPOS\x00"
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION, 0])
+HEADER_SIZE = len(HEADER)
+
+
+def _decode_piece(nibble):
+    """Atari piece byte for a stored nibble (restores the pawn flag)"""
+    return nibble | 0x80 if nibble & 0x07 == 6 else nibble
+
+
+# Board byte -> (even square piece, odd square piece)
+_DECODE = [(_decode_piece(value & 0x0F), _decode_piece(value >> 4)) for value in range(256)]
+
+
+def pack_position(game):
+    """Pack a VideoChess position into a 34-byte record"""
+    board = game.board
+    data = bytearray(RECORD_SIZE)
+    for i in range(32):
+        data[i] = (board[2 * i] & 0x0F) | ((board[2 * i + 1] & 0x0F) << 4)
+    data[32] = game.castling_flags & 0xFF
+    en_passant = game.en_passant_square if game.en_passant_square >= 0 else NO_EN_PASSANT
+    data[33] = (game.current_player << 7) | en_passant
+    return bytes(data)
+
+
+def unpack_position(data, offset=0):
+    """Decode a record from any buffer into a get_position() style tuple"""
+    decode = _DECODE
+    board = []
+    for value in data[offset:offset + 32]:
+        board.extend(decode[value])
+    side_byte = data[offset + 33]
+    en_passant = side_byte & 0x7F
+    return (tuple(board), side_byte >> 7, data[offset + 32],
+            -1 if en_passant == NO_EN_PASSANT else en_passant)
+
+
+class PositionWriter:
+    """Append packed positions to a database file"""
+
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(HEADER)
+        self.count = 0
+
+    def write(self, game):
+        """Append the current position of a VideoChess game"""
+        self.file.write(pack_position(game))
+        self.count += 1
+
+    def write_packed(self, record):
+        """Append an already packed record"""
+        if len(record) != RECORD_SIZE:
+            raise ValueError(f"Packed position must be {RECORD_SIZE} bytes, got {len(record)}")
+        self.file.write(record)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PositionDatabase:
+    """Read-only, memory-mapped view of a packed position file"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER_SIZE:
+            self.file.close()
+            raise ValueError(f"{path} is not a position database")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIC)] != MAGIC or self.mmap[len(MAGIC)] != VERSION:
+            self.mmap.close()
+            self.file.close()
+            raise ValueError(f"{path} is not a version {VERSION} position database")
+        self.view = memoryview(self.mmap)
+        self.count = (size - HEADER_SIZE) // RECORD_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, index):
+        """Byte offset of a record in the file"""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("position index out of range")
+        return HEADER_SIZE + index * RECORD_SIZE
+
+    def __getitem__(self, index):
+        """One packed record as bytes
+
+        A copy, not a view into the map, so records a caller keeps don't stop
+        close() from unmapping the file; position() and load() decode from the
+        map without one.
+        """
+        offset = self.offset(index)
+        return self.mmap[offset:offset + RECORD_SIZE]
+
+    def position(self, index):
+        """Decoded get_position() tuple for one record, read straight from the map"""
+        return unpack_position(self.view, self.offset(index))
+
+    def load(self, index, game):
+        """Set a VideoChess game to the stored position and return it"""
+        game.set_position(self.position(index))
+        return game
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.position(index)
+
+    def close(self):
+        self.view.release()
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,188 @@
+"""
+Atari 2600 Video Chess - Instrumentation
+Opt-in call counters and timers for the engine's hot paths, per-search
+statistics and frame timings. Nothing is wrapped until a Profiler is
+attached, so an unprofiled game runs the plain methods; the only standing
+cost is a None check per search and per frame.
+
+    profiler = Profiler()
+    profiler.attach(game)
+    game.find_best_move()
+    profiler.dump("profile.json")
+
+    python video_chess.py profile 4 kiwipete   # profile one search and print the JSON
+"""
+
+import collections
+import functools
+import json
+import time
+
+import movegen
+
+# VideoChess methods wrapped on the instance by attach()
+GAME_METHODS = [
+    "generate_moves", "generate_captures", "generate_quiet_moves", "get_piece_moves",
+    "is_valid_move", "in_check", "evaluate", "evaluate_move", "full_recompute",
+    "make_move", "unmake_move",
+]
+# Module functions the engine calls directly (king-move filtering). They are
+# patched only while a wrapped method of an attached game runs, so other
+# games in the process never go through the wrapper
+MODULE_FUNCTIONS = [(movegen, "is_square_attacked")]
+# VideoChess methods that just call one of those functions: wrapped to patch
+# it for the call, but not counted, so each call counts once
+FORWARDING_METHODS = ["is_square_attacked"]
+
+# Frames kept for the frame-time statistics
+FRAME_HISTORY = 600
+
+
+class Profiler:
+    def __init__(self):
+        self.games = []
+        self.module_wrappers = []  # (module, name, counting wrapper), made on first attach
+        self.patching = False  # A wrapped game method is running
+        self.reset()
+
+    def reset(self):
+        """Clear all counters (attached games stay attached)"""
+        self.started = time.perf_counter()
+        self.calls = collections.Counter()
+        self.seconds = collections.Counter()
+        self.searches = []
+        self.frames = collections.deque(maxlen=FRAME_HISTORY)
+        self.frame_count = 0
+
+    def _wrap(self, name, function):
+        calls, seconds, clock = self.calls, self.seconds, time.perf_counter
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[name] += clock() - start
+                calls[name] += 1
+        return timed
+
+    def _patched(self, function):
+        """function with MODULE_FUNCTIONS wrapped for the outermost call"""
+        @functools.wraps(function)
+        def patched(*args, **kwargs):
+            if self.patching:
+                return function(*args, **kwargs)
+            originals = [(module, name, getattr(module, name))
+                         for module, name, _ in self.module_wrappers]
+            self.patching = True
+            try:
+                for module, name, wrapper in self.module_wrappers:
+                    setattr(module, name, wrapper)
+                return function(*args, **kwargs)
+            finally:
+                for module, name, original in originals:
+                    setattr(module, name, original)
+                self.patching = False
+        return patched
+
+    def attach(self, game):
+        """Count and time the game's hot-path methods; returns the game"""
+        if game in self.games:
+            return game
+        if not self.module_wrappers:
+            self.module_wrappers = [(module, name, self._wrap(f"{module.__name__}.{name}",
+                                                              getattr(module, name)))
+                                    for module, name in MODULE_FUNCTIONS]
+        for name in GAME_METHODS:
+            setattr(game, name, self._patched(self._wrap(name, getattr(game, name))))
+        for name in FORWARDING_METHODS:
+            setattr(game, name, self._patched(getattr(game, name)))
+        game.profiler = self
+        self.games.append(game)
+        return game
+
+    def detach(self, game=None):
+        """Restore the plain methods of one game, or of every attached game"""
+        for attached in list(self.games) if game is None else [game]:
+            for name in GAME_METHODS + FORWARDING_METHODS:
+                attached.__dict__.pop(name, None)
+            attached.profiler = None
+            self.games.remove(attached)
+
+    def record_search(self, info):
+        """Keep a Search.info() snapshot from a finished search"""
+        self.searches.append(dict(info))
+
+    def record_frame(self, seconds):
+        """Time spent on one frame of main_loop or ChessGUI.run"""
+        self.frames.append(seconds)
+        self.frame_count += 1
+
+    def frame_stats(self):
+        frames = sorted(self.frames)
+        if not frames:
+            return {"frames": self.frame_count}
+        return {
+            "frames": self.frame_count,
+            "mean_ms": round(1000 * sum(frames) / len(frames), 3),
+            "p95_ms": round(1000 * frames[int(0.95 * (len(frames) - 1))], 3),
+            "max_ms": round(1000 * frames[-1], 3),
+        }
+
+    def search_stats(self):
+        searches = self.searches
+        nodes = sum(info.get("nodes", 0) for info in searches)
+        elapsed = sum(info.get("elapsed", 0.0) for info in searches)
+        return {
+            "searches": len(searches),
+            "nodes": nodes,
+            "cutoffs": sum(info.get("cutoffs", 0) for info in searches),
+            "first_move_cutoffs": sum(info.get("first_move_cutoffs", 0) for info in searches),
+            "tt_hits": sum(info.get("tt_hits", 0) for info in searches),
+            "tablebase_hits": sum(info.get("tablebase_hits", 0) for info in searches),
+            "seconds": round(elapsed, 4),
+            "nps": round(nodes / elapsed) if elapsed > 0 else 0,
+            "last": searches[-1] if searches else None,
+        }
+
+    def function_stats(self):
+        """{name: {calls, seconds, mean_us}}, slowest total first; times include callees"""
+        return {
+            name: {
+                "calls": self.calls[name],
+                "seconds": round(self.seconds[name], 6),
+                "mean_us": round(1e6 * self.seconds[name] / self.calls[name], 3),
+            }
+            for name, _ in self.seconds.most_common() if self.calls[name]
+        }
+
+    def snapshot(self):
+        """Every counter as a JSON-ready dict"""
+        return {
+            "elapsed": round(time.perf_counter() - self.started, 4),
+            "functions": self.function_stats(),
+            "search": self.search_stats(),
+            "frames": self.frame_stats(),
+        }
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2, default=list)
+
+
+def summary_lines(snapshot, functions=3):
+    """Short text lines for an on-screen overlay"""
+    lines = []
+    frames = snapshot.get("frames", {})
+    if "mean_ms" in frames:
+        lines.append(f"frame {frames['mean_ms']:.1f}ms avg  {frames['max_ms']:.1f}ms max")
+    last = snapshot.get("search", {}).get("last")
+    if last:
+        lines.append(f"d{last.get('completed_depth', 0)} {last.get('nodes', 0)} nodes "
+                     f"{last.get('nps', 0) / 1000:.1f}k nps")
+        lines.append(f"cut {last.get('cutoffs', 0)} ({last.get('first_move_cutoffs', 0)} 1st) "
+                     f"tt {last.get('tt_hits', 0)}")
+    for name, stats in list(snapshot.get("functions", {}).items())[:functions]:
+        lines.append(f"{name.rsplit('.', 1)[-1]} {stats['calls']}x {1000 * stats['seconds']:.0f}ms")
+    return lines
@@ -0,0 +1,416 @@
+"""
+Atari 2600 Video Chess - AI Search
+Negamax alpha-beta with iterative deepening and a capture-only quiescence
+stage, run on a VideoChess instance through make_move/unmake_move
+"""
+
+import time
+
+import ordering
+import tablebase
+import transposition
+
+MATE_SCORE = 100000
+# Tablebase wins score below mates found by the search itself
+TABLEBASE_WIN = MATE_SCORE // 2
+INFINITY = 1000000
+MAX_PLY = 64
+
+# Check the clock every this many nodes (must be a power of two minus one)
+BUDGET_CHECK_MASK = 1023
+# Minimum seconds between progress reports during an iteration
+REPORT_INTERVAL = 0.1
+# Time-sliced searches (Search.steps) only pause at nodes with at least this
+# much depth left, so quiescence runs to the end inside one slice
+SLICE_DEPTH = 1
+
+# (max depth, seconds per move) for difficulty levels 0-7
+DIFFICULTY_LIMITS = [
+    (1, 0.25), (2, 0.5), (3, 1.0), (4, 1.5),
+    (5, 2.0), (6, 3.0), (7, 4.0), (8, 5.0),
+]
+
+
+def difficulty_limits(level):
+    """(max depth, seconds per move) for a difficulty level, clamped to 0-7"""
+    return DIFFICULTY_LIMITS[max(0, min(7, level))]
+
+
+def score_to_tt(score, ply):
+    """Make mate scores relative to the stored node rather than the root"""
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -(MATE_SCORE - MAX_PLY):
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """Convert a stored mate score back to distance from the root"""
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -(MATE_SCORE - MAX_PLY):
+        return score + ply
+    return score
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget runs out"""
+
+
+class Search:
+    def __init__(self, game, max_depth=4, time_limit=None, node_limit=None, tt=None,
+                 info_callback=None, stop_event=None, helper_id=0):
+        self.game = game
+        self.tt = tt  # Optional TranspositionTable shared between searches
+        self.tablebases = game.load_tablebases()  # None when there are no tables
+        self.ordering = ordering.MoveOrdering(game.piece_values, MAX_PLY)
+        self.info_callback = info_callback  # Called with info() as the search progresses
+        self.stop_event = stop_event  # Anything with is_set(); set it to move now
+        self.max_depth = max_depth
+        self.time_limit = time_limit  # seconds, None for no limit
+        self.node_limit = node_limit  # nodes, None for no limit
+        self.helper_id = helper_id  # Nonzero for a parallel search helper
+
+        # Results of the last completed iteration
+        self.best_move = None
+        self.best_score = 0
+        self.completed_depth = 0
+
+        # Statistics
+        self.nodes = 0
+        self.tablebase_hits = 0
+        self.tt_hits = 0
+        self.cutoffs = 0  # Beta cutoffs in the main search
+        self.first_move_cutoffs = 0  # ... on the first move tried (ordering quality)
+        self.start_time = 0.0
+        self.depth = 0
+        self.last_report = 0.0
+        self.slice_nodes = None  # Nodes per slice of a time-sliced search
+        self.slice_end = INFINITY  # Node count at which the current slice yields
+
+    @classmethod
+    def for_difficulty(cls, game, level, tt=None, **kwargs):
+        """Create a search whose depth and time budget follow difficulty 0-7"""
+        max_depth, time_limit = difficulty_limits(level)
+        return cls(game, max_depth=max_depth, time_limit=time_limit, tt=tt, **kwargs)
+
+    def elapsed(self):
+        """Seconds since the search started"""
+        return time.perf_counter() - self.start_time
+
+    def info(self):
+        """Progress snapshot: current depth, last completed result and speed"""
+        elapsed = self.elapsed()
+        return {
+            "depth": self.depth,
+            "completed_depth": self.completed_depth,
+            "score": self.best_score,
+            "best_move": self.best_move,
+            "nodes": self.nodes,
+            "tablebase_hits": self.tablebase_hits,
+            "tt_hits": self.tt_hits,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "elapsed": elapsed,
+            "nps": self.nodes / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def report(self):
+        """Send progress to the info callback, if any"""
+        if self.info_callback is not None:
+            self.last_report = self.elapsed()
+            self.info_callback(self.info())
+
+    def check_budget(self):
+        """Abort the current iteration once the time or node budget is spent"""
+        if self.info_callback is not None and self.elapsed() - self.last_report >= REPORT_INTERVAL:
+            self.report()
+        # Depth 1 always finishes so there is a move to return
+        if self.depth <= 1:
+            return
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.time_limit is not None and self.elapsed() >= self.time_limit:
+            raise SearchTimeout()
+
+    def side_mask(self):
+        """Color mask for generate_moves for the side to move"""
+        return 0x08 if self.game.current_player == 0 else 0x80
+
+    def in_tablebase(self):
+        """Whether the position has few enough pieces for the tables"""
+        game = self.game
+        board = game.board
+        return (self.tablebases is not None and game.eval_phase <= tablebase.MAX_PHASE
+                and 64 - board.count(0) <= tablebase.MAX_PIECES
+                # The tables have no castling
+                and not (game.castling_flags and (board[4] == 0x09 or board[60] == 0x01)))
+
+    def run(self):
+        """Search the current position and return the best (source, dest) move"""
+        for _ in self.steps():
+            pass
+        return self.best_move
+
+    def steps(self, slice_nodes=None):
+        """run() as a generator that yields about every slice_nodes nodes
+
+        Each next() searches one slice and the answer is in best_move once
+        the generator is exhausted, so a frame loop can spread a search over
+        frames without threads. Subtrees shallower than SLICE_DEPTH finish
+        within their slice. Without slice_nodes it never yields.
+        """
+        game = self.game
+        self.slice_nodes = slice_nodes
+        self.slice_end = slice_nodes if slice_nodes is not None else INFINITY
+        self.start_time = time.perf_counter()
+        self.nodes = 0
+        self.tablebase_hits = 0
+        self.tt_hits = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.best_move = None
+        self.completed_depth = 0
+
+        # Solved endings: play the table move without searching
+        if self.in_tablebase():
+            result = self.tablebases.best_move(game)
+            if result is not None:
+                self.best_move, value = result
+                self.best_score = -tablebase.score(value, 1, TABLEBASE_WIN)
+                self.tablebase_hits += 1
+                self.report()
+                return
+
+        moves = self.ordering.order_root(game.board, game.generate_moves(self.side_mask()))
+        if not moves:
+            return
+
+        root_length = len(game.undo_stack)
+        for depth in range(1, self.max_depth + 1):
+            # Half the parallel helpers skip odd depths and half even ones,
+            # so they run ahead of the main search and fill the shared table
+            if self.helper_id and 1 < depth < self.max_depth and (depth + self.helper_id) % 2:
+                continue
+            self.depth = depth
+            try:
+                if slice_nodes is None:
+                    move, score = self.search_root(depth, moves)
+                else:
+                    move, score = yield from self.search_root_steps(depth, moves)
+            except (SearchTimeout, GeneratorExit) as stop:
+                # Unwind the moves made by the interrupted iteration
+                while len(game.undo_stack) > root_length:
+                    game.unmake_move()
+                if isinstance(stop, GeneratorExit):
+                    raise  # Abandoned with close() between slices
+                break
+
+            self.best_move, self.best_score, self.completed_depth = move, score, depth
+            self.report()
+
+            # Search the previous best move first in the next iteration
+            moves.remove(move)
+            moves.insert(0, move)
+
+            if abs(score) >= MATE_SCORE - MAX_PLY:
+                break
+            # Another iteration costs several times this one; don't start
+            # it if it cannot finish within the budget
+            if self.time_limit is not None and self.elapsed() >= self.time_limit / 2:
+                break
+            if self.stop_event is not None and self.stop_event.is_set():
+                break
+
+    def search_root(self, depth, moves):
+        """Search every root move to depth and return (best move, score)"""
+        game = self.game
+        board = game.board
+        alpha = -INFINITY
+        best_move = moves[0]
+
+        for move in moves:
+            if board[move[1]] & 0x07 == 1:  # King capture
+                return move, MATE_SCORE
+            game.make_move(move)
+            score = -self.negamax(depth - 1, -INFINITY, -alpha, 1)
+            game.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        return best_move, alpha
+
+    def search_root_steps(self, depth, moves):
+        """search_root as a generator for steps()"""
+        game = self.game
+        board = game.board
+        alpha = -INFINITY
+        best_move = moves[0]
+
+        for move in moves:
+            if board[move[1]] & 0x07 == 1:  # King capture
+                return move, MATE_SCORE
+            game.make_move(move)
+            score = -(yield from self.negamax_steps(depth - 1, -INFINITY, -alpha, 1))
+            game.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        return best_move, alpha
+
+    def probe(self, depth, alpha, beta, ply):
+        """Tablebase and transposition table lookups for an interior node
+
+        Returns (score, tt move); score is None unless the tables already
+        decide the node.
+        """
+        game = self.game
+        if self.in_tablebase():
+            value = self.tablebases.probe(game.board, game.current_player)
+            if value is not None:
+                self.tablebase_hits += 1
+                return max(alpha, min(beta, tablebase.score(value, ply, TABLEBASE_WIN))), None
+
+        tt = self.tt
+        if tt is not None:
+            entry = tt.probe(game.hash_key)
+            if entry is not None:
+                self.tt_hits += 1
+                tt_depth, bound, score, tt_move = entry
+                if tt_depth >= depth:
+                    score = score_from_tt(score, ply)
+                    if bound == transposition.EXACT:
+                        return score, tt_move
+                    if bound == transposition.LOWER and score >= beta:
+                        return beta, tt_move
+                    if bound == transposition.UPPER and score <= alpha:
+                        return alpha, tt_move
+                return None, tt_move
+        return None, None
+
+    def cutoff(self, move, target, searched, depth, ply, beta):
+        """Record a beta cutoff by move (target is the piece it captured) and return beta"""
+        game = self.game
+        self.cutoffs += 1
+        if searched == 1:
+            self.first_move_cutoffs += 1
+        if target == 0 and move[1] != game.en_passant_square:
+            self.ordering.record_cutoff(game.board, move, ply, depth)
+        if self.tt is not None:
+            self.tt.store(game.hash_key, depth, transposition.LOWER, score_to_tt(beta, ply), move)
+        return beta
+
+    def finish(self, depth, alpha, best_move, searched, ply):
+        """Score of a node whose moves all failed to cut off, stored in the table"""
+        if not searched:
+            # No legal move: checkmated, or stalemate
+            return -(MATE_SCORE - ply) if self.game.in_check() else 0
+
+        if self.tt is not None:
+            bound = transposition.EXACT if best_move else transposition.UPPER
+            self.tt.store(self.game.hash_key, depth, bound, score_to_tt(alpha, ply), best_move)
+        return alpha
+
+    def negamax(self, depth, alpha, beta, ply):
+        """Fail-hard negamax alpha-beta returning the score for the side to move"""
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+
+        self.nodes += 1
+        if not self.nodes & BUDGET_CHECK_MASK:
+            self.check_budget()
+
+        score, tt_move = self.probe(depth, alpha, beta, ply)
+        if score is not None:
+            return score
+
+        game = self.game
+        board = game.board
+        best_move = None
+        searched = 0
+        for move in self.ordering.staged_moves(game, self.side_mask(), ply, tt_move):
+            target = board[move[1]]
+            if target & 0x07 == 1:  # King capture
+                return MATE_SCORE - ply
+            searched += 1
+            game.make_move(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            game.unmake_move()
+            if score >= beta:
+                return self.cutoff(move, target, searched, depth, ply, beta)
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        return self.finish(depth, alpha, best_move, searched, ply)
+
+    def negamax_steps(self, depth, alpha, beta, ply):
+        """negamax as a generator that yields once the slice's nodes are spent"""
+        if depth < SLICE_DEPTH:
+            return self.negamax(depth, alpha, beta, ply)
+
+        self.nodes += 1
+        if self.nodes >= self.slice_end:
+            yield
+            self.slice_end = self.nodes + self.slice_nodes
+        if not self.nodes & BUDGET_CHECK_MASK:
+            self.check_budget()
+
+        score, tt_move = self.probe(depth, alpha, beta, ply)
+        if score is not None:
+            return score
+
+        game = self.game
+        board = game.board
+        best_move = None
+        searched = 0
+        for move in self.ordering.staged_moves(game, self.side_mask(), ply, tt_move):
+            target = board[move[1]]
+            if target & 0x07 == 1:  # King capture
+                return MATE_SCORE - ply
+            searched += 1
+            game.make_move(move)
+            score = -(yield from self.negamax_steps(depth - 1, -beta, -alpha, ply + 1))
+            game.unmake_move()
+            if score >= beta:
+                return self.cutoff(move, target, searched, depth, ply, beta)
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        return self.finish(depth, alpha, best_move, searched, ply)
+
+    def quiescence(self, alpha, beta, ply):
+        """Extend the search through captures until the position is quiet"""
+        self.nodes += 1
+        if not self.nodes & BUDGET_CHECK_MASK:
+            self.check_budget()
+
+        game = self.game
+        stand_pat = game.evaluate()
+        if stand_pat >= beta:
+            return beta
+        if stand_pat > alpha:
+            alpha = stand_pat
+        if ply >= MAX_PLY:
+            return alpha
+
+        board = game.board
+        captures = self.ordering.order_captures(board, game.generate_captures(self.side_mask()))
+        for move in captures:
+            if board[move[1]] & 0x07 == 1:  # King capture
+                return MATE_SCORE - ply
+            game.make_move(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            game.unmake_move()
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+
+        return alpha
@@ -0,0 +1,188 @@
+"""
+Atari 2600 Video Chess - Headless Self-Play
+Plays engine-vs-engine games across a process pool, streams each game as a
+JSON line and prints an Elo-style summary
+
+    python selfplay.py --games 100 --engine-a 5 --engine-b depth=3,time=0.5
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import search
+import transposition
+from video_chess import VideoChess, move_name
+
+
+def parse_engine(spec):
+    """Parse an engine spec: a difficulty level ('5') or 'depth=4,time=1.0,nodes=50000,tt=16'"""
+    if spec.isdigit():
+        depth, time_limit = search.difficulty_limits(int(spec))
+        return {"name": f"level{spec}", "depth": depth, "time": time_limit, "nodes": None, "tt": 16}
+
+    config = {"name": spec, "depth": 4, "time": None, "nodes": None, "tt": 16}
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        if key == "depth":
+            config["depth"] = int(value)
+        elif key == "time":
+            config["time"] = float(value)
+        elif key == "nodes":
+            config["nodes"] = int(value)
+        elif key == "tt":
+            config["tt"] = int(value)
+        elif key == "name":
+            config["name"] = value
+        else:
+            raise ValueError(f"Unknown engine option: {key!r}")
+    return config
+
+
+def play_game(job):
+    """Play one game and return its record (runs in a pool worker)"""
+    index, white, black, options = job
+    rng = random.Random(options["seed"] + index)
+    game = VideoChess()
+    tables = {
+        0: transposition.TranspositionTable(white["tt"]),
+        1: transposition.TranspositionTable(black["tt"]),
+    }
+
+    moves, move_times, move_nodes = [], [], []
+    seen = {game.hash_key: 1}
+    quiet_plies = 0
+    result, termination = "1/2-1/2", "max plies"
+
+    for ply in range(options["max_plies"]):
+        side = game.current_player
+        color_mask = 0x08 if side == 0 else 0x80
+
+        start = time.perf_counter()
+        nodes = 0
+        if ply < options["random_plies"]:
+            # Randomized opening so repeated pairings don't replay one game
+            legal = game.generate_moves(color_mask)
+            move = rng.choice(legal) if legal else None
+        else:
+            config = white if side == 0 else black
+            engine = search.Search(game, max_depth=config["depth"], time_limit=config["time"],
+                                   node_limit=config["nodes"], tt=tables[side])
+            move = engine.run()
+            nodes = engine.nodes
+        elapsed = time.perf_counter() - start
+
+        if move is None:
+            if game.in_check():
+                result, termination = ("0-1" if side == 0 else "1-0"), "checkmate"
+            else:
+                result, termination = "1/2-1/2", "stalemate"
+            break
+
+        piece = game.board[move[0]]
+        capture = game.board[move[1]] != 0
+        game.make_move(move)
+        moves.append(move_name(move))
+        move_times.append(round(elapsed, 4))
+        move_nodes.append(nodes)
+
+        if game.game_flags & 0x80:
+            result, termination = ("1-0" if side == 0 else "0-1"), "king captured"
+            break
+
+        # Draw rules: threefold repetition and fifty moves without pawn move or capture
+        seen[game.hash_key] = seen.get(game.hash_key, 0) + 1
+        if seen[game.hash_key] >= 3:
+            termination = "repetition"
+            break
+        quiet_plies = 0 if capture or piece & 0x07 == 6 else quiet_plies + 1
+        if quiet_plies >= 100:
+            termination = "fifty moves"
+            break
+
+    return {
+        "game": index,
+        "white": white["name"],
+        "black": black["name"],
+        "result": result,
+        "termination": termination,
+        "plies": len(moves),
+        "moves": moves,
+        "move_times": move_times,
+        "nodes": move_nodes,
+    }
+
+
+def elo_summary(wins, draws, losses):
+    """Score, Elo difference and 95% error margin from the first engine's side"""
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, 0.0, 0.0
+    score = (wins + 0.5 * draws) / games
+    if score <= 0.0 or score >= 1.0:
+        return score, math.copysign(math.inf, score - 0.5), math.inf
+
+    elo = -400 * math.log10(1 / score - 1)
+    # Standard error of the mean score, mapped through the Elo curve's slope
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    slope = 400 / (math.log(10) * score * (1 - score))
+    return score, elo, margin * slope
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Video Chess engine-vs-engine self-play")
+    parser.add_argument("--games", type=int, default=10, help="number of games (default 10)")
+    parser.add_argument("--engine-a", default="3", help="first engine: level 0-7 or option list")
+    parser.add_argument("--engine-b", default="3", help="second engine: level 0-7 or option list")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--max-plies", type=int, default=300, help="adjudicate a draw after this many plies")
+    parser.add_argument("--random-plies", type=int, default=2,
+                        help="random opening plies before the engines take over (default 2)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random openings")
+    parser.add_argument("--output", metavar="FILE", help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    engine_a, engine_b = parse_engine(args.engine_a), parse_engine(args.engine_b)
+    if engine_a["name"] == engine_b["name"]:
+        engine_a["name"] += "-a"
+        engine_b["name"] += "-b"
+    options = {"max_plies": args.max_plies, "random_plies": args.random_plies, "seed": args.seed}
+
+    # Alternate colors so each engine plays white in half the games
+    jobs = [(index, engine_a, engine_b, options) if index % 2 == 0
+            else (index, engine_b, engine_a, options)
+            for index in range(args.games)]
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    wins = draws = losses = 0
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            for record in pool.imap_unordered(play_game, jobs):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+                if record["result"] == "1/2-1/2":
+                    draws += 1
+                elif (record["result"] == "1-0") == (record["white"] == engine_a["name"]):
+                    wins += 1
+                else:
+                    losses += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    score, elo, margin = elo_summary(wins, draws, losses)
+    print(f"{engine_a['name']} vs {engine_b['name']}: +{wins} ={draws} -{losses} "
+          f"({wins + draws + losses} games), score {score * 100:.1f}%, "
+          f"Elo {elo:+.0f} +/- {margin:.0f}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+Atari 2600 Video Chess - Engine Server
+Hosts many games in one asyncio process behind a TCP line protocol. Each
+request and reply is one JSON object per line; AI moves are searched on a
+bounded process pool shared fairly between sessions
+
+    python server.py --port 7600 --workers 4
+
+Requests ("id" is optional and echoed back):
+    {"cmd": "new", "difficulty": 3, "ai": "black", "fen": "...", "budget": 300}
+    {"cmd": "move", "session": "...", "move": "E2E4"}   # reply includes the AI's answer
+    {"cmd": "go", "session": "..."}                     # AI moves now
+    {"cmd": "state", "session": "..."}
+    {"cmd": "close", "session": "..."}
+    {"cmd": "metrics"}
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import secrets
+import sys
+import time
+import traceback
+
+import search
+from video_chess import VideoChess, move_name, parse_square
+
+# Longest request line accepted from a client
+MAX_LINE = 64 * 1024
+# Requests a single connection may have in flight before reading pauses
+MAX_IN_FLIGHT = 16
+# Moves a session's clock is spread over when it has a time budget
+MOVES_TO_GO = 20
+
+
+def parse_move(text):
+    """(source, dest) from coordinates like 'E2E4' or 'e2 e4', or None"""
+    text = text.replace(' ', '')
+    if len(text) != 4:
+        return None
+    source, dest = parse_square(text[:2]), parse_square(text[2:])
+    if source < 0 or dest < 0:
+        return None
+    return source, dest
+
+
+class RequestError(Exception):
+    """A request the server refuses; the message goes back to the client"""
+
+
+# Pool worker state: one engine per process so its table carries over
+_worker_game = None
+_worker_tt = None
+
+
+def _init_worker(tt_size_mb, cache_path=None):
+    global _worker_game, _worker_tt
+    _worker_game = VideoChess(tt_size_mb=tt_size_mb, cache_path=cache_path)
+    _worker_tt = _worker_game.search_table()  # Warmed from the evaluation cache, if any
+
+
+def _search(position, max_depth, time_limit):
+    """Pick a move for position (runs in a pool worker)"""
+    game = _worker_game
+    game.set_position(position)
+    start = time.perf_counter()
+    move = game.book_move() or game.cached_move(max_depth)
+    nodes = depth = 0
+    if move is None:
+        engine = search.Search(game, max_depth=max_depth, time_limit=time_limit, tt=_worker_tt)
+        move = engine.run()
+        nodes, depth = engine.nodes, engine.completed_depth
+        game.cache_result(depth, engine.best_score, move)
+    return move, nodes, depth, time.perf_counter() - start
+
+
+class Session:
+    """One game hosted by the server"""
+
+    def __init__(self, session_id, game, difficulty, ai_side, budget):
+        self.id = session_id
+        self.game = game
+        self.difficulty = difficulty
+        self.ai_side = ai_side  # 0 white, 1 black, None for no AI
+        self.budget = budget  # Seconds of AI thinking for the whole game, None for no cap
+        self.ai_time = 0.0
+        self.moves = []
+        self.searching = False
+        self.last_active = time.monotonic()
+
+    def result(self):
+        """'1-0', '0-1', '1/2-1/2' or None while the game is running"""
+        game = self.game
+        if game.game_flags & 0x80:
+            # The side that captured the king has already handed over the move
+            return "0-1" if game.current_player == 0 else "1-0"
+        status = game.game_status()
+        if status == "checkmate":
+            return "0-1" if game.current_player == 0 else "1-0"
+        if status == "stalemate":
+            return "1/2-1/2"
+        return None
+
+    def limits(self, max_move_time):
+        """(max depth, seconds) for the next AI move"""
+        max_depth, time_limit = search.difficulty_limits(self.difficulty)
+        time_limit = min(time_limit, max_move_time)
+        if self.budget is not None:
+            time_limit = min(time_limit, max(0.05, (self.budget - self.ai_time) / MOVES_TO_GO))
+        return max_depth, time_limit
+
+    def state(self):
+        return {
+            "session": self.id,
+            "fen": self.game.get_fen(),
+            "moves": self.moves,
+            "to_move": "white" if self.game.current_player == 0 else "black",
+            "result": self.result(),
+            "ai_time": round(self.ai_time, 3),
+        }
+
+
+class EngineServer:
+    def __init__(self, workers=2, max_sessions=500, max_queue=None, idle_timeout=600.0,
+                 max_move_time=5.0, tt_size_mb=16, cache_path=None):
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout  # Seconds before an idle session is evicted
+        self.max_move_time = max_move_time  # Cap on any single search
+        self.tt_size_mb = tt_size_mb
+        self.cache_path = cache_path  # Evaluation cache file shared by the workers, or None
+        self.sessions = {}
+        self.connections = {}  # Stream writer -> handler task of each open connection
+        self.pool = None
+
+        # One queue slot per session at most (a session waits on its own
+        # search), so first-in first-out is round-robin between games
+        self.queue = asyncio.Queue(max_queue or max_sessions)
+
+        self.started = time.monotonic()
+        self.counters = {
+            "connections": 0, "requests": 0, "errors": 0, "internal_errors": 0,
+            "sessions_created": 0, "sessions_evicted": 0,
+            "searches": 0, "rejected": 0, "nodes": 0,
+        }
+        self.search_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.active_searches = 0
+
+    async def start(self, host="127.0.0.1", port=7600):
+        context = multiprocessing.get_context("spawn")
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=_init_worker,
+            initargs=(self.tt_size_mb, self.cache_path))
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self.reaper = asyncio.create_task(self._reap())
+        self.server = await asyncio.start_server(self._serve, host, port, limit=MAX_LINE)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        await self.server.wait_closed()
+        for task in self.dispatchers + [self.reaper]:
+            task.cancel()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def _serve(self, reader, writer):
+        """Connection handler: requests run concurrently, replies are written as they finish"""
+        self.counters["connections"] += 1
+        self.connections[writer] = asyncio.current_task()
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        tasks = set()
+        try:
+            while True:
+                # Stop reading while the client has too much outstanding;
+                # TCP flow control then pushes back on the sender
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    in_flight.release()
+                    await self._reply(writer, {"ok": False, "error": "request line too long"})
+                    break
+                if not line:
+                    in_flight.release()
+                    break
+                task = asyncio.create_task(self._handle_line(line, writer, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.connections.pop(writer, None)
+            writer.close()
+
+    async def _handle_line(self, line, writer, in_flight):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get("id")
+            self.counters["requests"] += 1
+            reply = await self.handle(request)
+            reply["ok"] = True
+        except (RequestError, ValueError, TypeError) as error:
+            self.counters["errors"] += 1
+            reply = {"ok": False, "error": str(error)}
+        except Exception as error:
+            # A server fault, not a bad request; the client still gets its reply
+            self.counters["errors"] += 1
+            self.counters["internal_errors"] += 1
+            traceback.print_exc(file=sys.stderr)
+            reply = {"ok": False, "error": f"internal error: {type(error).__name__}"}
+        finally:
+            in_flight.release()
+        if request_id is not None:
+            reply["id"] = request_id
+        await self._reply(writer, reply)
+
+    async def _reply(self, writer, reply):
+        try:
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle(self, request):
+        """Run one decoded request and return its reply"""
+        command = request.get("cmd")
+        if command == "new":
+            return await self.new_session(request)
+        if command == "metrics":
+            return self.metrics()
+
+        session = self.sessions.get(request.get("session"))
+        if session is None:
+            raise RequestError("unknown session")
+        session.last_active = time.monotonic()
+        if command == "move":
+            return await self.human_move(session, str(request.get("move", "")))
+        if command == "go":
+            return await self.ai_move(session)
+        if command == "state":
+            return session.state()
+        if command == "close":
+            del self.sessions[session.id]
+            return {"session": session.id}
+        raise RequestError(f"unknown command {command!r}")
+
+    async def new_session(self, request):
+        if len(self.sessions) >= self.max_sessions and not self.evict_oldest():
+            raise RequestError("server full")
+
+        game = VideoChess(book_path=None, tablebase_path=None)
+        if request.get("fen"):
+            game.set_fen(request["fen"])
+        ai = request.get("ai", "black")
+        if ai not in ("white", "black", None):
+            raise RequestError("ai must be 'white', 'black' or null")
+        budget = request.get("budget")
+        session = Session(secrets.token_hex(8), game, int(request.get("difficulty", 3)),
+                          None if ai is None else ("white", "black").index(ai),
+                          None if budget is None else float(budget))
+        self.sessions[session.id] = session
+        if session.ai_side == game.current_player:
+            try:
+                reply = await self.ai_move(session)
+            except Exception:
+                # The client never learns the id of a game whose first move
+                # failed, so don't keep it
+                self.sessions.pop(session.id, None)
+                raise
+        else:
+            reply = session.state()
+        self.counters["sessions_created"] += 1
+        return reply
+
+    async def human_move(self, session, text):
+        if session.searching:
+            raise RequestError("AI is thinking")
+        if session.result() is not None:
+            raise RequestError("game is over")
+        game = session.game
+        if game.current_player == session.ai_side:
+            raise RequestError("not your move")
+        move = parse_move(text)
+        white = 0x08 if game.current_player == 0 else 0
+        if (move is None or not game.board[move[0]]
+                or (game.board[move[0]] & 0x08) != white or not game.is_valid_move(*move)):
+            raise RequestError(f"illegal move {text!r}")
+
+        game.make_move(move)
+        session.moves.append(move_name(move))
+        if session.ai_side == game.current_player and session.result() is None:
+            return await self.ai_move(session)
+        return session.state()
+
+    async def ai_move(self, session):
+        """Queue a search for the session and play its move"""
+        if session.searching:
+            raise RequestError("AI is thinking")
+        if session.result() is not None:
+            raise RequestError("game is over")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((session, time.monotonic(), future))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise RequestError("server busy, retry later") from None
+        session.searching = True
+        try:
+            move, nodes, depth, elapsed = await future
+        finally:
+            session.searching = False
+        session.last_active = time.monotonic()
+        session.ai_time += elapsed
+
+        reply = {"nodes": nodes, "depth": depth, "time": round(elapsed, 3)}
+        if move is not None:
+            session.game.make_move(move)
+            session.moves.append(move_name(move))
+            reply["ai_move"] = move_name(move)
+        reply.update(session.state())
+        return reply
+
+    async def _dispatch(self):
+        """Feed queued searches to the pool, one at a time per dispatcher"""
+        loop = asyncio.get_running_loop()
+        while True:
+            session, queued, future = await self.queue.get()
+            if future.cancelled():
+                continue
+            if session.id not in self.sessions:
+                # Closed while queued: answer the waiting request so its
+                # connection's in-flight slot is released
+                future.set_exception(RequestError("session closed"))
+                continue
+            wait = time.monotonic() - queued
+            self.wait_seconds += wait
+            self.max_wait = max(self.max_wait, wait)
+            max_depth, time_limit = session.limits(self.max_move_time)
+            self.active_searches += 1
+            try:
+                result = await loop.run_in_executor(
+                    self.pool, _search, session.game.get_position(), max_depth, time_limit)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(RequestError(f"search failed: {error}"))
+                continue
+            finally:
+                self.active_searches -= 1
+            self.counters["searches"] += 1
+            self.counters["nodes"] += result[1]
+            self.search_seconds += result[3]
+            if future.done():
+                continue
+            if session.id not in self.sessions:
+                future.set_exception(RequestError("session closed"))  # ... or while searching
+            else:
+                future.set_result(result)
+
+    def evict_oldest(self):
+        """Drop the least recently used idle session; False if all are busy"""
+        idle = [session for session in self.sessions.values() if not session.searching]
+        if not idle:
+            return False
+        oldest = min(idle, key=lambda session: session.last_active)
+        del self.sessions[oldest.id]
+        self.counters["sessions_evicted"] += 1
+        return True
+
+    async def _reap(self):
+        """Evict sessions nobody has touched for idle_timeout seconds"""
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            for session in list(self.sessions.values()):
+                if session.last_active < cutoff and not session.searching:
+                    del self.sessions[session.id]
+                    self.counters["sessions_evicted"] += 1
+
+    def metrics(self):
+        searches = self.counters["searches"]
+        return dict(
+            self.counters,
+            uptime=round(time.monotonic() - self.started, 1),
+            sessions=len(self.sessions),
+            workers=self.workers,
+            active_searches=self.active_searches,
+            queued=self.queue.qsize(),
+            mean_wait=round(self.wait_seconds / searches, 4) if searches else 0.0,
+            max_wait=round(self.max_wait, 4),
+            mean_search_time=round(self.search_seconds / searches, 4) if searches else 0.0,
+            nps=round(self.counters["nodes"] / self.search_seconds) if self.search_seconds else 0,
+        )
+
+
+async def serve(args):
+    server = EngineServer(workers=args.workers, max_sessions=args.max_sessions,
+                          max_queue=args.max_queue, idle_timeout=args.idle_timeout,
+                          max_move_time=args.max_move_time, tt_size_mb=args.tt,
+                          cache_path=args.cache)
+    listener = await server.start(args.host, args.port)
+    address = listener.sockets[0].getsockname()
+    print(f"Video Chess server on {address[0]}:{address[1]} with {args.workers} search workers",
+          file=sys.stderr)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Video Chess engine server")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=7600, help="TCP port (default 7600)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="search processes (default: all cores)")
+    parser.add_argument("--max-sessions", type=int, default=500,
+                        help="sessions kept before the least recently used is evicted (default 500)")
+    parser.add_argument("--max-queue", type=int, default=None,
+                        help="searches waiting for a worker before requests are refused "
+                             "(default: max sessions)")
+    parser.add_argument("--idle-timeout", type=float, default=600.0,
+                        help="seconds before an untouched session is evicted (default 600)")
+    parser.add_argument("--max-move-time", type=float, default=5.0,
+                        help="cap in seconds on any one AI move (default 5)")
+    parser.add_argument("--tt", type=int, default=16, help="transposition table MB per worker (default 16)")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="persistent evaluation cache shared by the workers and across restarts")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,627 @@
+"""
+Atari 2600 Video Chess - Endgame Tablebases
+Retrograde-built distance-to-mate tables for pawnless 3 and 4 piece endings,
+vectorized with NumPy over every placement of the pieces
+
+Each table is an .npy array of uint8 indexed [side to move][white king
+square in the a1-d1-d4 triangle][other pieces' squares]; the other seven
+board symmetries map onto it at probe time. A value of 0 is a draw,
+otherwise it is the distance to mate in plies plus one: odd distances are
+wins for the side to move, even distances losses (1 = checkmated).
+
+    python tablebase.py                  # build every table into tablebases/
+    python tablebase.py KQvK KRvK KQvKR  # build selected tables
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Tablebases are optional; search just doesn't probe them
+    np = None
+
+# Piece letters in the Atari type encoding
+PIECE_TYPES = {'K': 1, 'Q': 2, 'B': 3, 'N': 4, 'R': 5}
+PIECE_LETTERS = {piece_type: letter for letter, piece_type in PIECE_TYPES.items()}
+# Strongest first; sets the piece order within a table name
+LETTER_ORDER = "KQRBN"
+LETTER_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3}
+
+MAX_PIECES = 4
+# Move count for positions that can't be lost (illegal, stalemate, drawing capture)
+NEVER_LOST = 30000
+# Positions per pass over the big arrays, and frontiers small enough for one pass
+CHUNK = 1 << 19
+SMALL_FRONTIER = 1 << 14
+# Highest eval_phase of a 4 piece pawnless position (two queens)
+MAX_PHASE = 8
+
+# Endings that can't be won, so they need no table
+DRAWN = {"KvK", "KBvK", "KNvK"}
+
+DEFAULT_TABLES = [
+    "KQvK", "KRvK",
+    "KQQvK", "KQRvK", "KQBvK", "KQNvK", "KRRvK", "KRBvK", "KRNvK", "KBBvK", "KBNvK", "KNNvK",
+    "KQvKQ", "KQvKR", "KQvKB", "KQvKN", "KRvKR", "KRvKB", "KRvKN", "KBvKB", "KBvKN", "KNvKN",
+]
+
+# Step directions as (file, rank) offsets: 0-3 orthogonal, 4-7 diagonal, 8-15 knight
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1),
+              (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+# Piece type -> (direction indices, slides)
+PIECE_DIRECTIONS = {
+    1: (range(0, 8), False),
+    2: (range(0, 8), True),
+    3: (range(4, 8), True),
+    4: (range(8, 16), False),
+    5: (range(0, 4), True),
+}
+
+# The eight symmetries of the board as functions of (file, rank)
+_SYMMETRIES = [
+    lambda f, r: (f, r), lambda f, r: (7 - f, r), lambda f, r: (f, 7 - r),
+    lambda f, r: (7 - f, 7 - r), lambda f, r: (r, f), lambda f, r: (7 - r, f),
+    lambda f, r: (r, 7 - f), lambda f, r: (7 - r, 7 - f),
+]
+# a1, b1, c1, d1, b2, c2, d2, c3, d3, d4
+TRIANGLE = [sq for sq in range(64) if sq % 8 <= 3 and sq // 8 <= sq % 8]
+
+
+def _symmetry_tables():
+    """SYMMETRY[t][sq], a transform per white king square and TRIANGLE index"""
+    symmetry = [[0] * 64 for _ in _SYMMETRIES]
+    for t, transform in enumerate(_SYMMETRIES):
+        for sq in range(64):
+            f, r = transform(sq % 8, sq // 8)
+            symmetry[t][sq] = r * 8 + f
+    # First transform that lands each king square in the triangle
+    king_transform = [next(t for t in range(8) if symmetry[t][sq] in TRIANGLE)
+                      for sq in range(64)]
+    triangle_index = [TRIANGLE.index(sq) if sq in TRIANGLE else -1 for sq in range(64)]
+    return symmetry, king_transform, triangle_index
+
+
+SYMMETRY, KING_TRANSFORM, TRIANGLE_INDEX = _symmetry_tables()
+
+
+def _step_table():
+    """STEP[direction][sq]: square one step away, 64 when off the board (64 stays 64)"""
+    step = [[64] * 65 for _ in DIRECTIONS]
+    for d, (df, dr) in enumerate(DIRECTIONS):
+        for sq in range(64):
+            f, r = sq % 8 + df, sq // 8 + dr
+            if 0 <= f < 8 and 0 <= r < 8:
+                step[d][sq] = r * 8 + f
+    return step
+
+
+STEP = _step_table()
+
+
+def parse_material(name):
+    """'KQvKR' -> [(piece type, is white), ...] in table order"""
+    white, _, black = name.partition("v")
+    pieces = []
+    for letters, is_white in ((white, True), (black, False)):
+        if not letters.startswith("K") or any(letter not in PIECE_TYPES for letter in letters):
+            raise ValueError(f"Bad material {name!r}")
+        pieces.extend((PIECE_TYPES[letter], is_white) for letter in letters)
+    return pieces
+
+
+def _side_name(letters):
+    return "".join(sorted(letters, key=LETTER_ORDER.index))
+
+
+def canonical_name(white_letters, black_letters):
+    """(table name, colors swapped) for the pieces of each side
+
+    The side with more material is white in the table; positions where it
+    is black are probed with the colors swapped and the board mirrored.
+    """
+    white, black = _side_name(white_letters), _side_name(black_letters)
+
+    def strength(side):
+        return (sum(LETTER_VALUES[letter] for letter in side), len(side),
+                [-LETTER_ORDER.index(letter) for letter in side])
+
+    if strength(black) > strength(white):
+        return f"{black}v{white}", True
+    return f"{white}v{black}", False
+
+
+class Tablebases:
+    """Lazily memory-mapped tables in one directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}  # name -> mapped array, or None when the file is missing
+        self.layouts = {}  # sorted piece codes -> layout()
+        self.probes = 0
+        self.hits = 0
+
+    def table(self, name):
+        """Mapped array for a table name, or None"""
+        if name not in self.tables:
+            path = os.path.join(self.directory, name + ".npy")
+            self.tables[name] = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+        return self.tables[name]
+
+    def layout(self, signature):
+        """(table name, colors swapped, canonical order) for a sorted tuple of
+        piece codes, or None when no table covers it"""
+        if len(signature) > MAX_PIECES or any(piece & 0x07 not in PIECE_LETTERS
+                                              for piece in signature):
+            return None
+        white = [(PIECE_LETTERS[piece & 0x07], i) for i, piece in enumerate(signature)
+                 if piece & 0x08]
+        black = [(PIECE_LETTERS[piece & 0x07], i) for i, piece in enumerate(signature)
+                 if not piece & 0x08]
+        name, swapped = canonical_name([letter for letter, _ in white],
+                                       [letter for letter, _ in black])
+        order = []
+        for side in ((black, white) if swapped else (white, black)):
+            order.extend(i for _, i in sorted(side, key=lambda item: LETTER_ORDER.index(item[0])))
+        return name, swapped, order
+
+    def probe(self, board, current_player):
+        """Raw table value for a VideoChess board, or None if not covered"""
+        self.probes += 1
+        pieces = sorted((board[sq] & 0x0F, sq) for sq in range(64) if board[sq])
+        signature = tuple(piece for piece, _ in pieces)
+        if signature not in self.layouts:
+            self.layouts[signature] = self.layout(signature)
+        layout = self.layouts[signature]
+        if layout is None:
+            return None
+        name, swapped, order = layout
+        if name in DRAWN:
+            self.hits += 1
+            return 0
+        table = self.table(name)
+        if table is None:
+            return None
+
+        flip = 56 if swapped else 0  # Mirror ranks when the colors swap
+        king = pieces[order[0]][1] ^ flip
+        transform = SYMMETRY[KING_TRANSFORM[king]]
+        index = 0
+        for i in order[1:]:
+            index = (index << 6) | transform[pieces[i][1] ^ flip]
+        self.hits += 1
+        return int(table[current_player ^ swapped, TRIANGLE_INDEX[transform[king]], index])
+
+    def best_move(self, game):
+        """(move, value after it) that keeps the best table result, or None"""
+        white = game.current_player == 0
+        color_mask = 0x08 if white else 0x80
+        own_king = 0x09 if white else 0x01
+        best, best_rank, best_value = None, None, None
+        for move in game.generate_moves(color_mask):
+            game.make_move(move)
+            king = game.board.index(own_king) if own_king in game.board else -1
+            if king < 0 or game.is_square_attacked(king, 0x80 if white else 0x08):
+                game.unmake_move()
+                continue
+            value = self.probe(game.board, game.current_player)
+            game.unmake_move()
+            if value is None:
+                return None
+            # Opponent lost fastest, then draws, then opponent winning slowest
+            if value == 0:
+                rank = (1, 0)
+            elif (value - 1) % 2 == 0:
+                rank = (2, -value)
+            else:
+                rank = (0, value)
+            if best_rank is None or rank > best_rank:
+                best, best_rank, best_value = move, rank, value
+        return None if best is None else (best, best_value)
+
+
+def score(value, ply, win_score):
+    """Search score for a raw table value seen at ply"""
+    if value == 0:
+        return 0
+    distance = value - 1
+    if distance % 2:
+        return win_score - ply - distance
+    return -(win_score - ply - distance)
+
+
+class _Builder:
+    """Retrograde analysis of one material set over all 64^k placements"""
+
+    def __init__(self, name, tablebases):
+        self.name = name
+        self.tablebases = tablebases
+        self.pieces = parse_material(name)
+        self.k = len(self.pieces)
+        self.size = 64 ** self.k
+        self.shifts = [6 * (self.k - 1 - j) for j in range(self.k)]
+        # Slots of the white and black kings (each side's first piece)
+        self.kings = [0, len(name.partition("v")[0])]
+        self._attack_tables()
+
+    def _attack_tables(self):
+        """Leaper attacks, slider alignment and between-square masks as 64x64 arrays"""
+        king = np.zeros((64, 64), dtype=bool)
+        knight = np.zeros((64, 64), dtype=bool)
+        orthogonal = np.zeros((64, 64), dtype=bool)
+        diagonal = np.zeros((64, 64), dtype=bool)
+        between = np.zeros((64, 64), dtype=np.uint64)
+        # Free steps along each direction: to the edge, and before each square on the ray
+        room = np.zeros((len(DIRECTIONS), 64), dtype=np.uint8)
+        block = np.full((len(DIRECTIONS), 64, 64), 7, dtype=np.uint8)
+        for d, (df, dr) in enumerate(DIRECTIONS):
+            for sq in range(64):
+                target, steps = STEP[d][sq], 0
+                while target < 64:
+                    block[d, sq, target] = steps
+                    steps += 1
+                    target = STEP[d][target]
+                room[d, sq] = steps
+                if d >= 8:
+                    if STEP[d][sq] < 64:
+                        knight[sq, STEP[d][sq]] = True
+                    continue
+                if STEP[d][sq] < 64:
+                    king[sq, STEP[d][sq]] = True
+                mask, target = 0, STEP[d][sq]
+                while target < 64:
+                    (orthogonal if d < 4 else diagonal)[sq, target] = True
+                    between[sq, target] = mask
+                    mask |= 1 << target
+                    target = STEP[d][target]
+        self.leaper = {1: king, 4: knight}
+        self.lines = {2: orthogonal | diagonal, 3: diagonal, 5: orthogonal}
+        self.between = between
+        self.room, self.block = room, block
+
+        # (from, to, squares that must be empty) for every quiet move of each piece type
+        self.moves = {}
+        for piece_type, (directions, slides) in PIECE_DIRECTIONS.items():
+            moves = []
+            for sq in range(64):
+                for d in directions:
+                    path, target = [], STEP[d][sq]
+                    while target < 64:
+                        path.append(target)
+                        moves.append((sq, target, list(path)))
+                        if not slides:
+                            break
+                        target = STEP[d][target]
+            self.moves[piece_type] = moves
+        self.deltas = [df + 8 * dr for df, dr in DIRECTIONS]
+
+    def decode(self, index):
+        """Square arrays (uint8) for every piece of the given position indices"""
+        return [((index >> shift) & 63).astype(np.uint8) for shift in self.shifts]
+
+    @staticmethod
+    def occupancy(squares):
+        occ = np.zeros(len(squares[0]), dtype=np.uint64)
+        for sq in squares:
+            occ |= np.left_shift(np.uint64(1), sq.astype(np.uint64))
+        return occ
+
+    def attacked(self, target, squares, occ, attackers):
+        """Whether any attacker (piece slot, type) attacks the target squares"""
+        hit = np.zeros(len(target), dtype=bool)
+        for slot, piece_type in attackers:
+            source = squares[slot]
+            if piece_type in self.leaper:
+                hit |= self.leaper[piece_type][source, target]
+            else:
+                hit |= self.lines[piece_type][source, target] & (
+                    (self.between[source, target] & occ) == 0)
+        return hit
+
+    def side_pieces(self, white):
+        return [(slot, piece_type) for slot, (piece_type, is_white) in enumerate(self.pieces)
+                if is_white == white]
+
+    def legality(self):
+        """legal[side] and in_check[side] over every placement"""
+        legal = np.zeros((2, self.size), dtype=bool)
+        in_check = np.zeros((2, self.size), dtype=bool)
+        for start in range(0, self.size, CHUNK):
+            part = slice(start, min(start + CHUNK, self.size))
+            squares = self.decode(np.arange(part.start, part.stop, dtype=np.int64))
+            distinct = np.ones(part.stop - part.start, dtype=bool)
+            for a in range(self.k):
+                for b in range(a + 1, self.k):
+                    distinct &= squares[a] != squares[b]
+            occ = self.occupancy(squares)
+            white_king, black_king = squares[self.kings[0]], squares[self.kings[1]]
+            black_checked = self.attacked(black_king, squares, occ, self.side_pieces(True))
+            white_checked = self.attacked(white_king, squares, occ, self.side_pieces(False))
+            # The side that just moved can't be left in check
+            legal[0, part] = distinct & ~black_checked
+            legal[1, part] = distinct & ~white_checked
+            in_check[0, part] = white_checked
+            in_check[1, part] = black_checked
+        return legal, in_check
+
+    def capture_values(self, mover_white, squares, slot, victim):
+        """Table values (for the side to move next) after slot captures victim,
+        and whether the capture leaves the mover's king safe"""
+        white, black = [], []
+        for j, (piece_type, is_white) in enumerate(self.pieces):
+            if j == victim:
+                continue
+            sq = squares[victim] if j == slot else squares[j]
+            (white if is_white else black).append((PIECE_LETTERS[piece_type], sq))
+        name, swapped = canonical_name([letter for letter, _ in white],
+                                       [letter for letter, _ in black])
+        # Capturing side's king must not be left attacked
+        own, other = (white, black) if mover_white else (black, white)
+        own_king = own[0][1]
+        occ = self.occupancy([sq for _, sq in white + black])
+        hit = np.zeros(len(own_king), dtype=bool)
+        for letter, sq in other:
+            piece_type = PIECE_TYPES[letter]
+            if piece_type in self.leaper:
+                hit |= self.leaper[piece_type][sq, own_king]
+            else:
+                hit |= self.lines[piece_type][sq, own_king] & ((self.between[sq, own_king] & occ) == 0)
+        if name in DRAWN:
+            return np.zeros(len(own_king), dtype=np.uint8), ~hit
+
+        table = self.tablebases.table(name)
+        if table is None:
+            raise RuntimeError(f"{self.name} needs the {name} table; build it first")
+        next_white = not mover_white
+        if swapped:
+            white, black = ([(letter, sq ^ 56) for letter, sq in black],
+                            [(letter, sq ^ 56) for letter, sq in white])
+            next_white = not next_white
+        ordered = []
+        for pieces in (white, black):
+            pieces = sorted(pieces, key=lambda item: LETTER_ORDER.index(item[0]))
+            ordered.extend(np.asarray(sq, dtype=np.int64) for _, sq in pieces)
+        symmetry = np.array(SYMMETRY, dtype=np.int64)
+        transform = np.array(KING_TRANSFORM)[ordered[0]]
+        rest = np.zeros(len(own_king), dtype=np.int64)
+        for sq in ordered[1:]:
+            rest = (rest << 6) | symmetry[transform, sq]
+        triangle = np.array(TRIANGLE_INDEX)[symmetry[transform, ordered[0]]]
+        values = np.asarray(table[0 if next_white else 1])[triangle, rest]
+        return values, ~hit
+
+    def forward(self, side, legal):
+        """Move counts plus capture outcomes for side to move"""
+        mover_white = side == 0
+        count = np.zeros(self.size, dtype=np.int16)
+        capture_wins, capture_losses = {}, {}
+
+        # Quiet moves, one (from, to) square pair at a time over the board
+        # slices holding the mover there: the other pieces must be off the
+        # path and the position after the move legal
+        shape = (64,) * self.k
+        grid = count.reshape(shape)
+        reachable = legal[1 - side].reshape(shape)
+        for slot, piece_type in self.side_pieces(mover_white):
+            others = [j for j in range(self.k) if j != slot]
+            for source, target, path in self.moves[piece_type]:
+                allowed = reachable[(slice(None),) * slot + (target,)]
+                for axis, j in enumerate(others):
+                    free = np.ones(64, dtype=bool)
+                    free[path] = False
+                    allowed = allowed & free.reshape((64,) + (1,) * (self.k - 2 - axis))
+                grid[(slice(None),) * slot + (source,)] += allowed
+        count[~legal[side]] = 0
+
+        # Captures resolve through the smaller tables
+        for start in range(0, self.size, CHUNK):
+            positions = start + np.flatnonzero(legal[side, start:start + CHUNK])
+            squares = self.decode(positions)
+            occ = self.occupancy(squares)
+            for slot, piece_type in self.side_pieces(mover_white):
+                for victim, _ in self.side_pieces(not mover_white):
+                    source, target = squares[slot], squares[victim]
+                    if piece_type in self.leaper:
+                        hit = self.leaper[piece_type][source, target]
+                    else:
+                        hit = self.lines[piece_type][source, target] & (
+                            (self.between[source, target] & occ) == 0)
+                    if not hit.any():
+                        continue
+                    values, safe = self.capture_values(
+                        mover_white, [sq[hit] for sq in squares], slot, victim)
+                    where = positions[hit][safe]
+                    values = values[safe]
+                    # Drawing or winning captures mean the position is never lost
+                    count[where[(values == 0) | (values % 2 == 1)]] = NEVER_LOST
+                    for value in np.unique(values[values > 0]):
+                        group = where[values == value]
+                        distance = int(value) - 1
+                        if distance % 2 == 0:  # Opponent is mated in distance
+                            capture_wins.setdefault(distance + 1, []).append(group)
+                        else:  # Opponent mates in distance
+                            count[group] += 1
+                            capture_losses.setdefault(distance + 1, []).append(group)
+        return count, capture_wins, capture_losses
+
+    def predecessors(self, frontier, mover_white, legal_mover):
+        """Position indices (one per move) that reach frontier by a quiet move"""
+        squares = self.decode(frontier)
+        found = []
+        for slot, piece_type in self.side_pieces(mover_white):
+            directions, slides = PIECE_DIRECTIONS[piece_type]
+            origin = squares[slot]
+            for d in directions:
+                # Steps the piece could have come from: up to the edge or the
+                # first square holding another piece
+                limit = self.room[d][origin]
+                for j, sq in enumerate(squares):
+                    if j != slot:
+                        limit = np.minimum(limit, self.block[d][origin, sq])
+                for steps in range(1, 8 if slides else 2):
+                    reached = limit >= steps
+                    if not reached.any():
+                        break
+                    found.append(frontier[reached] + ((steps * self.deltas[d]) << self.shifts[slot]))
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        found = np.concatenate(found)
+        return found[legal_mover[found]]
+
+    def build(self):
+        """Full (2, 64^k) array of values"""
+        legal, in_check = self.legality()
+        values = np.zeros((2, self.size), dtype=np.uint8)
+        counts, wins, losses = [], [], []
+        for side in (0, 1):
+            count, capture_wins, capture_losses = self.forward(side, legal)
+            counts.append(count)
+            wins.append({n: np.concatenate(groups) for n, groups in capture_wins.items()})
+            losses.append({n: np.concatenate(groups) for n, groups in capture_losses.items()})
+        last_scheduled = max([n for side in (0, 1) for n in list(wins[side]) + list(losses[side])],
+                             default=0)
+
+        # Ply 0: checkmates. Illegal and stalemate positions can never be
+        # lost, so their counts are set out of reach
+        frontier = []
+        for side in (0, 1):
+            no_moves = legal[side] & (counts[side] == 0)
+            values[side, no_moves & in_check[side]] = 1
+            counts[side][~legal[side] | (no_moves & ~in_check[side])] = NEVER_LOST
+            frontier.append(np.flatnonzero(values[side] == 1))
+
+        ply = 0
+        while ply < 253:
+            ply += 1
+            if not any(len(f) for f in frontier) and ply > last_scheduled:
+                break
+            next_frontier = []
+            for side in (0, 1):
+                source = frontier[1 - side]
+                scheduled = (wins if ply % 2 else losses)[side].get(ply)
+                if len(source) < SMALL_FRONTIER:
+                    # Sort out duplicates of a few predecessors directly
+                    preceding = self.predecessors(source, side == 0, legal[side])
+                    if scheduled is not None:
+                        preceding = np.concatenate([preceding, scheduled])
+                    if ply % 2 == 0:
+                        np.subtract.at(counts[side], preceding, 1)
+                        preceding = preceding[counts[side][preceding] == 0]
+                    preceding = preceding[values[side, preceding] == 0]
+                    values[side, preceding] = ply + 1
+                    preceding.sort()
+                    next_frontier.append(preceding[np.diff(preceding, prepend=-1) != 0])
+                    continue
+
+                # Large frontiers go in chunks, then one scan finds the new positions
+                parts = (self.predecessors(source[start:start + CHUNK], side == 0, legal[side])
+                         for start in range(0, len(source), CHUNK))
+                if scheduled is not None:
+                    parts = itertools.chain(parts, [scheduled])
+                for preceding in parts:
+                    if ply % 2:
+                        # Wins: some move reaches a position lost for the opponent
+                        values[side, preceding[values[side, preceding] == 0]] = ply + 1
+                    else:
+                        # Losses: the last move avoiding an opponent win is gone
+                        counts[side] -= np.bincount(preceding, minlength=self.size).astype(np.int16)
+                if ply % 2 == 0:
+                    values[side, (counts[side] == 0) & (values[side] == 0)] = ply + 1
+                next_frontier.append(np.flatnonzero(values[side] == ply + 1))
+            frontier = next_frontier
+        return values
+
+    def reduce(self, values):
+        """Keep placements with the white king in the triangle"""
+        return np.ascontiguousarray(values.reshape(2, 64, -1)[:, TRIANGLE, :])
+
+
+def build_table(name, directory, tablebases=None):
+    """Build one table into directory; returns the reduced array"""
+    tablebases = tablebases or Tablebases(directory)
+    builder = _Builder(name, tablebases)
+    table = builder.reduce(builder.build())
+    os.makedirs(directory, exist_ok=True)
+    # Write then rename so a reader never maps a half-written table
+    path = os.path.join(directory, name + ".npy")
+    with open(path + ".tmp", "wb") as file:
+        np.save(file, table)
+    os.replace(path + ".tmp", path)
+    tablebases.tables.pop(name, None)
+    return table
+
+
+def longest_mate(table):
+    """Longest forced mate in a table, in moves"""
+    distances = table[table > 0].astype(np.int16) - 1
+    return (int(distances[distances % 2 == 1].max(initial=0)) + 1) // 2
+
+
+def build_order(names):
+    """Tables in names plus the smaller ones they need, smallest first"""
+    needed = set()
+
+    def add(name):
+        if name in needed or name in DRAWN:
+            return
+        needed.add(name)
+        white, _, black = name.partition("v")
+        # Every capture leads to a table with one piece fewer
+        for i in range(1, len(white)):
+            add(canonical_name(white[:i] + white[i + 1:], black)[0])
+        for i in range(1, len(black)):
+            add(canonical_name(white, black[:i] + black[i + 1:])[0])
+
+    for name in names:
+        parse_material(name)
+        canonical = canonical_name(*name.split("v"))[0]
+        if canonical != name:
+            raise ValueError(f"{name} is not a canonical table name (use {canonical})")
+        add(name)
+    return sorted(needed, key=lambda name: (len(name), DEFAULT_TABLES.index(name)
+                                            if name in DEFAULT_TABLES else 0, name))
+
+
+def _build_job(job):
+    """Pool worker: build one table and report (name, seconds, longest mate)"""
+    name, directory = job
+    start = time.perf_counter()
+    table = build_table(name, directory)
+    return name, time.perf_counter() - start, longest_mate(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build Video Chess endgame tablebases")
+    parser.add_argument("tables", nargs="*", help="tables to build, e.g. KQvK KQvKR (default: all)")
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "tablebases"),
+                        help="output directory (default tablebases/ next to this file)")
+    parser.add_argument("--jobs", type=int, default=min(4, multiprocessing.cpu_count()),
+                        help="tables built at once; each 4 piece build needs about 700 MB "
+                             "(default: cores, at most 4)")
+    parser.add_argument("--force", action="store_true", help="rebuild tables that already exist")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        sys.exit("Building tablebases needs NumPy (pip install numpy)")
+
+    pending = [name for name in build_order(args.tables or DEFAULT_TABLES)
+               if args.force or not os.path.exists(os.path.join(args.dir, name + ".npy"))]
+    # Tables only depend on ones with fewer pieces, so each size builds in parallel
+    for size in sorted({len(name) - 1 for name in pending}):
+        jobs = [(name, args.dir) for name in pending if len(name) - 1 == size]
+        if args.jobs > 1 and len(jobs) > 1:
+            with multiprocessing.Pool(min(args.jobs, len(jobs))) as pool:
+                results = list(pool.imap(_build_job, jobs))
+        else:
+            results = map(_build_job, jobs)
+        for name, seconds, longest in results:
+            print(f"{name}: {seconds:.1f}s, longest mate {longest} moves", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
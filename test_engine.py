@@ -0,0 +1,578 @@
+"""
+Atari 2600 Video Chess - Engine Tests
+Incremental evaluation and Zobrist keys against a full recompute through
+random make/unmake sequences, move generation against the standard perft
+counts, batch move generation against movegen, round trips through packed
+positions, the opening book and the game record formats, and the
+evaluation cache within and between processes.
+
+    python -m unittest test_engine   # or: python -m pytest test_engine.py
+"""
+
+import io
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import analysis
+import benchmark
+import book
+import evalcache
+import evaluation
+import ordering
+import movegen
+import pgn
+import positions
+import profiler
+import search
+import tablebase
+import transposition
+import zobrist
+from video_chess import VideoChess, START_FEN, parse_square
+
+try:
+    import batch
+except ImportError:  # Batch move generation needs NumPy
+    batch = None
+
+# Standard perft counts (chessprogramming.org) for positions whose move
+# trees reach no promotion at these depths; the engine has no promotion
+STANDARD_PERFT = {
+    "start": (START_FEN, [20, 400, 8902, 197281]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862]),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+}
+
+# Random games per starting position, and plies per game
+RANDOM_GAMES = 20
+RANDOM_PLIES = 60
+
+# Movetext with everything read_pgn skips: comments (one spanning lines),
+# nested variations, NAGs, a rest-of-line comment and an escape line
+ANNOTATED_PGN = """[Event "Test \\"quoted\\""]
+[Site "?"]
+
+1. e4 {best by test} e5 $1 (1... c5 2. Nf3 (2. c3) d6) 2. Nf3 ; the main line
+%escaped line 3. Qh5
+2... Nc6 {a comment
+over two lines} 3. Bb5 a6 $6 1-0
+
+[Event "Second"]
+[FEN "4k3/8/8/8/8/8/4P3/4K3 b - - 0 40"]
+
+40... Kd7 41. e4
+[Event "Third"]
+
+1. d4 *
+"""
+# Keys with the top bit set, which SQLite stores as negative integers
+HIGH_KEY = 0xF00D << 48
+
+
+def _store_keys(path, first, count):
+    """Cache writer process: store count results from key first up, then close"""
+    cache = evalcache.EvalCache(path, flush_interval=0.05)
+    for key in range(first, first + count):
+        cache.store(HIGH_KEY + key, key % 7, transposition.EXACT, key, (key % 64, 63 - key % 64))
+    cache.close()
+
+
+class IncrementalStateTest(unittest.TestCase):
+    def assert_matches_recompute(self, game, context):
+        expected_eval = evaluation.full_recompute(game.board)
+        self.assertEqual((game.eval_opening, game.eval_endgame, game.eval_phase), expected_eval,
+                         f"incremental evaluation drifted {context}")
+        expected_key = zobrist.compute_hash(game.board, game.current_player,
+                                            game.castling_flags, game.en_passant_square)
+        self.assertEqual(game.hash_key, expected_key, f"hash key drifted {context}")
+
+    def test_random_make_unmake(self):
+        rng = random.Random(8)
+        game = VideoChess(book_path=None, tablebase_path=None)
+        for name in ("start", "kiwipete", "castling", "en-passant", "middlegame"):
+            for index in range(RANDOM_GAMES):
+                game.set_fen(benchmark.POSITIONS[name])
+                start = game.get_position()
+                for ply in range(RANDOM_PLIES):
+                    moves = game.generate_moves(0x08 if game.current_player == 0 else 0x80)
+                    if not moves:
+                        break
+                    move = rng.choice(moves)
+                    game.make_move(move)
+                    self.assert_matches_recompute(game, f"after {move} ({name} game {index} ply {ply})")
+                    # Take back now and then to check unmake mid-game too
+                    if rng.random() < 0.2:
+                        game.unmake_move()
+                        self.assert_matches_recompute(game, f"after unmaking {move} ({name} game {index})")
+                while game.undo_stack:
+                    game.unmake_move()
+                self.assert_matches_recompute(game, f"after unwinding {name} game {index}")
+                self.assertEqual(game.get_position(), start)
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def test_bucket_replacement(self):
+        tt = transposition.TranspositionTable(1)
+        shallow, deep, newest = (7 + bucket * (tt.bucket_mask + 1) for bucket in (1, 2, 3))
+        tt.store(shallow, 3, transposition.EXACT, 10, (8, 16))
+        tt.store(deep, 6, transposition.LOWER, 20, (9, 17))
+        # The deeper entry takes the first slot and the one it displaced keeps the second
+        self.assertEqual(tt.probe(shallow), (3, transposition.EXACT, 10, (8, 16)))
+        self.assertEqual(tt.probe(deep), (6, transposition.LOWER, 20, (9, 17)))
+        tt.store(newest, 1, transposition.UPPER, -30)
+        self.assertIsNone(tt.probe(shallow))
+        self.assertEqual(tt.probe(newest), (1, transposition.UPPER, -30, None))
+        self.assertEqual(tt.probe(deep), (6, transposition.LOWER, 20, (9, 17)))
+        # Storing a key again replaces it in place, whatever its depth
+        tt.store(deep, 2, transposition.EXACT, 5)
+        self.assertEqual(tt.probe(deep), (2, transposition.EXACT, 5, None))
+        self.assertEqual(tt.probe(newest), (1, transposition.UPPER, -30, None))
+
+
+class StagedMovesTest(unittest.TestCase):
+    def test_each_legal_move_once(self):
+        """Every stage combination yields the legal moves exactly once, with
+        an en passant capture stored as a killer among them"""
+        game = VideoChess(book_path=None, tablebase_path=None)
+        game.set_fen(benchmark.POSITIONS["en-passant"])
+        legal = game.generate_moves(0x08)
+        staged = ordering.MoveOrdering(game.piece_values, 4)
+        en_passant = (36, 45)  # E5xF6
+        self.assertIn(en_passant, legal)
+        staged.killers[0] = [en_passant, (6, 21)]
+        for tt_move in (None, en_passant, (6, 21), legal[0]):
+            with self.subTest(tt_move=tt_move):
+                moves = list(staged.staged_moves(game, 0x08, 0, tt_move))
+                self.assertEqual(sorted(moves), sorted(legal))
+
+
+class SlicedSearchTest(unittest.TestCase):
+    """Search.steps duplicates the recursion of Search.run so it can yield
+    between slices; both must search the same tree"""
+
+    def test_same_tree_as_run(self):
+        for name in ("start", "kiwipete", "en-passant", "middlegame"):
+            for level in (1, 2, 3):
+                with self.subTest(position=name, difficulty=level):
+                    game = VideoChess(book_path=None, tablebase_path=None)
+                    game.set_fen(benchmark.POSITIONS[name])
+                    max_depth = search.difficulty_limits(level)[0]
+                    whole = search.Search(game, max_depth=max_depth,
+                                          tt=transposition.TranspositionTable(1))
+                    whole.run()
+                    sliced = search.Search(game, max_depth=max_depth,
+                                           tt=transposition.TranspositionTable(1))
+                    for _ in sliced.steps(50):
+                        pass
+                    self.assertEqual((sliced.best_move, sliced.best_score, sliced.nodes,
+                                      sliced.completed_depth),
+                                     (whole.best_move, whole.best_score, whole.nodes,
+                                      whole.completed_depth))
+
+    def test_search_steps_matches_find_best_move(self):
+        for level in (1, 2, 3):
+            with self.subTest(difficulty=level):
+                game = VideoChess(book_path=None, tablebase_path=None)
+                game.set_difficulty(level)
+                game.frame_nodes = 50
+                steps = game.search_steps()
+                try:
+                    while True:
+                        next(steps)
+                except StopIteration as stop:
+                    sliced_move = stop.value
+                self.assertEqual(game.get_fen(), START_FEN)
+                game = VideoChess(book_path=None, tablebase_path=None)
+                game.set_difficulty(level)
+                self.assertEqual(sliced_move, game.find_best_move())
+
+
+class GameRecordTest(unittest.TestCase):
+    def random_games(self, count, seed):
+        """(SAN moves, engine moves) of random games from the start position"""
+        rng = random.Random(seed)
+        game = VideoChess(book_path=None, tablebase_path=None)
+        for _ in range(count):
+            game.init_board()
+            sans, moves = [], []
+            for _ in range(rng.randint(1, 80)):
+                legal = game.generate_moves(pgn.color_mask(game))
+                if not legal:
+                    break
+                move = rng.choice(legal)
+                san = pgn.move_to_san(game, move, legal)
+                self.assertEqual(pgn.san_to_move(game, san, legal), move, san)
+                sans.append(san)
+                moves.append(move)
+                game.make_move(move)
+            yield sans, moves
+
+    def test_san_round_trip(self):
+        for sans, moves in self.random_games(40, seed=21):
+            game = pgn.start_game({}, VideoChess(book_path=None, tablebase_path=None))
+            for san, move in zip(sans, moves):
+                self.assertEqual(pgn.san_to_move(game, san), move)
+                game.make_move(move)
+
+    def test_pgn_round_trip(self):
+        out = io.StringIO()
+        games = []
+        for index, (sans, _) in enumerate(self.random_games(10, seed=12)):
+            tags = {"Event": "Round trip", "Round": str(index + 1), "Annotator": 'A "quoted" \\ name'}
+            # A closing brace inside a comment mustn't end it early
+            comments = [f"ply {ply} {{braced}}" if ply % 3 == 0 else None for ply in range(len(sans))]
+            pgn.write_pgn(out, tags, sans, "1/2-1/2", comments)
+            games.append((tags, sans))
+        out.seek(0)
+        records = list(pgn.read_pgn(out))
+        self.assertEqual(len(records), len(games))
+        for (tags, sans), (read_tags, read_moves, result) in zip(games, records):
+            self.assertEqual(read_moves, sans)
+            self.assertEqual(result, "1/2-1/2")
+            self.assertEqual({name: read_tags[name] for name in tags}, tags)
+            self.assertEqual(read_tags["Date"], "????.??.??")
+
+    def test_read_pgn_skips_annotations(self):
+        records = list(pgn.read_pgn(io.StringIO(ANNOTATED_PGN)))
+        self.assertEqual([(moves, result) for _, moves, result in records], [
+            (["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"], "1-0"),
+            (["Kd7", "e4"], "*"),
+            (["d4"], "*"),
+        ])
+        self.assertEqual(records[0][0]["Event"], 'Test "quoted"')
+        # The second game replays from its FEN tag
+        game = pgn.start_game(records[1][0])
+        for san in records[1][1]:
+            game.make_move(pgn.san_to_move(game, san))
+        self.assertEqual(game.get_fen().split()[:2], ["8/3k4/8/8/4P3/8/8/4K3", "b"])
+
+    def test_epd_round_trip(self):
+        fen = benchmark.POSITIONS["kiwipete"]
+        operations = {"id": ["kiwipete; white to move"], "bm": ["Qxf6", "e5"],
+                      "c0": [""], "acd": [6], "hmvc": ["3"], "fmvn": ["17"]}
+        out = io.StringIO()
+        pgn.write_epd(out, fen, operations)
+        self.assertIn('id "kiwipete; white to move";', out.getvalue())
+        read_fen, read_operations = next(pgn.read_epd(io.StringIO(out.getvalue())))
+        self.assertEqual(read_fen, " ".join(fen.split()[:4] + ["3", "17"]))
+        self.assertEqual(read_operations, {opcode: [str(operand) for operand in operands]
+                                           for opcode, operands in operations.items()})
+
+    def test_score_text(self):
+        self.assertEqual(analysis.score_text(35), "0.35")
+        self.assertEqual(analysis.score_text(-120), "-1.20")
+        self.assertEqual(analysis.score_text(search.MATE_SCORE - 1), "#1")
+        self.assertEqual(analysis.score_text(-(search.MATE_SCORE - 4)), "#-2")
+        # Tablebase wins and losses are mates too, not large evals
+        win = tablebase.score(8, 3, search.TABLEBASE_WIN)  # Mate at ply 3 + 7
+        self.assertEqual(analysis.score_text(win), "#5")
+        self.assertEqual(analysis.score_text(-win), "#-5")
+        self.assertEqual(analysis.score_text(tablebase.score(255, search.MAX_PLY, search.TABLEBASE_WIN)),
+                         "#-159")
+
+
+def sample_positions():
+    """get_position() tuples: the benchmark positions plus random games from the start"""
+    game = VideoChess(book_path=None, tablebase_path=None)
+    samples = []
+    for fen in benchmark.POSITIONS.values():
+        game.set_fen(fen)
+        samples.append(game.get_position())
+    return samples + [game.get_position() for game in benchmark.random_positions(300, seed=12)]
+
+
+class PackedPositionTest(unittest.TestCase):
+    def test_pack_round_trip(self):
+        game = VideoChess(book_path=None, tablebase_path=None)
+        for position in sample_positions():
+            game.set_position(position)
+            record = positions.pack_position(game)
+            self.assertEqual(len(record), positions.RECORD_SIZE)
+            self.assertEqual(positions.unpack_position(record), position)
+
+    def test_database_round_trip(self):
+        samples = sample_positions()
+        game = VideoChess(book_path=None, tablebase_path=None)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "positions.bin")
+            with positions.PositionWriter(path) as writer:
+                for position in samples:
+                    game.set_position(position)
+                    writer.write(game)
+            with positions.PositionDatabase(path) as database:
+                self.assertEqual(len(database), len(samples))
+                self.assertEqual(list(database), samples)
+                self.assertEqual(database.position(-1), samples[-1])
+                self.assertEqual(database.load(5, game).get_position(), samples[5])
+                record = database[7]
+                self.assertEqual(positions.unpack_position(record), samples[7])
+                with self.assertRaises(IndexError):
+                    database[len(samples)]
+            # Records kept past close() are still readable
+            self.assertEqual(positions.unpack_position(record), samples[7])
+
+
+@unittest.skipIf(batch is None, "NumPy is not installed")
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.samples = sample_positions()
+        self.boards = batch.from_games(self.samples)
+        self.side = [position[1] for position in self.samples]
+        self.castling = [position[2] for position in self.samples]
+        self.en_passant = [position[3] for position in self.samples]
+
+    def test_moves_match_movegen(self):
+        white = [side == 0 for side in self.side]
+        masks = batch.move_masks(self.boards, white, self.castling, self.en_passant)
+        rows, sources, dests = batch.move_lists(masks)
+        found = [set() for _ in self.samples]
+        for row, source, dest in zip(rows.tolist(), sources.tolist(), dests.tolist()):
+            found[row].add((source, dest))
+        for index, (board, side, castling, en_passant) in enumerate(self.samples):
+            expected = movegen.generate_moves(list(board), 0x08 if side == 0 else 0,
+                                              en_passant, castling)
+            self.assertEqual(found[index], set(expected), index)
+            self.assertEqual(len(expected), batch.move_counts(
+                self.boards[index:index + 1], white[index], castling, en_passant)[0])
+
+    def test_attacks_match_movegen(self):
+        for white in (0x08, 0):
+            maps = batch.attack_maps(self.boards, bool(white)).tolist()
+            for attacks, (board, _, _, _) in zip(maps, self.samples):
+                expected = sum(1 << square for square in range(64)
+                               if movegen.is_square_attacked(list(board), square, white))
+                self.assertEqual(attacks, expected)
+
+    def test_evaluate_matches_full_recompute(self):
+        expected = [evaluation.blend(*evaluation.full_recompute(list(board)))
+                    for board, _, _, _ in self.samples]
+        self.assertEqual(batch.evaluate(self.boards).tolist(), expected)
+
+    def test_unpack_records(self):
+        game = VideoChess(book_path=None, tablebase_path=None)
+        records = []
+        for position in self.samples:
+            game.set_position(position)
+            records.append(positions.pack_position(game))
+        boards, side, castling, en_passant = batch.unpack_records(b"".join(records))
+        self.assertEqual(boards.tolist(), self.boards.tolist())
+        self.assertEqual((side.tolist(), castling.tolist(), en_passant.tolist()),
+                         (self.side, self.castling, self.en_passant))
+
+
+def coordinate_move(name):
+    return parse_square(name[:2]), parse_square(name[2:])
+
+
+class OpeningBookTest(unittest.TestCase):
+    # One game as a line of coordinate moves, one as a self-play record
+    GAMES = ["E2E4 E7E5 G1F3 1-0",
+             '{"moves": ["E2E4", "C7C5", "G1F3"], "result": "0-1"}']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "book.bin")
+
+    def open(self):
+        opening_book = book.OpeningBook(self.path)
+        self.addCleanup(opening_book.close)
+        return opening_book
+
+    def keys(self, names):
+        """Zobrist key after each prefix of a coordinate move sequence"""
+        game = VideoChess(book_path=None, tablebase_path=None)
+        keys = [game.hash_key]
+        for name in names:
+            game.make_move(coordinate_move(name))
+            keys.append(game.hash_key)
+        return keys
+
+    def test_probes_match_games(self):
+        weights = book.collect(book.parse_game(line) for line in self.GAMES)
+        self.assertEqual(book.write_book(weights, self.path, min_weight=0), 5)
+        opening_book = self.open()
+        self.assertEqual(len(opening_book), 5)
+        start, after_e4, after_e5, _ = self.keys(["E2E4", "E7E5", "G1F3"])
+        after_c5 = self.keys(["E2E4", "C7C5"])[2]
+        # A win is worth 2, a draw 1 and a loss 0 to the side that moved
+        self.assertEqual(opening_book.lookup(start), [(coordinate_move("E2E4"), 2)])
+        self.assertEqual(sorted(opening_book.lookup(after_e4)),
+                         sorted([(coordinate_move("E7E5"), 0), (coordinate_move("C7C5"), 2)]))
+        self.assertEqual(opening_book.lookup(after_e5), [(coordinate_move("G1F3"), 2)])
+        self.assertEqual(opening_book.lookup(after_c5), [(coordinate_move("G1F3"), 0)])
+        for key in (0, (1 << 64) - 1, start ^ 1):  # Before, after and between the entries
+            self.assertEqual(opening_book.lookup(key), [])
+
+        # Moves with no weight are never chosen, and nothing is left after c5
+        game = VideoChess(book_path=self.path, tablebase_path=None)
+        self.assertEqual(game.book_move(), coordinate_move("E2E4"))
+        self.addCleanup(game.opening_book.close)
+        game.make_move(coordinate_move("E2E4"))
+        self.assertEqual(game.book_move(), coordinate_move("C7C5"))
+        game.make_move(coordinate_move("C7C5"))
+        self.assertIsNone(game.book_move())
+
+    def test_min_weight(self):
+        weights = book.collect(book.parse_game(line) for line in self.GAMES)
+        self.assertEqual(book.write_book(weights, self.path, min_weight=1), 3)
+        after_e4 = self.keys(["E2E4"])[1]
+        self.assertEqual(self.open().lookup(after_e4), [(coordinate_move("C7C5"), 2)])
+
+    def test_weighted_choice(self):
+        start = VideoChess(book_path=None, tablebase_path=None)
+        e4, d4 = coordinate_move("E2E4"), coordinate_move("D2D4")
+        illegal = coordinate_move("A1A8")  # As a hash collision would store
+        book.write_book({(start.hash_key, book.encode_move(e4)): 3,
+                         (start.hash_key, book.encode_move(d4)): 1,
+                         (start.hash_key, book.encode_move(illegal)): 6}, self.path)
+        opening_book = self.open()
+        rng = random.Random(13)
+        picks = [opening_book.choose(start, rng) for _ in range(2000)]
+        self.assertEqual(set(picks), {e4, d4})
+        self.assertTrue(1350 < picks.count(e4) < 1650, picks.count(e4))
+
+
+class EvalCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+
+    def open(self, **options):
+        cache = evalcache.EvalCache(self.path, flush_interval=0.05, **options)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_store_flush_probe(self):
+        cache = self.open()
+        cache.store(HIGH_KEY + 1, 4, transposition.LOWER, -35, (12, 28))
+        cache.store(7, 2, transposition.EXACT, 10)
+        self.assertEqual(cache.probe(HIGH_KEY + 1), (4, transposition.LOWER, -35, (12, 28)))
+        cache.flush()
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.probe(HIGH_KEY + 1), (4, transposition.LOWER, -35, (12, 28)))
+        self.assertEqual(cache.probe(7), (2, transposition.EXACT, 10, None))
+        self.assertIsNone(cache.probe(8))
+        # A second cache on the file sees what the first wrote
+        other = self.open()
+        self.assertEqual(other.probe(HIGH_KEY + 1), (4, transposition.LOWER, -35, (12, 28)))
+
+    def test_processes_share_the_file(self):
+        reader = self.open()
+        context = multiprocessing.get_context("spawn")
+        # Two writer processes at once while this one holds the file open
+        writers = [context.Process(target=_store_keys, args=(self.path, first, 200))
+                   for first in (0, 200)]
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(len(reader), 400)
+        for key in (0, 199, 200, 399):
+            self.assertEqual(reader.probe(HIGH_KEY + key),
+                             (key % 7, transposition.EXACT, key, (key % 64, 63 - key % 64)))
+
+    def test_deeper_result_kept(self):
+        cache = self.open()
+        cache.store(5, 6, transposition.EXACT, 100, (1, 2))
+        cache.store(5, 3, transposition.EXACT, -100, (3, 4))  # Still queued: kept out
+        cache.flush()
+        cache.store(5, 4, transposition.UPPER, -50, (5, 6))  # In the file: the UPSERT guard
+        cache.flush()
+        self.assertEqual(self.open().probe(5), (6, transposition.EXACT, 100, (1, 2)))
+        cache.store(5, 6, transposition.LOWER, 70, (7, 8))  # Equal depth replaces
+        cache.flush()
+        self.assertEqual(self.open().probe(5), (6, transposition.LOWER, 70, (7, 8)))
+
+    def test_trim_drops_least_recently_used(self):
+        cache = self.open(max_entries=100)
+        for key in range(100):
+            cache.store(key, 1, transposition.EXACT, key)
+        cache.flush()
+        time.sleep(0.01)  # Later LRU stamps for what follows
+        for key in range(10):
+            cache.probe(key)
+        for key in range(100, 150):
+            cache.store(key, 1, transposition.EXACT, key)
+        cache.flush()
+        self.assertEqual(len(cache), int(100 * evalcache.TRIM_TO))
+        for key in list(range(10)) + list(range(100, 150)):
+            self.assertIsNotNone(cache.probe(key), key)
+
+    def test_warm(self):
+        cache = self.open()
+        keys = [HIGH_KEY + 3, 5, (1 << 64) - 1]  # Different buckets
+        for index, key in enumerate(keys):
+            cache.store(key, index + 1, transposition.EXACT, index * 10, (index, 40 + index))
+        cache.flush()
+        tt = transposition.TranspositionTable(1)
+        self.assertEqual(cache.warm(tt), 3)
+        for index, key in enumerate(keys):
+            self.assertEqual(tt.probe(key), (index + 1, transposition.EXACT, index * 10,
+                                             (index, 40 + index)))
+
+    def test_root_entry(self):
+        cache = self.open()
+        game = VideoChess(book_path=None, tablebase_path=None)
+        move = game.generate_moves(0x08)[0]
+        cache.store(game.hash_key, 4, transposition.EXACT, 20, move)
+        self.assertEqual(evalcache.root_entry(cache, game, 4), move)
+        self.assertIsNone(evalcache.root_entry(cache, game, 5))  # Too shallow
+        cache.store(game.hash_key, 4, transposition.LOWER, 20, move)
+        self.assertIsNone(evalcache.root_entry(cache, game, 4))  # Not exact
+        cache.store(game.hash_key, 4, transposition.EXACT, 20, (0, 63))
+        self.assertIsNone(evalcache.root_entry(cache, game, 4))  # Illegal here
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_counts_once_without_leaking(self):
+        original = movegen.is_square_attacked
+        instruments = profiler.Profiler()
+        game = instruments.attach(VideoChess(book_path=None, tablebase_path=None))
+        other = VideoChess(book_path=None, tablebase_path=None)
+        for square in range(8):
+            game.is_square_attacked(square, 0x80)
+            other.is_square_attacked(square, 0x80)
+        other.generate_moves(0x08)
+        self.assertIs(movegen.is_square_attacked, original)
+        self.assertEqual(instruments.calls["movegen.is_square_attacked"], 8)
+        self.assertNotIn("is_square_attacked", instruments.calls)
+
+        # The king-move filter's calls count too, and the patch is undone on errors
+        game.set_fen(benchmark.POSITIONS["kiwipete"])
+        game.generate_moves(0x08)
+        self.assertGreater(instruments.calls["movegen.is_square_attacked"], 8)
+        with self.assertRaises(TypeError):
+            game.make_move(None)
+        self.assertIs(movegen.is_square_attacked, original)
+        self.assertEqual(instruments.calls["generate_moves"], 1)
+        instruments.detach(game)
+        self.assertNotIn("generate_moves", game.__dict__)
+
+
+class PerftTest(unittest.TestCase):
+    def test_standard_counts(self):
+        game = VideoChess(book_path=None, tablebase_path=None)
+        for name, (fen, counts) in STANDARD_PERFT.items():
+            for depth, expected in enumerate(counts, 1):
+                with self.subTest(position=name, depth=depth):
+                    game.set_fen(fen)
+                    self.assertEqual(game.perft(depth), expected)
+
+    def test_benchmark_expectations(self):
+        game = VideoChess(book_path=None, tablebase_path=None)
+        for name, counts in benchmark.EXPECTED_PERFT.items():
+            for depth, expected in enumerate(counts, 1):
+                with self.subTest(position=name, depth=depth):
+                    game.set_fen(benchmark.POSITIONS[name])
+                    self.assertEqual(game.perft(depth), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
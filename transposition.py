@@ -0,0 +1,123 @@
+"""
+Atari 2600 Video Chess - Transposition Table
+Fixed-size table of search results keyed by Zobrist hash, stored in flat
+arrays so memory use is set once by the size cap. The arrays can live in a
+shared memory buffer so several search processes use one table.
+"""
+
+from array import array
+
+# Bound types
+EXACT = 0
+LOWER = 1  # Score is at least this (fail high)
+UPPER = 2  # Score is at most this (fail low)
+
+# Each entry is a 64-bit key plus a 64-bit packed data word. The key is
+# stored XORed with the data so an entry torn by two processes writing at
+# once fails the key check instead of returning the wrong data.
+ENTRY_BYTES = 16
+# Slot 0 of a bucket is depth-preferred, slot 1 is always-replace
+BUCKET_SLOTS = 2
+
+# Packed data layout:
+#   bits 0-11  move (source << 6 | dest)
+#   bit  12    move present
+#   bits 13-14 bound
+#   bits 15-22 depth
+#   bits 23-44 score + SCORE_BIAS
+SCORE_BIAS = 1 << 21
+SCORE_MASK = (1 << 22) - 1
+
+
+def _bucket_count(size_mb):
+    """Largest power-of-two bucket count that fits in the memory cap"""
+    buckets = 1
+    while buckets * 2 * BUCKET_SLOTS * ENTRY_BYTES <= size_mb * 1024 * 1024:
+        buckets *= 2
+    return buckets
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, buffer=None):
+        # buffer: optional writable buffer of table_bytes(size_mb) bytes,
+        # e.g. SharedMemory.buf, to hold the table instead of private arrays
+        buckets = _bucket_count(size_mb)
+        slots = buckets * BUCKET_SLOTS
+        self.bucket_mask = buckets - 1
+        self.size_mb = size_mb
+        if buffer is None:
+            self.keys = array('Q', bytes(slots * 8))
+            self.data = array('Q', bytes(slots * 8))
+        else:
+            view = memoryview(buffer)
+            self.keys = view[:slots * 8].cast('Q')
+            self.data = view[slots * 8:slots * ENTRY_BYTES].cast('Q')
+
+        # Statistics
+        self.probes = 0
+        self.hits = 0
+
+    @staticmethod
+    def table_bytes(size_mb):
+        """Buffer size needed for a table of size_mb"""
+        return _bucket_count(size_mb) * BUCKET_SLOTS * ENTRY_BYTES
+
+    def __len__(self):
+        """Number of entry slots"""
+        return len(self.keys)
+
+    def clear(self):
+        """Empty the table in place"""
+        zero = bytes(len(self.keys) * 8)
+        memoryview(self.keys).cast('B')[:] = zero
+        memoryview(self.data).cast('B')[:] = zero
+        self.probes = 0
+        self.hits = 0
+
+    def release(self):
+        """Drop the views of a shared buffer so its owner can close it"""
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+            self.data.release()
+
+    def probe(self, key):
+        """Look up key and return (depth, bound, score, move) or None"""
+        self.probes += 1
+        index = (key & self.bucket_mask) * BUCKET_SLOTS
+        keys, table_data = self.keys, self.data
+        data = table_data[index]
+        if keys[index] ^ data != key:
+            data = table_data[index + 1]
+            if keys[index + 1] ^ data != key:
+                return None
+        if not data:
+            return None
+
+        self.hits += 1
+        move = ((data >> 6) & 0x3F, data & 0x3F) if data & 0x1000 else None
+        return ((data >> 15) & 0xFF, (data >> 13) & 0x03,
+                ((data >> 23) & SCORE_MASK) - SCORE_BIAS, move)
+
+    def store(self, key, depth, bound, score, move=None):
+        """Store a search result, keeping the deepest entry in each bucket's first slot
+        and the one it displaced, or the newest shallower one, in the second"""
+        data = ((((score + SCORE_BIAS) & SCORE_MASK) << 23) | ((depth & 0xFF) << 15)
+                | (bound << 13))
+        if move is not None:
+            data |= 0x1000 | (move[0] << 6) | move[1]
+
+        index = (key & self.bucket_mask) * BUCKET_SLOTS
+        keys, table_data = self.keys, self.data
+        current = table_data[index]
+        current_key = keys[index] ^ current
+        if current_key == key or depth >= (current >> 15) & 0xFF:
+            if current and current_key != key:
+                # The displaced entry moves to the always-replace slot
+                # rather than being lost
+                keys[index + 1] = keys[index]
+                table_data[index + 1] = current
+            slot = index
+        else:
+            slot = index + 1
+        keys[slot] = key ^ data
+        table_data[slot] = data
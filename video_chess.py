@@ -3,8 +3,62 @@ Atari 2600 Video Chess - Python Implementation
 Replicates the core logic from the original ROM assembly code
 """
 
+import os
+import sys
+import time
+
+import evaluation
+import movegen
+import search
+import transposition
+import zobrist
+
+# FEN piece letters in the Atari encoding (0x08 white, 0x80 pawn flag)
+FEN_PIECES = {
+    'k': 0x01, 'q': 0x02, 'b': 0x03, 'n': 0x04, 'r': 0x05, 'p': 0x86,
+    'K': 0x09, 'Q': 0x0A, 'B': 0x0B, 'N': 0x0C, 'R': 0x0D, 'P': 0x8E,
+}
+FEN_LETTERS = {piece & 0x0F: letter for letter, piece in FEN_PIECES.items()}
+
+# Castling flag bits by FEN letter
+FEN_CASTLING = {'K': 0x01, 'Q': 0x02, 'k': 0x04, 'q': 0x08}
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Opening book and endgame tables used when they exist (built by book.py
+# and tablebase.py)
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+DEFAULT_TABLEBASES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+
+# Frame rates of the NTSC and PAL ROM variants
+FRAME_RATES = {"NTSC": 60, "PAL": 50}
+# Search nodes the AI gets per second of frames: about half of what the
+# search manages flat out, leaving the rest of each frame to input and display
+SEARCH_NODES_PER_SECOND = 20000
+
+
+def square_name(square):
+    """Coordinate name of a square index (0 = A1, 63 = H8)"""
+    return chr(ord('A') + square % 8) + str(square // 8 + 1)
+
+
+def parse_square(name):
+    """Square index of a coordinate name like 'E4' (either case), or -1"""
+    if len(name) != 2 or not 'A' <= name[0].upper() <= 'H' or not '1' <= name[1] <= '8':
+        return -1
+    return (int(name[1]) - 1) * 8 + ord(name[0].upper()) - ord('A')
+
+
+def move_name(move):
+    """Coordinate name of a (source, dest) move, e.g. 'E2E4'"""
+    return square_name(move[0]) + square_name(move[1])
+
 class VideoChess:
-    def __init__(self):
+    def __init__(self, tt_size_mb=16, book_path=DEFAULT_BOOK, tablebase_path=DEFAULT_TABLEBASES,
+                 search_workers=1, tv_standard="NTSC", cache_path=None):
+        if tv_standard not in FRAME_RATES:
+            raise ValueError(f"Unknown TV standard: {tv_standard!r}")
+        
         # Game state variables (equivalent to zero page memory)
         self.board = [0] * 64  # 8x8 chess board
         self.current_player = 0  # 0=white, 1=black
@@ -21,6 +75,33 @@ class VideoChess:
         self.captured_piece = 0
         self.move_state = 0
         self.en_passant_square = -1  # Track en passant target square
+        self.undo_stack = []  # Undo records pushed by make_move
+        self.hash_key = 0  # Zobrist key of the current position
+        
+        # Incremental evaluation (white-positive material + piece-square sums)
+        self.eval_opening = 0
+        self.eval_endgame = 0
+        self.eval_phase = 0
+        
+        # AI search state
+        self.tt_size_mb = tt_size_mb  # Transposition table memory cap
+        self.transposition_table = None  # Allocated on first search
+        self.book_path = book_path  # Opening book file, None to always search
+        self.opening_book = None  # Mapped on first lookup
+        self.tablebase_path = tablebase_path  # Endgame table directory, None to never probe
+        self.tablebases = None  # Opened on first search
+        self.cache_path = cache_path  # Persistent evaluation cache file, None for none
+        self.eval_cache = None  # Opened on first search
+        self.search_workers = search_workers  # Processes per search, 1 for a plain search
+        self.parallel_search = None  # Helper processes started on first search
+        self.profiler = None  # profiler.Profiler while instrumentation is attached
+        self.search_game = None  # Private copy of the position that sliced searches run on
+        self.ai_search = None  # Sliced search in progress (search_steps generator)
+        
+        # Frame timing
+        self.tv_standard = tv_standard
+        self.frame_rate = FRAME_RATES[tv_standard]
+        self.frame_nodes = SEARCH_NODES_PER_SECOND // self.frame_rate  # AI search nodes per frame
         
         # Display and input
         self.joystick_state = 0
@@ -54,12 +135,22 @@ class VideoChess:
         # Reset game state
         self.current_player = 0
         self.game_flags = 0
-        self.castling_flags = 0xFF
+        self.castling_flags = movegen.ALL_CASTLING
         self.move_state = 0
+        self.en_passant_square = -1
+        self.captured_piece = 0
+        self.undo_stack = []
+        self.ai_search = None
+        self.update_hash()
+        self.full_recompute()
     
     def main_loop(self):
-        """Main game loop (F00F-F07B)"""
+        """Main game loop (F00F-F07B), one pass per TV frame"""
+        frame_time = 1.0 / self.frame_rate
+        next_frame = time.perf_counter()
         while not (self.game_flags & 0x80):  # Continue until game over
+            frame_start = time.perf_counter()
+            
             # Increment game timer
             self.game_timer = (self.game_timer + 1) & 0xFFFF
             
@@ -74,6 +165,16 @@ class VideoChess:
             
             # Handle display and timing
             self.update_display()
+            if self.profiler is not None:
+                self.profiler.record_frame(time.perf_counter() - frame_start)
+            
+            # Hold the frame rate; after an overrun start counting afresh
+            next_frame += frame_time
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.perf_counter()
     
     def read_input(self):
         """Read joystick and console switches (F4D6-F53B)"""
@@ -102,140 +203,180 @@ class VideoChess:
             if self.validate_move():
                 self.execute_move()
                 self.current_player = 1
+                self.check_game_over()
             self.move_state = 0
     
     def process_ai_move(self):
-        """AI move generation (F41C-F468)"""
-        best_move = self.find_best_move()
+        """AI move generation (F41C-F468), one slice of the search per frame"""
+        if self.ai_search is None:
+            move = self.book_move()
+            if move:
+                self.play_ai_move(move)
+                return
+            self.ai_search = self.search_steps()
+        try:
+            next(self.ai_search)
+        except StopIteration as done:
+            self.ai_search = None
+            self.play_ai_move(done.value)
+    
+    def book_move(self):
+        """Weighted-random opening book move for this position, or None"""
+        if self.opening_book is None:
+            if not self.book_path or not os.path.exists(self.book_path):
+                return None
+            import book
+            self.opening_book = book.OpeningBook(self.book_path)
+        return self.opening_book.choose(self)
+    
+    def load_tablebases(self):
+        """Endgame tables for the search, or None without tables or NumPy"""
+        if self.tablebases is None and self.tablebase_path and os.path.isdir(self.tablebase_path):
+            import tablebase
+            if tablebase.np is not None:
+                self.tablebases = tablebase.Tablebases(self.tablebase_path)
+        return self.tablebases
+    
+    def load_cache(self):
+        """Persistent evaluation cache for the search, or None without a cache path"""
+        if self.eval_cache is None and self.cache_path:
+            import evalcache
+            self.eval_cache = evalcache.EvalCache(self.cache_path)
+        return self.eval_cache
+    
+    def search_table(self):
+        """Transposition table, allocated and warmed from the cache on first use"""
+        if self.transposition_table is None:
+            self.transposition_table = transposition.TranspositionTable(self.tt_size_mb)
+            if self.load_cache() is not None:
+                self.eval_cache.warm(self.transposition_table)
+        return self.transposition_table
+    
+    def cached_move(self, max_depth):
+        """Move from the evaluation cache if this position was searched to max_depth, or None"""
+        if self.load_cache() is None:
+            return None
+        import evalcache
+        return evalcache.root_entry(self.eval_cache, self, max_depth)
+    
+    def cache_result(self, depth, score, move):
+        """Queue a finished search of this position for the evaluation cache"""
+        if self.eval_cache is not None and move is not None and depth > 0:
+            self.eval_cache.store(self.hash_key, depth, transposition.EXACT, score, move)
+    
+    def play_ai_move(self, best_move):
+        """Execute a move chosen by the AI search"""
         if best_move:
             self.source_square, self.dest_square = best_move
             self.moving_piece = self.board[self.source_square]
             self.captured_piece = self.board[self.dest_square]
             self.execute_move()
             self.current_player = 0
+        self.check_game_over()
     
-    def find_best_move(self):
-        """Simple AI move selection based on difficulty (F428-F465)"""
-        moves = self.generate_moves(0x80)  # Black pieces
-        if not moves:
-            return None
-        
-        # Improved AI - prioritize captures and center control
-        best_score = -999
-        best_move = moves[0]
-        
-        for move in moves:
-            score = self.evaluate_move(move)
-            # Add positional bonus for center squares
-            dest_row, dest_col = move[1] // 8, move[1] % 8
-            if 2 <= dest_row <= 5 and 2 <= dest_col <= 5:
-                score += 1
-            
-            if score > best_score:
-                best_score = score
-                best_move = move
-        
-        return best_move
+    def find_best_move(self, info_callback=None, stop_event=None):
+        """AI move selection with a search sized by difficulty (F428-F465)"""
+        max_depth, time_limit = search.difficulty_limits(self.difficulty)
+        move = self.cached_move(max_depth)
+        if move is not None:
+            return move
+        if self.search_workers > 1:
+            if self.parallel_search is None:
+                import parallel
+                self.parallel_search = parallel.ParallelSearch(self.search_workers, self.tt_size_mb)
+                if self.load_cache() is not None:
+                    self.eval_cache.warm(self.parallel_search.tt)
+            parallel_search = self.parallel_search
+            move = parallel_search.search(self, max_depth, time_limit,
+                                          info_callback=info_callback,
+                                          stop_event=stop_event)
+            self.cache_result(parallel_search.completed_depth, parallel_search.best_score, move)
+            if self.profiler is not None:
+                self.profiler.record_search(parallel_search.last_info)
+            return move
+        engine = search.Search.for_difficulty(self, self.difficulty, self.search_table(),
+                                              info_callback=info_callback,
+                                              stop_event=stop_event)
+        move = engine.run()
+        self.cache_result(engine.completed_depth, engine.best_score, move)
+        if self.profiler is not None:
+            self.profiler.record_search(engine.info())
+        return move
+    
+    def search_steps(self):
+        """find_best_move as a generator that searches frame_nodes nodes per next()
+        
+        Returns the move through StopIteration. The search runs on a private
+        copy of the position, so the board stays as played between frames.
+        Parallel searches can't be sliced and run in the first next().
+        """
+        if self.search_workers > 1:
+            return self.find_best_move()
+        move = self.cached_move(search.difficulty_limits(self.difficulty)[0])
+        if move is not None:
+            return move
+        tt = self.search_table()
+        shadow = self.search_game
+        if shadow is None:
+            shadow = self.search_game = VideoChess(self.tt_size_mb, book_path=None,
+                                                   tablebase_path=None)
+            shadow.tablebases = self.load_tablebases()
+        shadow.transposition_table = tt
+        shadow.set_position(self.get_position())
+        if self.profiler is not None:
+            self.profiler.attach(shadow)
+        engine = search.Search.for_difficulty(shadow, self.difficulty, tt)
+        yield from engine.steps(self.frame_nodes)
+        self.cache_result(engine.completed_depth, engine.best_score, engine.best_move)
+        if self.profiler is not None:
+            self.profiler.record_search(engine.info())
+        return engine.best_move
     
     def generate_moves(self, color_mask):
-        """Generate all legal moves for given color"""
-        moves = []
-        for sq in range(64):
-            piece = self.board[sq]
-            if piece & color_mask:
-                piece_type = piece & 0x0F
-                for dest in self.get_piece_moves(sq, piece_type):
-                    if self.is_valid_move(sq, dest):
-                        moves.append((sq, dest))
-        return moves
+        """Generate all legal moves for given color (0x08 white, 0x80 black)"""
+        white = color_mask & 0x08
+        return movegen.filter_legal(
+            self.board, white,
+            movegen.generate_moves(self.board, white, self.en_passant_square, self.castling_flags),
+            self.en_passant_square)
+    
+    def generate_captures(self, color_mask):
+        """Generate only the legal capturing moves for given color"""
+        white = color_mask & 0x08
+        return movegen.filter_legal(
+            self.board, white,
+            movegen.generate_captures(self.board, white, self.en_passant_square),
+            self.en_passant_square)
+    
+    def generate_quiet_moves(self, color_mask):
+        """Generate only the legal non-capturing moves for given color"""
+        white = color_mask & 0x08
+        return movegen.filter_legal(
+            self.board, white,
+            movegen.generate_quiets(self.board, white, self.en_passant_square, self.castling_flags),
+            self.en_passant_square)
+    
+    def in_check(self):
+        """Whether the side to move's king is attacked"""
+        return movegen.in_check(self.board, 0x08 if self.current_player == 0 else 0)
+    
+    def game_status(self):
+        """'checkmate' or 'stalemate' when the side to move has no legal move, else None"""
+        if self.generate_moves(0x08 if self.current_player == 0 else 0x80):
+            return None
+        return "checkmate" if self.in_check() else "stalemate"
+    
+    def check_game_over(self):
+        """Set the game over flag on checkmate or stalemate; returns game_status()"""
+        status = self.game_status()
+        if status:
+            self.game_flags |= 0x80
+        return status
     
     def get_piece_moves(self, square, piece_type):
-        """Get possible moves for piece type (simplified)"""
-        moves = []
-        row, col = square // 8, square % 8
-        
-        if piece_type == 6:  # Pawn
-            direction = 1 if self.board[square] & 0x08 else -1  # White moves up, black moves down
-            new_row = row + direction
-            
-            # Forward move
-            if 0 <= new_row < 8 and self.board[new_row * 8 + col] == 0:
-                moves.append(new_row * 8 + col)
-                
-                # Two-square advance from starting position
-                start_row = 1 if self.board[square] & 0x08 else 6
-                if row == start_row and 0 <= new_row + direction < 8 and self.board[(new_row + direction) * 8 + col] == 0:
-                    moves.append((new_row + direction) * 8 + col)
-            
-            # Diagonal captures
-            for dc in [-1, 1]:
-                if 0 <= new_row < 8 and 0 <= col + dc < 8:
-                    target_square = new_row * 8 + (col + dc)
-                    target_piece = self.board[target_square]
-                    # Normal diagonal capture
-                    if target_piece != 0 and (target_piece & 0x08) != (self.board[square] & 0x08):
-                        moves.append(target_square)
-                    # En passant capture
-                    elif target_square == self.en_passant_square:
-                        moves.append(target_square)
-        
-        elif piece_type == 3:  # Bishop
-            for dr, dc in [(1,1), (1,-1), (-1,1), (-1,-1)]:
-                for i in range(1, 8):
-                    nr, nc = row + dr*i, col + dc*i
-                    if 0 <= nr < 8 and 0 <= nc < 8:
-                        moves.append(nr * 8 + nc)
-                        if self.board[nr * 8 + nc] != 0:
-                            break
-        
-        elif piece_type == 4:  # Knight
-            knight_moves = [(2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2)]
-            for dr, dc in knight_moves:
-                nr, nc = row + dr, col + dc
-                if 0 <= nr < 8 and 0 <= nc < 8:
-                    moves.append(nr * 8 + nc)
-        
-        elif piece_type == 5:  # Rook
-            for dr, dc in [(0,1), (0,-1), (1,0), (-1,0)]:
-                for i in range(1, 8):
-                    nr, nc = row + dr*i, col + dc*i
-                    if 0 <= nr < 8 and 0 <= nc < 8:
-                        moves.append(nr * 8 + nc)
-                        if self.board[nr * 8 + nc] != 0:
-                            break
-        
-        elif piece_type == 2:  # Queen
-            for dr, dc in [(0,1), (0,-1), (1,0), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)]:
-                for i in range(1, 8):
-                    nr, nc = row + dr*i, col + dc*i
-                    if 0 <= nr < 8 and 0 <= nc < 8:
-                        moves.append(nr * 8 + nc)
-                        if self.board[nr * 8 + nc] != 0:
-                            break
-        
-        elif piece_type == 1:  # King
-            for dr, dc in [(0,1), (0,-1), (1,0), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)]:
-                nr, nc = row + dr, col + dc
-                if 0 <= nr < 8 and 0 <= nc < 8:
-                    moves.append(nr * 8 + nc)
-            
-            # Castling moves
-            if self.castling_flags != 0:  # If castling still possible
-                is_white = self.board[square] & 0x40
-                king_start = 4 if is_white else 60  # E1 for white, E8 for black
-                
-                if square == king_start:  # King hasn't moved
-                    # Kingside castling
-                    if (col < 7 and self.board[square + 1] == 0 and 
-                        self.board[square + 2] == 0):
-                        moves.append(square + 2)
-                    
-                    # Queenside castling  
-                    if (col > 0 and self.board[square - 1] == 0 and 
-                        self.board[square - 2] == 0 and self.board[square - 3] == 0):
-                        moves.append(square - 2)
-        
-        return moves
+        """Get possible moves for piece type (precomputed tables in movegen)"""
+        return movegen.piece_moves(self.board, square, piece_type,
+                                   self.en_passant_square, self.castling_flags)
     
     def validate_move(self):
         """Validate if current move is legal (F38D-F3B7)"""
@@ -253,144 +394,378 @@ class VideoChess:
         dest_piece = self.board[dest]
         
         # Can't capture own piece
-        if dest_piece != 0 and (source_piece & 0xC0) == (dest_piece & 0xC0):
+        if dest_piece != 0 and (source_piece & 0x08) == (dest_piece & 0x08):
             return False
         
         # Check if destination is in legal moves for this piece
-        piece_type = source_piece & 0x0F
+        piece_type = source_piece & 0x07
         legal_moves = self.get_piece_moves(source, piece_type)
         
         if dest not in legal_moves:
             return False
         
-        # Basic check detection - don't allow king to move into attack
-        if piece_type == 1:  # King
-            return not self.is_square_attacked(dest, source_piece & 0xC0)
-        
-        return True
+        # Pins, checks and castling through check
+        return bool(movegen.filter_legal(self.board, source_piece & 0x08, [(source, dest)],
+                                         self.en_passant_square))
     
     def execute_move(self):
         """Execute the current move (F379-F383)"""
-        # Clear previous en passant opportunity
-        self.en_passant_square = -1
-        
-        # Handle special moves (castling, en passant)
-        if self.is_special_move():
-            self.handle_special_move()
+        self.make_move((self.source_square, self.dest_square))
+    
+    def make_move(self, move):
+        """Apply a (source, dest) move and return its undo record"""
+        source, dest = move
+        board = self.board
+        piece = board[source]
+        piece_type = piece & 0x07
+        hash_key = self.hash_key
+        eval_state = (self.eval_opening, self.eval_endgame, self.eval_phase)
+        en_passant_square = self.en_passant_square
+        castling_flags = self.castling_flags
+        
+        # Handle special moves (castling, en passant) before clearing the
+        # en passant square they depend on
+        captured = board[dest]
+        if (piece_type == 1 or piece_type == 6) and self.is_special_move(source, dest, piece):
+            captured = self.handle_special_move(source, dest, piece) or captured
+        
+        record = (source, dest, piece, captured, en_passant_square,
+                  castling_flags, self.captured_piece, self.game_flags,
+                  self.current_player, hash_key, eval_state)
+        self.undo_stack.append(record)
         
         # Standard move
-        self.captured_piece = self.board[self.dest_square]
+        piece_keys = zobrist.PIECE_KEYS[piece]
+        key = self.hash_key ^ piece_keys[source] ^ piece_keys[dest] ^ zobrist.SIDE_KEY
+        opening_scores = evaluation.OPENING_SCORES[piece]
+        endgame_scores = evaluation.ENDGAME_SCORES[piece]
+        self.eval_opening += opening_scores[dest] - opening_scores[source]
+        self.eval_endgame += endgame_scores[dest] - endgame_scores[source]
+        target = board[dest]
+        if target:
+            key ^= zobrist.PIECE_KEYS[target][dest]
+            self.eval_opening -= evaluation.OPENING_SCORES[target][dest]
+            self.eval_endgame -= evaluation.ENDGAME_SCORES[target][dest]
+            self.eval_phase -= evaluation.PHASE[target]
+        if en_passant_square >= 0:
+            key ^= zobrist.EN_PASSANT_KEYS[en_passant_square]
+        self.captured_piece = captured
+        self.en_passant_square = -1
         
         # Check for pawn two-square advance (sets up en passant)
-        piece_type = self.moving_piece & 0x0F
-        if piece_type == 1 and abs(self.dest_square - self.source_square) == 16:
+        if piece_type == 6 and abs(dest - source) == 16:
             # Set en passant square behind the pawn
-            self.en_passant_square = (self.source_square + self.dest_square) // 2
+            self.en_passant_square = (source + dest) // 2
+            key ^= zobrist.EN_PASSANT_KEYS[self.en_passant_square]
         
         # Check for king capture (game over)
-        if self.captured_piece != 0 and (self.captured_piece & 0x0F) == 1:
+        if captured != 0 and (captured & 0x07) == 1:
             self.game_flags |= 0x80  # Set game over flag
         
-        self.board[self.dest_square] = self.moving_piece
-        self.board[self.source_square] = 0
+        board[dest] = piece
+        board[source] = 0
         
-        # Update game state
-        self.update_game_state()
+        # Update castling rights
+        if castling_flags:
+            self.update_game_state(source, dest)
+            if self.castling_flags != castling_flags:
+                key ^= (zobrist.CASTLING_KEYS[castling_flags]
+                        ^ zobrist.CASTLING_KEYS[self.castling_flags])
+        self.current_player ^= 1
+        self.hash_key = key
+        
+        return record
+    
+    def unmake_move(self, undo_record=None):
+        """Take back a move made by make_move (defaults to the most recent)"""
+        if undo_record is None:
+            undo_record = self.undo_stack.pop()
+        elif self.undo_stack and self.undo_stack[-1] is undo_record:
+            self.undo_stack.pop()
+        
+        (source, dest, piece, captured, en_passant_square, castling_flags,
+         captured_piece, game_flags, current_player, hash_key, eval_state) = undo_record
+        board = self.board
+        piece_type = piece & 0x07
+        
+        board[source] = piece
+        if piece_type == 6 and dest == en_passant_square and (dest - source) % 8:
+            # En passant - captured pawn goes back beside the source square
+            board[dest] = 0
+            board[source - source % 8 + dest % 8] = captured
+        else:
+            board[dest] = captured
+            if piece_type == 1 and abs(dest - source) == 2:
+                # Castling - return the rook to its corner
+                rook_source, rook_dest = ((source + 3, source + 1) if dest > source
+                                          else (source - 4, source - 1))
+                board[rook_source] = board[rook_dest]
+                board[rook_dest] = 0
+        
+        self.en_passant_square = en_passant_square
+        self.castling_flags = castling_flags
+        self.captured_piece = captured_piece
+        self.game_flags = game_flags
+        self.current_player = current_player
+        self.hash_key = hash_key
+        self.eval_opening, self.eval_endgame, self.eval_phase = eval_state
     
-    def is_special_move(self):
+    def is_special_move(self, source, dest, piece):
         """Check for castling or en passant (F13E-F182)"""
-        piece_type = self.moving_piece & 0x07
+        piece_type = piece & 0x07
         
         # Check for castling (king moving 2 squares)
         if piece_type == 1:  # King
-            if abs(self.dest_square - self.source_square) == 2:
+            if abs(dest - source) == 2:
                 return True
         
         # Check for en passant (pawn diagonal capture to empty square)
         if piece_type == 6:  # Pawn
-            if self.dest_square == self.en_passant_square:
+            if dest == self.en_passant_square and (dest - source) % 8:
                 return True
         
         return False
     
-    def handle_special_move(self):
-        """Handle castling and en passant moves (F17F)"""
-        piece_type = self.moving_piece & 0x07
+    def handle_special_move(self, source, dest, piece):
+        """Handle castling and en passant moves (F17F), returning any pawn taken en passant"""
+        piece_type = piece & 0x07
         
         if piece_type == 1:  # Castling
             # Move rook as well
-            if self.dest_square > self.source_square:  # Kingside
-                rook_source = self.source_square + 3
-                rook_dest = self.source_square + 1
+            if dest > source:  # Kingside
+                rook_source = source + 3
+                rook_dest = source + 1
             else:  # Queenside
-                rook_source = self.source_square - 4
-                rook_dest = self.source_square - 1
+                rook_source = source - 4
+                rook_dest = source - 1
             
-            self.board[rook_dest] = self.board[rook_source]
+            rook = self.board[rook_source]
+            self.board[rook_dest] = rook
             self.board[rook_source] = 0
+            self.hash_key ^= zobrist.PIECE_KEYS[rook][rook_source] ^ zobrist.PIECE_KEYS[rook][rook_dest]
+            self.eval_opening += (evaluation.OPENING_SCORES[rook][rook_dest]
+                                  - evaluation.OPENING_SCORES[rook][rook_source])
+            self.eval_endgame += (evaluation.ENDGAME_SCORES[rook][rook_dest]
+                                  - evaluation.ENDGAME_SCORES[rook][rook_source])
         
         elif piece_type == 6:  # En passant
             # Remove captured pawn (it's on the same rank as source, not destination)
-            if self.dest_square == self.en_passant_square:
-                captured_pawn_square = self.source_square + (self.dest_square % 8 - self.source_square % 8)
-                self.board[captured_pawn_square] = 0
+            captured_pawn_square = source + (dest % 8 - source % 8)
+            captured_pawn = self.board[captured_pawn_square]
+            self.board[captured_pawn_square] = 0
+            self.hash_key ^= zobrist.PIECE_KEYS[captured_pawn][captured_pawn_square]
+            self.eval_opening -= evaluation.OPENING_SCORES[captured_pawn][captured_pawn_square]
+            self.eval_endgame -= evaluation.ENDGAME_SCORES[captured_pawn][captured_pawn_square]
+            return captured_pawn
+        
+        return 0
     
     def evaluate_move(self, move):
-        """Evaluate move quality for AI (F430-F452)"""
+        """Evaluate move quality for AI (F430-F452): material and positional gain in centipawns"""
         source, dest = move
-        score = 0
+        piece = self.board[source]
+        sign = 1 if piece & 0x08 else -1
+        phase = self.eval_phase
         
-        # Prefer captures
-        if self.board[dest] != 0:
-            captured_type = self.board[dest] & 0x0F
-            score += self.piece_values[captured_type]
+        # Positional change of the moving piece
+        score = sign * (evaluation.blend(evaluation.OPENING_SCORES[piece][dest],
+                                         evaluation.ENDGAME_SCORES[piece][dest], phase)
+                        - evaluation.blend(evaluation.OPENING_SCORES[piece][source],
+                                           evaluation.ENDGAME_SCORES[piece][source], phase))
         
-        # Add positional bonuses based on difficulty
-        score += self.difficulty
+        # Prefer captures
+        captured = self.board[dest]
+        if captured != 0:
+            score -= sign * evaluation.blend(evaluation.OPENING_SCORES[captured][dest],
+                                             evaluation.ENDGAME_SCORES[captured][dest], phase)
         
         return score
     
-    def update_game_state(self):
-        """Update castling rights and other game state"""
-        piece_type = self.moving_piece & 0x07
-        
-        # Update castling rights
-        if piece_type == 1:  # King moved
-            if self.moving_piece & 0x40:  # White king
-                self.castling_flags &= 0xFC  # Clear white castling
-            else:  # Black king
-                self.castling_flags &= 0xF3  # Clear black castling
-        
-        elif piece_type == 5:  # Rook moved
-            # Update castling based on rook position
-            pass
+    def evaluate(self):
+        """Static evaluation in centipawns from the side to move's point of view"""
+        score = evaluation.blend(self.eval_opening, self.eval_endgame, self.eval_phase)
+        return score if self.current_player == 0 else -score
+    
+    def full_recompute(self):
+        """Rebuild the incremental evaluation sums from the board"""
+        self.eval_opening, self.eval_endgame, self.eval_phase = evaluation.full_recompute(self.board)
+        return self.eval_opening, self.eval_endgame, self.eval_phase
+    
+    def update_game_state(self, source, dest):
+        """Update castling rights: a king or rook leaving its start square, or a
+        rook captured in its corner, drops the rights that depend on it"""
+        self.castling_flags &= movegen.CASTLING_KEEP[source] & movegen.CASTLING_KEEP[dest]
     
     def update_display(self):
         """Update display (simplified - original has complex TIA programming)"""
         pass
     
+    def update_hash(self):
+        """Recompute the Zobrist key after the board is edited directly"""
+        self.hash_key = zobrist.compute_hash(self.board, self.current_player,
+                                             self.castling_flags, self.en_passant_square)
+        return self.hash_key
+    
+    def get_position(self):
+        """Snapshot of the position (board, side to move, castling, en passant)"""
+        return (tuple(self.board), self.current_player, self.castling_flags,
+                self.en_passant_square)
+    
+    def set_position(self, position):
+        """Restore a snapshot taken with get_position"""
+        board, self.current_player, self.castling_flags, self.en_passant_square = position
+        self.board = list(board)
+        self.game_flags = 0
+        self.captured_piece = 0
+        self.move_state = 0
+        self.undo_stack = []
+        self.ai_search = None
+        self.update_hash()
+        self.full_recompute()
+    
+    def set_fen(self, fen):
+        """Set up the position from a FEN string"""
+        fields = fen.split()
+        ranks = fields[0].split('/') if fields else []
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN board: {fen!r}")
+        
+        board = [0] * 64
+        for i, rank in enumerate(ranks):
+            row, col = 7 - i, 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                elif char in FEN_PIECES and col < 8:
+                    board[row * 8 + col] = FEN_PIECES[char]
+                    col += 1
+                else:
+                    raise ValueError(f"Invalid FEN board: {fen!r}")
+            if col != 8:
+                raise ValueError(f"Invalid FEN board: {fen!r}")
+        
+        side = fields[1] if len(fields) > 1 else 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        en_passant = fields[3] if len(fields) > 3 else '-'
+        if side not in ('w', 'b'):
+            raise ValueError(f"Invalid FEN side to move: {side!r}")
+        
+        self.board = board
+        self.current_player = 0 if side == 'w' else 1
+        self.castling_flags = 0
+        for char in castling:
+            self.castling_flags |= FEN_CASTLING.get(char, 0)
+        self.en_passant_square = parse_square(en_passant) if en_passant != '-' else -1
+        self.game_flags = 0
+        self.captured_piece = 0
+        self.move_state = 0
+        self.undo_stack = []
+        self.ai_search = None
+        self.update_hash()
+        self.full_recompute()
+    
+    def get_fen(self):
+        """Describe the position as a FEN string"""
+        ranks = []
+        for row in range(7, -1, -1):
+            rank, empty = "", 0
+            for col in range(8):
+                piece = self.board[row * 8 + col]
+                if piece == 0:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += FEN_LETTERS.get(piece & 0x0F, '?')
+            ranks.append(rank + (str(empty) if empty else ""))
+        
+        castling = "".join(char for char, bit in FEN_CASTLING.items()
+                           if self.castling_flags & bit) or '-'
+        en_passant = (square_name(self.en_passant_square).lower()
+                      if self.en_passant_square >= 0 else '-')
+        side = 'w' if self.current_player == 0 else 'b'
+        return f"{'/'.join(ranks)} {side} {castling} {en_passant} 0 1"
+    
+    def perft(self, depth):
+        """Count leaf nodes of the move tree to depth (movegen correctness test)"""
+        if depth == 0 or self.game_flags & 0x80:
+            return 1
+        moves = self.generate_moves(0x08 if self.current_player == 0 else 0x80)
+        if depth == 1:
+            return len(moves)
+        
+        nodes = 0
+        for move in moves:
+            self.make_move(move)
+            nodes += self.perft(depth - 1)
+            self.unmake_move()
+        return nodes
+    
+    def divide(self, depth):
+        """Perft split by root move: list of (move, leaf count)"""
+        results = []
+        for move in self.generate_moves(0x08 if self.current_player == 0 else 0x80):
+            self.make_move(move)
+            results.append((move, self.perft(depth - 1)))
+            self.unmake_move()
+        return results
+    
     def get_board_state(self):
         """Get current board state for display"""
         return self.board.copy()
     
     def set_difficulty(self, level):
-        """Set AI difficulty level (0-7)"""
+        """Set AI difficulty level (0-7): search depth and time per move"""
         self.difficulty = max(0, min(7, level))
     
     def is_square_attacked(self, square, by_color):
-        """Check if square is attacked by pieces of given color"""
-        enemy_color = 0x80 if by_color == 0x40 else 0x40
-        
-        for sq in range(64):
-            piece = self.board[sq]
-            if piece & enemy_color:
-                piece_type = piece & 0x0F
-                moves = self.get_piece_moves(sq, piece_type)
-                if square in moves:
-                    return True
-        return False
+        """Check if square is attacked by pieces of given color (0x08 white, 0x80 black)"""
+        return movegen.is_square_attacked(self.board, square, by_color & 0x08)
+
+def run_perft(depth, position=None):
+    """Print perft divide output, total leaf count and nodes/sec"""
+    import benchmark
+    
+    game = VideoChess()
+    game.set_fen(benchmark.POSITIONS.get(position, position) if position else START_FEN)
+    
+    start = time.perf_counter()
+    total = 0
+    for move, nodes in game.divide(depth):
+        print(f"{move_name(move)}: {nodes}")
+        total += nodes
+    elapsed = time.perf_counter() - start
+    
+    print()
+    print(f"Nodes: {total}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"NPS: {total / elapsed if elapsed > 0 else 0:.0f}")
+
+def run_profile(level, position=None):
+    """Search one position at a difficulty level with instrumentation and print the counters"""
+    import json
+    import benchmark
+    import profiler
+    
+    game = VideoChess(book_path=None)
+    game.set_fen(benchmark.POSITIONS.get(position, position) if position else START_FEN)
+    game.set_difficulty(level)
+    instruments = profiler.Profiler()
+    instruments.attach(game)
+    game.find_best_move()
+    instruments.detach(game)
+    print(json.dumps(instruments.snapshot(), indent=2, default=list))
 
 # Example usage
 if __name__ == "__main__":
-    game = VideoChess()
-    game.main_loop()  # Start the game loop
+    if len(sys.argv) > 2 and sys.argv[1] == "perft":
+        # python video_chess.py perft <depth> [position name or FEN]
+        run_perft(int(sys.argv[2]), " ".join(sys.argv[3:]) or None)
+    elif len(sys.argv) > 2 and sys.argv[1] == "profile":
+        # python video_chess.py profile <difficulty 0-7> [position name or FEN]
+        run_profile(int(sys.argv[2]), " ".join(sys.argv[3:]) or None)
+    else:
+        # python video_chess.py [ntsc|pal]
+        game = VideoChess(tv_standard=sys.argv[1].upper() if len(sys.argv) > 1 else "NTSC")
+        game.main_loop()  # Start the game loop
@@ -0,0 +1,34 @@
+"""
+Atari 2600 Video Chess - Zobrist Hashing
+64-bit position keys over the board bytes, side to move, castling flags
+and en passant square
+"""
+
+import random
+
+# Fixed seed so keys (and anything stored by them) are stable across runs
+_rng = random.Random(0x2600)
+
+# Indexed by [piece byte][square]; the full byte is keyed so the 0x80 pawn
+# flag is part of the position identity
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(256)]
+PIECE_KEYS[0] = [0] * 64
+# XORed in when black is to move
+SIDE_KEY = _rng.getrandbits(64)
+# Indexed by the castling_flags byte
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(256)]
+# Indexed by en passant square
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(64)]
+
+
+def compute_hash(board, current_player, castling_flags, en_passant_square):
+    """Compute a position key from scratch"""
+    key = CASTLING_KEYS[castling_flags & 0xFF]
+    for square, piece in enumerate(board):
+        if piece:
+            key ^= PIECE_KEYS[piece][square]
+    if current_player:
+        key ^= SIDE_KEY
+    if en_passant_square >= 0:
+        key ^= EN_PASSANT_KEYS[en_passant_square]
+    return key